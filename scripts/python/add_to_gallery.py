@@ -5,22 +5,40 @@ Upload a local image to S3, extract GPS (EXIF), and append an entry to images/ga
 Usage (from repo root):
   python scripts/albums/add_to_gallery.py --file /abs/path/to/IMG_1234.jpg \
       --bucket your-bucket --cf-domain dxxxx.cloudfront.net [--prefix album/] [--name "Place"] \
-      [--lat 37.77 --lng -122.41] [--region us-east-1]
+      [--lat 37.77 --lng -122.41] [--region us-east-1] [--dedupe] [--derivatives] [--allow-near-duplicate]
+
+With --dedupe the file is hashed first; if identical content is already recorded
+in the local content index (.gallery-cache/content-index.json) or already sits in
+S3 under the target key, the upload and the gallery.json append are skipped.
+
+With --derivatives, width-bounded WebP/AVIF copies (see image_derivatives.py) are
+uploaded next to the original and recorded as a `srcset` list on the entry.
+
+Every new entry also records width, height and a base64 LQIP placeholder
+(see gallery_placeholders.py).
+
+Before uploading, the file's perceptual hash is compared with the gallery's
+(.gallery-cache/phash.json, filled by gallery_dupes.py). A near-duplicate - a
+burst frame, or an edit of a photo already listed - stops the run unless
+--allow-near-duplicate is passed; added images are recorded in that index.
 
 Requires: pip install boto3 Pillow
 """
 
 import argparse
+import hashlib
 import json
 import mimetypes
 import os
 import sys
 import time
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+from pathlib import Path
 import re
 
 import boto3
+from botocore.exceptions import ClientError
 from PIL import Image, ExifTags
 
 
@@ -141,28 +159,207 @@ def make_key(local_path: str) -> str:
     return os.path.basename(local_path)
 
 
-def upload_to_s3(file_path: str, bucket: str, key: str, region: Optional[str] = None):
+def upload_to_s3(file_path: str, bucket: str, key: str, region: Optional[str] = None, sha256: Optional[str] = None):
     s3 = boto3.client("s3", region_name=region)
     extra = {"ContentType": detect_content_type(file_path)}
+    if sha256:
+        # Stored as x-amz-meta-sha256 so later runs can match content with a HEAD
+        extra["Metadata"] = {"sha256": sha256}
     s3.upload_file(file_path, bucket, key, ExtraArgs=extra)
 
 
-def append_to_gallery(repo_root: str, url: str, name: str, lat: Optional[float], lng: Optional[float], date_taken: Optional[str] = None):
-    gallery_path = os.path.join(repo_root, "images", "gallery.json")
-    with open(gallery_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    if not isinstance(data, list):
-        raise SystemExit("images/gallery.json must contain a top-level array")
+def file_digests(path: str, chunk_size: int = 1 << 20) -> Tuple[str, str]:
+    """Return (sha256, md5) hex digests of a file, read once in fixed-size chunks.
+
+    The MD5 is kept alongside the SHA-256 because it matches the ETag S3 assigns
+    to single-part uploads.
+    """
+    sha = hashlib.sha256()
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+            md5.update(chunk)
+    return sha.hexdigest(), md5.hexdigest()
+
+
+def content_index_path(repo_root: str) -> str:
+    return os.path.join(repo_root, ".gallery-cache", "content-index.json")
+
+
+def load_content_index(repo_root: str) -> Dict[str, dict]:
+    """Load the sha256 -> {key, url, size} index of content already ingested."""
+    path = content_index_path(repo_root)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_content_index(repo_root: str, index: Dict[str, dict]):
+    path = content_index_path(repo_root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def s3_has_content(bucket: str, key: str, sha256: str, md5: str, region: Optional[str] = None) -> bool:
+    """HEAD the object and report whether it already holds this exact content.
+
+    Matches on the sha256 metadata written by upload_to_s3, falling back to the
+    ETag (the MD5 of the body for objects uploaded in a single part).
+    """
+    s3 = boto3.client("s3", region_name=region)
+    try:
+        head = s3.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    if (head.get("Metadata") or {}).get("sha256") == sha256:
+        return True
+    return head.get("ETag", "").strip('"') == md5
+
+
+def open_gallery_store(repo_root: str):
+    """SQLite working copy of images/gallery.json (see gallery_store.py)."""
+    store_mod = load_sibling("gallery_store")
+    return store_mod.GalleryStore(
+        os.path.join(repo_root, ".gallery-cache", "gallery.db"),
+        os.path.join(repo_root, "images", "gallery.json"),
+    )
+
+
+def gallery_has_url(repo_root: str, url: str, store=None) -> bool:
+    if store is not None:
+        return store.has_url(url)
+    with open_gallery_store(repo_root) as own:
+        return own.has_url(url)
+
+
+def dedupe_upload(file_path: str, bucket: str, key: str, cf_domain: str, region: Optional[str],
+                  index: Dict[str, dict], digests: Optional[Tuple[str, str]] = None) -> Tuple[str, bool, int]:
+    """Upload file_path unless its content is already known. Returns (url, uploaded, size).
+
+    When the same bytes were ingested before under another key, the URL of that
+    earlier object is returned so the caller does not append a second entry.
+    `digests` skips re-reading the file when the caller already has them.
+    """
+    size = os.path.getsize(file_path)
+    sha256, md5 = digests or file_digests(file_path)
+    known = index.get(sha256)
+    if known:
+        return known["url"], False, size
+
+    url = f"https://{cf_domain}/{key}"
+    uploaded = False
+    if not s3_has_content(bucket, key, sha256, md5, region=region):
+        upload_to_s3(file_path, bucket, key, region=region, sha256=sha256)
+        uploaded = True
+    index[sha256] = {"key": key, "url": url, "size": size}
+    return url, uploaded, size
+
+
+def load_sibling(name: str):
+    """Import another script from this directory, with or without package context."""
+    import importlib
+    import importlib.util
+    try:
+        return importlib.import_module(f"{__package__}.{name}") if __package__ else importlib.import_module(name)
+    except ImportError:
+        here = os.path.dirname(os.path.abspath(__file__))
+        spec = importlib.util.spec_from_file_location(name, os.path.join(here, f"{name}.py"))
+        mod = importlib.util.module_from_spec(spec)
+        assert spec and spec.loader
+        spec.loader.exec_module(mod)  # type: ignore
+        return mod
+
+
+def derivatives_dir(repo_root: str) -> str:
+    return os.path.join(repo_root, ".gallery-cache", "derivatives")
+
+
+def upload_srcset(variants: List[dict], bucket: str, key: str, cf_domain: str, region: Optional[str] = None) -> List[dict]:
+    """Upload rendered derivatives next to `key` and return the gallery `srcset` list."""
+    deriv = load_sibling("image_derivatives")
+    key_prefix = key.rsplit("/", 1)[0] + "/" if "/" in key else ""
+    return deriv.upload_derivatives(variants, bucket, key_prefix, cf_domain, region=region)
+
+
+def build_srcset(file_path: str, bucket: str, key: str, cf_domain: str, repo_root: str,
+                 region: Optional[str] = None) -> List[dict]:
+    deriv = load_sibling("image_derivatives")
+    variants = deriv.build_derivatives([file_path], derivatives_dir(repo_root))[file_path]
+    return upload_srcset(variants, bucket, key, cf_domain, region=region)
+
+
+def placeholder_fields(file_path: str) -> dict:
+    """width/height/lqip for the entry; missing fields only degrade the placeholder."""
+    try:
+        return load_sibling("gallery_placeholders").placeholder_for_file(file_path)
+    except Exception as e:
+        print(f"Placeholder skipped for {file_path}: {e}", file=sys.stderr)
+        return {}
+
+
+def phash_cache_path(repo_root: str) -> str:
+    return os.path.join(repo_root, ".gallery-cache", "phash.json")
+
+
+def perceptual_hashes(file_path: str) -> Optional[dict]:
+    """pHash/dHash of the file (see gallery_dupes.py), or None when they cannot be computed."""
+    try:
+        return load_sibling("gallery_dupes").hashes_for_file(file_path)
+    except Exception as e:
+        print(f"Near-duplicate check skipped for {file_path}: {e}", file=sys.stderr)
+        return None
+
+
+def find_near_duplicates(repo_root: str, hashes: dict, exclude_url: Optional[str] = None) -> List[tuple]:
+    """[(distance, url)] of gallery images that look like the file `hashes` came from."""
+    dupes = load_sibling("gallery_dupes")
+    cache = dupes.load_cache(phash_cache_path(repo_root))
+    return [(d, u) for d, u in dupes.near_duplicates(hashes, cache) if u != exclude_url]
+
+
+def record_hashes(repo_root: str, url: str, hashes: Optional[dict]):
+    """Add a newly listed image to the near-duplicate index so later ingests see it."""
+    if not hashes:
+        return
+    dupes = load_sibling("gallery_dupes")
+    path = phash_cache_path(repo_root)
+    cache = dupes.load_cache(path)
+    cache[url] = hashes
+    dupes.save_cache(cache, path)
+
+
+def append_to_gallery(repo_root: str, url: str, name: str, lat: Optional[float], lng: Optional[float], date_taken: Optional[str] = None,
+                      extra: Optional[dict] = None, store=None):
+    """Record a photo. With a caller-owned store the export to gallery.json is left to the caller,
+    so batch tools write the file once instead of once per photo."""
     entry = {"url": url, "name": name}
     if lat is not None and lng is not None:
         entry["lat"] = lat
         entry["lng"] = lng
     if date_taken:
         entry["date_taken"] = date_taken
-    data.append(entry)
-    with open(gallery_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-        f.write("\n")
+    if extra:
+        entry.update(extra)
+    if store is not None:
+        store.upsert(entry)
+        return
+    with open_gallery_store(repo_root) as own:
+        own.upsert(entry)
+        own.export()
+    refresh_album(repo_root)
+
+
+def refresh_album(repo_root: str):
+    """Rebuild the map clusters and the pre-rendered /album page from the exported gallery.json."""
+    load_sibling("prerender_pages").refresh_album(Path(repo_root))
 
 
 def main():
@@ -176,6 +373,10 @@ def main():
     parser.add_argument("--cf-domain", dest="cf_domain", default=CF_DOMAIN, help="CloudFront domain (default from script)")
     parser.add_argument("--prefix", default=S3_PREFIX, help="Key prefix (default from script)")
     parser.add_argument("--region", default=AWS_REGION, help="AWS region (default from script)")
+    parser.add_argument("--dedupe", action="store_true", help="Skip upload/append when identical content is already ingested")
+    parser.add_argument("--derivatives", action="store_true", help="Also upload WebP/AVIF thumbnails and record a srcset")
+    parser.add_argument("--allow-near-duplicate", action="store_true",
+                        help="Add the image even if it looks like one already in the gallery")
 
     args = parser.parse_args()
 
@@ -209,12 +410,57 @@ def main():
         prefix = prefix + "/"
     key = prefix + make_key(args.file)
 
+    # repo root = two levels up from this script
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+    # Exact copies are --dedupe's job (it returns the existing URL); only content
+    # the index has not seen goes through the near-duplicate check
+    index = load_content_index(repo_root) if args.dedupe else None
+    digests = file_digests(args.file) if args.dedupe else None
+    already_ingested = index is not None and digests[0] in index
+
+    hashes = perceptual_hashes(args.file)
+    if hashes and not already_ingested and not args.allow_near_duplicate:
+        # Re-adding under the same key is an overwrite, not a near-duplicate
+        matches = find_near_duplicates(repo_root, hashes, exclude_url=f"https://{args.cf_domain}/{key}")
+        if matches:
+            print(f"{args.file} looks like images already in the gallery:", file=sys.stderr)
+            for distance, url in matches[:5]:
+                print(f"  {distance:2d} bits  {url}", file=sys.stderr)
+            print("Pass --allow-near-duplicate to add it anyway.", file=sys.stderr)
+            sys.exit(1)
+
+    if args.dedupe:
+        url, uploaded, size = dedupe_upload(args.file, args.bucket, key, args.cf_domain, args.region, index,
+                                            digests=digests)
+        save_content_index(repo_root, index)
+        appended = not gallery_has_url(repo_root, url)
+        if appended:
+            extra = placeholder_fields(args.file)
+            srcset = build_srcset(args.file, args.bucket, key, args.cf_domain, repo_root,
+                                  region=args.region) if args.derivatives else []
+            if srcset:
+                extra["srcset"] = srcset
+            append_to_gallery(repo_root, url, args.name or "", lat, lng, date_taken, extra)
+            record_hashes(repo_root, url, hashes)
+        print("\n✅ Done")
+        print("URL:", url)
+        print("Uploaded:", "yes" if uploaded else f"no (content already present, {size} bytes not uploaded)")
+        print("Gallery:", "appended" if appended else "already listed")
+        return
+
     upload_to_s3(args.file, args.bucket, key, region=args.region)
     url = f"https://{args.cf_domain}/{key}"
 
-    # repo root = two levels up from this script
-    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-    append_to_gallery(repo_root, url, args.name or "", lat, lng, date_taken)
+    extra = placeholder_fields(args.file)
+    if args.derivatives:
+        srcset = build_srcset(args.file, args.bucket, key, args.cf_domain, repo_root, region=args.region)
+        if srcset:
+            extra["srcset"] = srcset
+        print(f"Derivatives: {len(srcset)} uploaded")
+
+    append_to_gallery(repo_root, url, args.name or "", lat, lng, date_taken, extra)
+    record_hashes(repo_root, url, hashes)
 
     print("\n✅ Done")
     print("URL:", url)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Minify and fingerprint the site's stylesheets and scripts.
+
+Every top-level *.css / *.js file is minified and written to assets/ under a
+content-hashed name (styles.css -> assets/styles.3f9a1c2b4d.css). The old hashed
+copies are removed, assets/manifest.json maps each source name to its current
+URL, and every HTML page's href/src pointing at a source file (styles.css,
+/styles.css, ../../styles.css) or at an older hash is rewritten to the new URL.
+
+A hashed file never changes content, so server.py serves /assets/ with a
+year-long immutable Cache-Control; pages themselves stay no-cache and pick up a
+new hash on the next build. The source files stay where they are for editing.
+
+minify_html() is used by the build on the pages it generates; hand-written
+pages (index.html, 404.html, utilities/*) only get their references rewritten.
+
+Usage (from repo root):
+  python3 scripts/python/assets.py      # re-fingerprint after editing a stylesheet
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+
+ASSETS_DIR = 'assets'
+HASH_LEN = 10
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Directories whose HTML is not served as a page
+SKIP_DIRS = {ASSETS_DIR, 'scripts', 'posts', 'node_modules', 'search'}
+
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+_RAW_BLOCKS = re.compile(r'(<(pre|textarea|script|style)\b[^>]*>)(.*?)(</\2\s*>)', re.S | re.I)
+_HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.S)
+
+
+def _minify_css_code(code):
+    code = re.sub(r'\s+', ' ', code)
+    code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+    code = re.sub(r':\s+', ':', code)
+    return code.replace(';}', '}')
+
+
+def minify_css(css):
+    """Drop comments and redundant whitespace; string literals are left untouched."""
+    out = []
+    pos = 0
+    for m in _CSS_TOKENS.finditer(css):
+        out.append(_minify_css_code(css[pos:m.start()]))
+        if m.group(1):
+            out.append(m.group(1))
+        pos = m.end()
+    out.append(_minify_css_code(css[pos:]))
+    return ''.join(out).strip()
+
+
+def _minify_html_text(text):
+    text = _HTML_COMMENT.sub('', text)
+    # A run with a newline stays a newline so inline elements keep their gap
+    return re.sub(r'\s+', lambda m: '\n' if '\n' in m.group(0) else ' ', text)
+
+
+def minify_html(html):
+    """Strip comments and collapse whitespace outside <pre>, <textarea>, <script> and <style>.
+
+    Inline <style> blocks are CSS-minified; script bodies are kept as written.
+    """
+    out = []
+    pos = 0
+    for m in _RAW_BLOCKS.finditer(html):
+        out.append(_minify_html_text(html[pos:m.start()]))
+        open_tag, tag, body, close_tag = m.groups()
+        if tag.lower() == 'style':
+            body = minify_css(body)
+        out.append(_minify_html_text(open_tag) + body + close_tag)
+        pos = m.end()
+    out.append(_minify_html_text(html[pos:]))
+    return ''.join(out).strip() + '\n'
+
+
+def source_assets(project_root: Path):
+    return sorted(p for p in project_root.iterdir() if p.is_file() and p.suffix in ('.css', '.js'))
+
+
+def hashed_name(path: Path, data: bytes):
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LEN]
+    return f'{path.stem}.{digest}{path.suffix}'
+
+
+def build_assets(project_root: Path):
+    """Write minified, hashed copies into assets/ and return {source name: URL}."""
+    out_dir = project_root / ASSETS_DIR
+    out_dir.mkdir(exist_ok=True)
+    manifest = {}
+    for src in source_assets(project_root):
+        text = src.read_text(encoding='utf-8')
+        data = (minify_css(text) if src.suffix == '.css' else text).encode('utf-8')
+        name = hashed_name(src, data)
+        target = out_dir / name
+        if not target.exists():
+            target.write_bytes(data)
+        stale = re.compile(rf'^{re.escape(src.stem)}\.[0-9a-f]{{{HASH_LEN}}}{re.escape(src.suffix)}$')
+        for old in out_dir.iterdir():
+            if old.name != name and stale.match(old.name):
+                old.unlink()
+        manifest[src.name] = f'/{ASSETS_DIR}/{name}'
+    (out_dir / 'manifest.json').write_text(json.dumps(manifest, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+    return manifest
+
+
+def reference_pattern(names):
+    """href/src values that point at one of `names`, hashed or not, from any directory depth."""
+    alternatives = '|'.join(
+        rf'{re.escape(Path(n).stem)}(?:\.[0-9a-f]{{{HASH_LEN}}})?{re.escape(Path(n).suffix)}' for n in names
+    )
+    return re.compile(rf'(\b(?:href|src)=)(["\'])((?:\.\./)*/?(?:{ASSETS_DIR}/)?)({alternatives})\2')
+
+
+def rewrite_references(html, manifest):
+    pattern = reference_pattern(manifest)
+
+    def swap(m):
+        stem, _, rest = m.group(4).partition('.')
+        source = f'{stem}.{rest.rsplit(".", 1)[-1]}'
+        return f'{m.group(1)}{m.group(2)}{manifest[source]}{m.group(2)}'
+
+    return pattern.sub(swap, html)
+
+
+def html_pages(project_root: Path):
+    for path in sorted(project_root.rglob('*.html')):
+        rel = path.relative_to(project_root).parts
+        if any(part.startswith('.') for part in rel) or rel[0] in SKIP_DIRS:
+            continue
+        yield path
+
+
+def rewrite_pages(project_root: Path, manifest):
+    """Point every page at the current hashed assets; returns the number of files changed."""
+    changed = 0
+    for path in html_pages(project_root):
+        html = path.read_text(encoding='utf-8')
+        updated = rewrite_references(html, manifest)
+        if updated != html:
+            path.write_text(updated, encoding='utf-8')
+            changed += 1
+    return changed
+
+
+def fingerprint(project_root: Path):
+    manifest = build_assets(project_root)
+    changed = rewrite_pages(project_root, manifest)
+    for src, url in manifest.items():
+        before = (project_root / src).stat().st_size
+        after = (project_root / url.lstrip('/')).stat().st_size
+        print(f"  ✓ {src} -> {url} ({before / 1024:.1f} KiB -> {after / 1024:.1f} KiB)")
+    print(f"  ✓ Rewrote asset references in {changed} pages")
+    return manifest
+
+
+def main():
+    fingerprint(Path(__file__).resolve().parent.parent.parent)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,702 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the site pipelines, run on synthetic inputs of a chosen size.
+
+Generators build markdown posts, Google Timeline and Location History Visualizer
+exports, gallery.json files and JPEGs carrying EXIF (date + GPS) and, for half
+of them, an XMP packet. The harness then times:
+
+  markdown_to_html          convert_markdown_to_html.py, every generated post
+  load_location_history     location_to_route.py, Timeline and visualizer files
+  archive_route_points      location_archive.py, the same Timeline export sliced from the binary archive
+  filter_track              location_to_route.py, spike rejection + stay-points on the loaded track
+  simplify_route / rdp      location_to_route.py, on the loaded track
+  extract_date_taken        add_to_gallery.py, XMP and EXIF-only JPEGs
+  downscale_24mp*           review_gallery.py's downscale of 6000x4000 JPEGs: the old full decode +
+                            LANCZOS, the draft-mode render, and a derivative-cache hit
+  append_to_gallery         add_to_gallery.py into a scratch gallery store, then export
+  s3_has_content            add_to_gallery.py HEADs against stub_s3.py
+  fetch_all_documents       sync_mixpeek_clusters.py paging against stub_mixpeek.py
+  server_request            server.py's SPA handler over a generated site tree
+
+Everything runs offline: S3 calls go to a local stub_s3 server (via
+AWS_ENDPOINT_URL and dummy credentials) and Mixpeek calls to stub_mixpeek.
+
+Each benchmark runs --repeat times; results (median/min seconds and per-item
+cost) are written as JSON. `compare` flags benchmarks whose median got slower
+than the baseline by more than --threshold and exits non-zero if any did.
+
+Usage (from repo root):
+  python3 scripts/python/bench.py run                          # small scale, bench-<time>.json
+  python3 scripts/python/bench.py run --scale medium --out baseline.json
+  python3 scripts/python/bench.py run --only rdp,simplify_route --baseline baseline.json
+  python3 scripts/python/bench.py compare baseline.json bench-20250101-120000.json
+  python3 scripts/python/bench.py generate --scale large --out /tmp/fixtures   # keep the inputs
+  python3 scripts/python/bench.py list
+
+Requires: pip install boto3 numpy Pillow requests
+"""
+
+import argparse
+import http.client
+import importlib.util
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer
+
+from PIL import Image
+
+try:
+    from . import add_to_gallery, convert_markdown_to_html, location_archive, location_to_route
+    from . import review_gallery, stub_mixpeek, stub_s3, sync_mixpeek_clusters
+except ImportError:
+    import add_to_gallery
+    import convert_markdown_to_html
+    import location_archive
+    import location_to_route
+    import review_gallery
+    import stub_mixpeek
+    import stub_s3
+    import sync_mixpeek_clusters
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+SCALES = {
+    "small": {"posts": 20, "timeline_segments": 400, "visualizer_points": 20000, "gallery": 500,
+              "jpegs": 24, "jpeg_px": 1024, "photos_24mp": 2, "appends": 100, "s3_keys": 50,
+              "requests": 200, "repeat": 5},
+    "medium": {"posts": 100, "timeline_segments": 2000, "visualizer_points": 100000, "gallery": 5000,
+               "jpegs": 60, "jpeg_px": 2048, "photos_24mp": 4, "appends": 500, "s3_keys": 200,
+               "requests": 1000, "repeat": 5},
+    "large": {"posts": 400, "timeline_segments": 10000, "visualizer_points": 500000, "gallery": 20000,
+              "jpegs": 120, "jpeg_px": 4000, "photos_24mp": 8, "appends": 2000, "s3_keys": 500,
+              "requests": 3000, "repeat": 3},
+}
+
+# Ignore slowdowns smaller than this; sub-millisecond timings are mostly noise
+NOISE_FLOOR_S = 0.002
+S3_BUCKET = "bench-bucket"
+S3_PREFIX = "album/"
+
+
+# =====================
+# Synthetic inputs
+# =====================
+
+WORDS = ("road trip coast desert canyon river city night market bridge harbor summit trail "
+         "ferry island valley forest museum station border village lake glacier").split()
+
+
+def _sentence(rng, n=None):
+    words = [rng.choice(WORDS) for _ in range(n or rng.randint(8, 20))]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + "."
+
+
+def make_post(rng, paragraphs=30):
+    """A markdown body using every construct markdown_to_html handles."""
+    parts = [f"# {_sentence(rng, 5)[:-1]}"]
+    for i in range(paragraphs):
+        kind = i % 6
+        if kind == 0:
+            parts.append(f"## {_sentence(rng, 4)[:-1]}")
+        elif kind == 1:
+            parts.append("\n".join(f"- {_sentence(rng, 6)} **{rng.choice(WORDS)}**" for _ in range(4)))
+        elif kind == 2:
+            body = "\n".join(f"    x = compute({j}) < {j * 2} && ok" for j in range(rng.randint(3, 12)))
+            parts.append(f"```python\n{body}\n```")
+        elif kind == 3:
+            parts.append(f"![{rng.choice(WORDS)}](https://example.com/img/{i}.jpg)")
+        elif kind == 4:
+            parts.append(f"> {_sentence(rng)}")
+        parts.append(" ".join(
+            f"{_sentence(rng)} See [{rng.choice(WORDS)}](https://example.com/{i}) and *{rng.choice(WORDS)}* "
+            f"or `{rng.choice(WORDS)}()`." for _ in range(3)))
+    return "\n\n".join(parts) + "\n"
+
+
+def make_track(rng, n, start=(37.77, -122.42)):
+    """A drifting road trip: mostly steady progress, with dwells that jitter in place."""
+    lat, lng = start
+    heading = rng.uniform(0, 2 * math.pi)
+    points = []
+    dwell = 0
+    for _ in range(n):
+        if dwell:
+            dwell -= 1
+            points.append((lat + rng.gauss(0, 0.0002), lng + rng.gauss(0, 0.0002)))
+            continue
+        if rng.random() < 0.003:
+            dwell = rng.randint(20, 200)
+        heading += rng.gauss(0, 0.15)
+        step = rng.uniform(0.0005, 0.003)
+        lat = max(-80.0, min(80.0, lat + step * math.cos(heading)))
+        lng = (lng + step * math.sin(heading) / max(0.2, math.cos(math.radians(lat))) + 180) % 360 - 180
+        points.append((lat, lng))
+    return points
+
+
+def _iso(when):
+    return when.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def make_visualizer_export(rng, n, start=datetime(2024, 6, 1, tzinfo=timezone.utc)):
+    return [{"lat": round(lat, 7), "lng": round(lng, 7), "timestamp": _iso(start + timedelta(seconds=30 * i))}
+            for i, (lat, lng) in enumerate(make_track(rng, n))]
+
+
+def make_timeline_export(rng, segments, start=datetime(2024, 6, 1, tzinfo=timezone(timedelta(hours=-7)))):
+    """Timeline.json: alternating timelinePath runs, visits and activities."""
+    track = iter(make_track(rng, segments * 12))
+    geo = lambda p: f"geo:{p[0]:.7f},{p[1]:.7f}"
+    out = []
+    when = start
+    for i in range(segments):
+        minutes = rng.randint(10, 90)
+        end = when + timedelta(minutes=minutes)
+        seg = {"startTime": when.isoformat(timespec="milliseconds"), "endTime": end.isoformat(timespec="milliseconds")}
+        kind = i % 3
+        if kind == 0:
+            seg["timelinePath"] = [{"point": geo(next(track)), "durationMinutesOffsetFromStartTime": str(j * minutes // 10)}
+                                   for j in range(10)]
+        elif kind == 1:
+            p = next(track)
+            seg["visit"] = {"hierarchyLevel": "0", "probability": "0.9",
+                            "topCandidate": {"placeID": f"place{i}", "semanticType": "Unknown", "placeLocation": geo(p)}}
+        else:
+            a, b = next(track), next(track)
+            seg["activity"] = {"start": geo(a), "end": geo(b), "distanceMeters": "1500.0",
+                               "topCandidate": {"type": "in passenger vehicle", "probability": "0.8"}}
+        out.append(seg)
+        when = end
+    return out
+
+
+def make_gallery(rng, n, clusters=12):
+    base = datetime(2019, 1, 1)
+    entries = []
+    for i, (lat, lng) in enumerate(make_track(rng, n)):
+        cid = i % clusters
+        entry = {"url": f"https://cdn.example.com/album/IMG_{i:05d}.JPG", "name": rng.choice(WORDS).title()}
+        if rng.random() < 0.85:
+            entry["lat"], entry["lng"] = round(lat, 6), round(lng, 6)
+        if rng.random() < 0.9:
+            entry["date_taken"] = (base + timedelta(days=rng.randint(0, 2000))).strftime("%Y-%m-%d")
+        entry.update({"cluster_id": cid, "cluster_label": f"Cluster {cid}", "cluster_color": "#3388ff"})
+        entries.append(entry)
+    return entries
+
+
+def _dms(value):
+    value = abs(value)
+    d = int(value)
+    m = int((value - d) * 60)
+    return (float(d), float(m), round((value - d - m / 60) * 3600, 2))
+
+
+def xmp_segment(date):
+    packet = (
+        '<?xpacket begin="﻿" id="W5M0MpCehiHzreSzNTczkc9d"?>'
+        '<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+        '<rdf:Description rdf:about="" xmlns:xmp="http://ns.adobe.com/xap/1.0/">'
+        f"<xmp:CreateDate>{date}</xmp:CreateDate></rdf:Description></rdf:RDF></x:xmpmeta>"
+        '<?xpacket end="w"?>'
+    ).encode()
+    body = b"http://ns.adobe.com/xap/1.0/\x00" + packet
+    return b"\xff\xe1" + (len(body) + 2).to_bytes(2, "big") + body
+
+
+def make_jpeg(rng, px, lat, lng, when, with_xmp):
+    """Noisy JPEG (so its size is photo-like) with EXIF date/GPS and optionally an XMP packet."""
+    w, h = px, px * 3 // 4
+    tile = Image.frombytes("RGB", (256, 192), rng.randbytes(256 * 192 * 3))
+    img = Image.new("RGB", (w, h))
+    for x in range(0, w, 256):
+        for y in range(0, h, 192):
+            img.paste(tile, (x, y))
+    exif = Image.Exif()
+    exif[0x0110] = "Bench Camera"
+    exif.get_ifd(0x8769)[36867] = when.strftime("%Y:%m:%d %H:%M:%S")
+    gps = exif.get_ifd(0x8825)
+    gps[1], gps[2] = ("N" if lat >= 0 else "S"), _dms(lat)
+    gps[3], gps[4] = ("E" if lng >= 0 else "W"), _dms(lng)
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=90, exif=exif)
+    data = buf.getvalue()
+    if with_xmp:
+        data = data[:2] + xmp_segment(when.strftime("%Y-%m-%dT%H:%M:%S-07:00")) + data[2:]
+    return data
+
+
+def make_photo(rng, w=6000, h=4000):
+    """Camera-sized JPEG with photo-like detail: a gradient under smoothed noise, not pure noise."""
+    base = Image.linear_gradient("L").resize((w, h)).convert("RGB")
+    detail = Image.frombytes("RGB", (w // 16, h // 16), rng.randbytes((w // 16) * (h // 16) * 3))
+    img = Image.blend(base, detail.resize((w, h), Image.BICUBIC), 0.35)
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=92)
+    return buf.getvalue()
+
+
+def make_site(root, rng, posts):
+    """A site tree shaped like the repo's, for server.py's handler."""
+    os.makedirs(os.path.join(root, "articles"), exist_ok=True)
+    os.makedirs(os.path.join(root, "album"), exist_ok=True)
+    shell = "<!doctype html><html><body>" + "".join(f"<p>{_sentence(rng)}</p>" for _ in range(400)) + "</body></html>"
+    for path in ("index.html", "album/index.html"):
+        with open(os.path.join(root, path), "w") as f:
+            f.write(shell)
+    with open(os.path.join(root, "styles.css"), "w") as f:
+        f.write("".join(f".c{i} {{ margin: {i}px; }}\n" for i in range(2000)))
+    for i, body in enumerate(posts[:20]):
+        with open(os.path.join(root, "articles", f"post-{i}.html"), "w") as f:
+            f.write(convert_markdown_to_html.markdown_to_html(body))
+
+
+def generate(out_dir, scale, seed=1):
+    """Write every synthetic input under out_dir; returns their paths."""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {"root": out_dir}
+
+    posts_dir = os.path.join(out_dir, "posts")
+    os.makedirs(posts_dir, exist_ok=True)
+    posts = [make_post(rng) for _ in range(scale["posts"])]
+    for i, body in enumerate(posts):
+        with open(os.path.join(posts_dir, f"post-{i}.md"), "w") as f:
+            f.write(f'---\ntitle: "Post {i}"\ndate: "2024-01-01"\n---\n{body}')
+    paths["posts"] = posts_dir
+
+    paths["timeline"] = os.path.join(out_dir, "Timeline.json")
+    with open(paths["timeline"], "w") as f:
+        json.dump(make_timeline_export(rng, scale["timeline_segments"]), f)
+    paths["visualizer"] = os.path.join(out_dir, "location-history.json")
+    with open(paths["visualizer"], "w") as f:
+        json.dump(make_visualizer_export(rng, scale["visualizer_points"]), f)
+
+    paths["gallery"] = os.path.join(out_dir, "gallery.json")
+    with open(paths["gallery"], "w") as f:
+        json.dump(make_gallery(rng, scale["gallery"]), f, separators=(",", ":"))
+
+    jpeg_dir = os.path.join(out_dir, "jpegs")
+    os.makedirs(jpeg_dir, exist_ok=True)
+    start = datetime(2023, 5, 1, 9, 0)
+    for i, (lat, lng) in enumerate(make_track(rng, scale["jpegs"])):
+        data = make_jpeg(rng, scale["jpeg_px"], lat, lng, start + timedelta(hours=7 * i), with_xmp=i % 2 == 0)
+        with open(os.path.join(jpeg_dir, f"IMG_{i:05d}.JPG"), "wb") as f:
+            f.write(data)
+    paths["jpegs"] = jpeg_dir
+
+    paths["site"] = os.path.join(out_dir, "site")
+    make_site(paths["site"], rng, posts)
+    return paths
+
+
+# =====================
+# Local fakes
+# =====================
+
+def _serve(handler_cls):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@contextmanager
+def offline_services(paths, scale):
+    """Start stub S3 and Mixpeek servers and point boto3 at the S3 one."""
+    s3_store = stub_s3.Store(S3_BUCKET, S3_PREFIX, scale["s3_keys"], 4096)
+    s3 = _serve(stub_s3.make_handler(s3_store, 0.0, 1000))
+    docs = stub_mixpeek.make_documents(paths["gallery"], 12)
+    mixpeek = _serve(stub_mixpeek.make_handler(docs, 0.0, 0.0, {"requests": 0, "failures": 0}))
+    env = {
+        "AWS_ENDPOINT_URL": f"http://127.0.0.1:{s3.server_address[1]}",
+        "AWS_ACCESS_KEY_ID": "bench", "AWS_SECRET_ACCESS_KEY": "bench",
+        "AWS_DEFAULT_REGION": "us-east-1", "AWS_EC2_METADATA_DISABLED": "true",
+    }
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        yield {"s3_store": s3_store, "mixpeek_url": f"http://127.0.0.1:{mixpeek.server_address[1]}/v1"}
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        s3.shutdown()
+        mixpeek.shutdown()
+
+
+def load_server_module():
+    spec = importlib.util.spec_from_file_location("site_server", os.path.join(REPO_ROOT, "server.py"))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+# =====================
+# Benchmarks
+# =====================
+# Each returns {"fn": callable, "items": n} and optionally "setup" (untimed,
+# called before every run; its return value is passed to fn).
+
+def bench_markdown_to_html(ctx):
+    posts = []
+    for name in sorted(os.listdir(ctx["paths"]["posts"])):
+        with open(os.path.join(ctx["paths"]["posts"], name)) as f:
+            posts.append(convert_markdown_to_html.parse_frontmatter(f.read())[1])
+    return {"fn": lambda _: [convert_markdown_to_html.markdown_to_html(p) for p in posts], "items": len(posts)}
+
+
+def bench_load_location_history_timeline(ctx):
+    path = ctx["paths"]["timeline"]
+    return {"fn": lambda _: location_to_route.load_location_history(path), "items": ctx["scale"]["timeline_segments"]}
+
+
+def bench_load_location_history_visualizer(ctx):
+    path = ctx["paths"]["visualizer"]
+    return {"fn": lambda _: location_to_route.load_location_history(path), "items": ctx["scale"]["visualizer_points"]}
+
+
+def bench_archive_route_points(ctx):
+    archive_dir = os.path.join(ctx["workdir"], "location-archive")
+    if not os.path.exists(archive_dir):
+        location_archive.LocationArchive(archive_dir).ingest(ctx["paths"]["timeline"])
+    archive = location_archive.LocationArchive(archive_dir)
+    return {"fn": lambda _: archive.route_points(), "items": ctx["scale"]["timeline_segments"]}
+
+
+def _track_points(ctx):
+    if "track" not in ctx:
+        ctx["track"] = location_to_route.load_location_history(ctx["paths"]["visualizer"])
+    return ctx["track"]
+
+
+def bench_filter_track(ctx):
+    points = _track_points(ctx)
+    return {"fn": lambda _: location_to_route.filter_track(points), "items": len(points)}
+
+
+def bench_simplify_route(ctx):
+    points = _track_points(ctx)
+    return {"fn": lambda _: location_to_route.simplify_route(points, min_distance_m=100, max_points=2000, epsilon_m=25),
+            "items": len(points)}
+
+
+def bench_rdp(ctx):
+    points = _track_points(ctx)
+    lat_scale = math.cos(math.radians(sum(p[0] for p in points) / len(points)))
+    return {"fn": lambda _: location_to_route.rdp(points, 25, lat_scale), "items": len(points)}
+
+
+def bench_extract_date_taken(ctx):
+    jpeg_dir = ctx["paths"]["jpegs"]
+    files = [os.path.join(jpeg_dir, n) for n in sorted(os.listdir(jpeg_dir))]
+    return {"fn": lambda _: [add_to_gallery.extract_date_taken(p) for p in files], "items": len(files)}
+
+
+def _scratch_repo(ctx):
+    root = tempfile.mkdtemp(prefix="bench-repo-", dir=ctx["workdir"])
+    os.makedirs(os.path.join(root, "images"))
+    shutil.copy(ctx["paths"]["gallery"], os.path.join(root, "images", "gallery.json"))
+    return root
+
+
+def _photos_24mp(ctx):
+    photo_dir = os.path.join(ctx["workdir"], "photos-24mp")
+    if not os.path.exists(photo_dir):
+        os.makedirs(photo_dir)
+        rng = random.Random(11)
+        for i in range(ctx["scale"]["photos_24mp"]):
+            with open(os.path.join(photo_dir, f"DSC_{i:04d}.JPG"), "wb") as f:
+                f.write(make_photo(rng))
+    return [os.path.join(photo_dir, n) for n in sorted(os.listdir(photo_dir))]
+
+
+def _full_decode_downscale(src, dest, max_dim):
+    """review_gallery.downscale() before draft decoding and the derivative cache, kept as the reference."""
+    with Image.open(src) as img:
+        img = img.convert("RGB")
+        w, h = img.size
+        scale = min(1.0, max_dim / max(w, h))
+        if scale < 1.0:
+            img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+        img.save(dest, "JPEG", quality=85)
+
+
+def bench_downscale_24mp_full_decode(ctx):
+    files = _photos_24mp(ctx)
+    out = tempfile.mkdtemp(prefix="full-", dir=ctx["workdir"])
+    return {"fn": lambda _: [_full_decode_downscale(p, os.path.join(out, os.path.basename(p)), 2048) for p in files],
+            "items": len(files)}
+
+
+def bench_downscale_24mp(ctx):
+    """Draft-mode render with an empty cache each run (includes hashing the source)."""
+    files = _photos_24mp(ctx)
+    return {"setup": lambda: tempfile.mkdtemp(prefix="thumbs-", dir=ctx["workdir"]),
+            "fn": lambda thumbs: [review_gallery.downscale(p, 2048, thumbs) for p in files],
+            "items": len(files)}
+
+
+def bench_downscale_24mp_cached(ctx):
+    files = _photos_24mp(ctx)
+    thumbs = tempfile.mkdtemp(prefix="thumbs-", dir=ctx["workdir"])
+    return {"fn": lambda _: [review_gallery.downscale(p, 2048, thumbs) for p in files], "items": len(files)}
+
+
+def bench_append_to_gallery(ctx):
+    """Batch ingest: upsert into a caller-owned store, export once."""
+    n = ctx["scale"]["appends"]
+    new = make_gallery(random.Random(7), n)
+
+    def setup():
+        root = _scratch_repo(ctx)
+        return root, add_to_gallery.open_gallery_store(root)
+
+    def run(state):
+        root, store = state
+        for i, e in enumerate(new):
+            add_to_gallery.append_to_gallery(root, f"https://cdn.example.com/new/IMG_{i:05d}.JPG", e["name"],
+                                             e.get("lat"), e.get("lng"), e.get("date_taken"), store=store)
+        store.export()
+        store.close()
+        add_to_gallery.refresh_album(root)
+
+    return {"setup": setup, "fn": run, "items": n}
+
+
+def bench_append_to_gallery_single(ctx):
+    """One add_to_gallery.py run: open the store, upsert, export gallery.json and its indexes, rebuild map clusters."""
+    def run(root):
+        add_to_gallery.append_to_gallery(root, "https://cdn.example.com/new/IMG_single.JPG", "Single", 36.1, -115.2,
+                                         "2024-02-02")
+
+    def setup():
+        root = _scratch_repo(ctx)
+        add_to_gallery.open_gallery_store(root).close()  # initial import is not part of an append
+        return root
+
+    return {"setup": setup, "fn": run, "items": 1}
+
+
+def bench_s3_has_content(ctx):
+    store = ctx["services"]["s3_store"]
+    keys = store.keys + [f"{S3_PREFIX}MISSING_{i:05d}.JPG" for i in range(len(store.keys))]
+    return {"fn": lambda _: [add_to_gallery.s3_has_content(S3_BUCKET, k, "0" * 64, store.etag) for k in keys],
+            "items": len(keys)}
+
+
+def bench_fetch_all_documents(ctx):
+    url = ctx["services"]["mixpeek_url"]
+    return {"fn": lambda _: sync_mixpeek_clusters.fetch_all_documents(url), "items": ctx["scale"]["gallery"]}
+
+
+def bench_server_request(ctx):
+    """Sequential GETs through server.py's handler: files, directory indexes, SPA fallback and 404s."""
+    server_mod = load_server_module()
+
+    class QuietHandler(server_mod.SPAHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+    paths = ["/", "/album", "/articles/post-3.html", "/styles.css", "/road", "/articles", "/missing.png"]
+    n = ctx["scale"]["requests"]
+
+    def run(port):
+        for i in range(n):
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            conn.request("GET", paths[i % len(paths)])
+            conn.getresponse().read()
+            conn.close()
+
+    cwd = os.getcwd()
+    os.chdir(ctx["paths"]["site"])  # the handler resolves paths against the working directory
+    server = _serve(QuietHandler)
+    ctx["cleanup"].append(server.shutdown)
+    ctx["cleanup"].append(lambda: os.chdir(cwd))
+    return {"fn": lambda _: run(server.server_address[1]), "items": n}
+
+
+BENCHMARKS = {
+    "markdown_to_html": bench_markdown_to_html,
+    "load_location_history_timeline": bench_load_location_history_timeline,
+    "load_location_history_visualizer": bench_load_location_history_visualizer,
+    "archive_route_points": bench_archive_route_points,
+    "filter_track": bench_filter_track,
+    "simplify_route": bench_simplify_route,
+    "rdp": bench_rdp,
+    "extract_date_taken": bench_extract_date_taken,
+    "downscale_24mp_full_decode": bench_downscale_24mp_full_decode,
+    "downscale_24mp": bench_downscale_24mp,
+    "downscale_24mp_cached": bench_downscale_24mp_cached,
+    "append_to_gallery": bench_append_to_gallery,
+    "append_to_gallery_single": bench_append_to_gallery_single,
+    "s3_has_content": bench_s3_has_content,
+    "fetch_all_documents": bench_fetch_all_documents,
+    "server_request": bench_server_request,
+}
+
+
+def measure(spec, repeat):
+    runs = []
+    for _ in range(repeat):
+        state = spec["setup"]() if "setup" in spec else None
+        t = time.perf_counter()
+        spec["fn"](state)
+        runs.append(time.perf_counter() - t)
+    median = statistics.median(runs)
+    return {
+        "items": spec["items"], "repeat": repeat, "runs_s": [round(r, 6) for r in runs],
+        "median_s": round(median, 6), "min_s": round(min(runs), 6),
+        "per_item_us": round(median / max(spec["items"], 1) * 1e6, 3),
+    }
+
+
+def run_benchmarks(names, scale_name, repeat=None, workdir=None, seed=1):
+    scale = SCALES[scale_name]
+    repeat = repeat or scale["repeat"]
+    own_dir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="site-bench-")
+    print(f"Generating {scale_name} inputs in {workdir} ...")
+    t = time.perf_counter()
+    paths = generate(os.path.join(workdir, "inputs"), scale, seed)
+    print(f"  done in {time.perf_counter() - t:.1f}s")
+
+    results = {}
+    try:
+        with offline_services(paths, scale) as services:
+            for name in names:
+                ctx = {"paths": paths, "scale": scale, "services": services, "workdir": workdir, "cleanup": []}
+                try:
+                    spec = BENCHMARKS[name](ctx)
+                    spec["fn"](spec["setup"]() if "setup" in spec else None)  # warm-up: imports, page cache
+                    results[name] = measure(spec, repeat)
+                finally:
+                    for fn in reversed(ctx["cleanup"]):
+                        fn()
+                r = results[name]
+                print(f"  {name:<34} {r['median_s'] * 1000:10.2f} ms  {r['per_item_us']:10.1f} us/item  "
+                      f"(n={r['items']})")
+    finally:
+        if own_dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "version": 1,
+        "created": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "scale": scale_name, "seed": seed,
+        "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """Print a per-benchmark comparison; returns the names that regressed."""
+    if baseline.get("scale") != current.get("scale"):
+        print(f"Warning: comparing scale {current.get('scale')} against baseline scale {baseline.get('scale')}")
+    if baseline.get("platform") != current.get("platform"):
+        print(f"Warning: baseline ran on {baseline.get('platform')}")
+    regressions = []
+    names = list(dict.fromkeys(list(baseline["results"]) + list(current["results"])))
+    width = max(len(n) for n in names) if names else 4
+    print(f"{'benchmark':<{width}}  {'baseline ms':>12}  {'current ms':>12}  {'change':>8}")
+    for name in names:
+        base, cur = baseline["results"].get(name), current["results"].get(name)
+        if base is None or cur is None:
+            print(f"{name:<{width}}  {'only in ' + ('current' if base is None else 'baseline'):>36}")
+            continue
+        ratio = cur["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        slower = cur["median_s"] - base["median_s"]
+        flag = ""
+        if ratio > 1 + threshold and slower > NOISE_FLOOR_S:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"{name:<{width}}  {base['median_s'] * 1000:12.2f}  {cur['median_s'] * 1000:12.2f}  "
+              f"{(ratio - 1) * 100:+7.1f}%{flag}")
+    return regressions
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the site pipelines on synthetic inputs")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="generate inputs, time the benchmarks, write results JSON")
+    r.add_argument("--scale", choices=sorted(SCALES), default="small")
+    r.add_argument("--only", help="comma-separated benchmark names (see `list`)")
+    r.add_argument("--repeat", type=int, help="timed runs per benchmark (default depends on --scale)")
+    r.add_argument("--seed", type=int, default=1)
+    r.add_argument("--workdir", help="keep generated inputs here instead of a temp dir")
+    r.add_argument("--out", help="results file (default bench-<time>.json)")
+    r.add_argument("--baseline", help="compare against this results file when done")
+    r.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before flagging (0.15 = 15%%)")
+
+    c = sub.add_parser("compare", help="flag regressions of CURRENT against BASELINE")
+    c.add_argument("baseline")
+    c.add_argument("current")
+    c.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before flagging (0.15 = 15%%)")
+
+    g = sub.add_parser("generate", help="only write the synthetic inputs")
+    g.add_argument("--scale", choices=sorted(SCALES), default="small")
+    g.add_argument("--seed", type=int, default=1)
+    g.add_argument("--out", required=True)
+
+    sub.add_parser("list", help="list benchmark names")
+    args = ap.parse_args()
+
+    if args.cmd == "list":
+        print("\n".join(BENCHMARKS))
+        return
+    if args.cmd == "generate":
+        paths = generate(args.out, SCALES[args.scale], args.seed)
+        for k, v in paths.items():
+            print(f"{k:<11} {v}")
+        return
+    if args.cmd == "compare":
+        regressions = compare(_load(args.baseline), _load(args.current), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        return
+
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        ap.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    doc = run_benchmarks(names, args.scale, args.repeat, args.workdir, args.seed)
+    out = args.out or f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(out, "w") as f:
+        json.dump(doc, f, indent=2)
+        f.write("\n")
+    print(f"Results written to {out}")
+    if args.baseline:
+        print()
+        regressions = compare(_load(args.baseline), doc, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
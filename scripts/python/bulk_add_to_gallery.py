@@ -13,6 +13,14 @@ Usage examples:
   python scripts/python/bulk_add_to_gallery.py --dir /abs/path/to/folder
   python scripts/python/bulk_add_to_gallery.py --name-empty --no-move
   python scripts/python/bulk_add_to_gallery.py --bucket ethan.dev --prefix album/
+  python scripts/python/bulk_add_to_gallery.py --dedupe   # skip content already in S3/gallery
+  python scripts/python/bulk_add_to_gallery.py --derivatives   # WebP/AVIF srcset, rendered in parallel
+  python scripts/python/bulk_add_to_gallery.py --allow-near-duplicate   # keep burst frames / edits
+
+As in add_to_gallery.py, each file's perceptual hash is checked against the
+gallery's (.gallery-cache/phash.json); near-duplicates are skipped and left in
+place unless --allow-near-duplicate is passed. Added files are recorded in that
+index, so a burst within one batch is caught too.
 """
 
 import argparse
@@ -34,6 +42,8 @@ except Exception:
     assert spec and spec.loader
     spec.loader.exec_module(single)  # type: ignore
 
+instrument = single.load_sibling('instrument')
+
 
 IMAGE_EXTS = {'.jpg', '.jpeg', '.png', '.JPG', '.JPEG', '.PNG', '.heic', '.HEIC'}
 
@@ -53,11 +63,12 @@ def derive_name_from_filename(file_path: str) -> str:
     return ' '.join(pretty.split())
 
 
-def process_one(file_path: str, args, repo_root: str) -> bool:
+def process_one(file_path: str, args, repo_root: str, index=None, stats=None, variants=None, store=None) -> bool:
     try:
         lat, lng = args.lat, args.lng
         if lat is None or lng is None:
-            gps = single.extract_lat_lng(file_path)
+            with instrument.span('exif-gps'):
+                gps = single.extract_lat_lng(file_path)
             if gps:
                 lat, lng = gps
             else:
@@ -68,25 +79,66 @@ def process_one(file_path: str, args, repo_root: str) -> bool:
             prefix = prefix + '/'
         key = prefix + single.make_key(file_path)
 
-        single.upload_to_s3(file_path, args.bucket, key, region=args.region)
-        url = f"https://{args.cf_domain}/{key}"
-
-        name = '' if args.name_empty else derive_name_from_filename(file_path)
-        date_taken = None
-        try:
-            date_taken = single.extract_date_taken(file_path)
-        except Exception:
-            pass
-        single.append_to_gallery(repo_root, url, name, lat, lng, date_taken)
+        # Exact copies are --dedupe's job; only unseen content goes through the near-duplicate check
+        digests = single.file_digests(file_path) if index is not None else None
+        already_ingested = index is not None and digests[0] in index
+
+        with instrument.span('phash'):
+            hashes = single.perceptual_hashes(file_path)
+        if hashes and not already_ingested and not args.allow_near_duplicate:
+            matches = single.find_near_duplicates(repo_root, hashes, exclude_url=f"https://{args.cf_domain}/{key}")
+            if matches:
+                distance, match = matches[0]
+                print(f"[skip] {file_path}: near-duplicate of {match} ({distance} bits); "
+                      f"pass --allow-near-duplicate to add it")
+                instrument.count('files_near_duplicate')
+                if stats is not None:
+                    stats['near_duplicate'] += 1
+                return False
+
+        if index is not None:
+            with instrument.span('dedupe-upload', key=key):
+                url, uploaded, size = single.dedupe_upload(file_path, args.bucket, key, args.cf_domain, args.region, index,
+                                                           digests=digests)
+            instrument.count('bytes_uploaded' if uploaded else 'bytes_skipped', size)
+            if stats is not None:
+                stats['uploaded' if uploaded else 'skipped'] += 1
+                stats['bytes_uploaded' if uploaded else 'bytes_skipped'] += size
+            append = not single.gallery_has_url(repo_root, url, store)
+        else:
+            with instrument.span('upload', key=key):
+                single.upload_to_s3(file_path, args.bucket, key, region=args.region)
+            instrument.count('bytes_uploaded', os.path.getsize(file_path))
+            url = f"https://{args.cf_domain}/{key}"
+            append = True
+
+        if append:
+            name = '' if args.name_empty else derive_name_from_filename(file_path)
+            date_taken = None
+            try:
+                with instrument.span('exif-date'):
+                    date_taken = single.extract_date_taken(file_path)
+            except Exception:
+                pass
+            with instrument.span('placeholder'):
+                extra = single.placeholder_fields(file_path)
+            if variants:
+                with instrument.span('upload-derivatives', variants=len(variants)):
+                    extra['srcset'] = single.upload_srcset(variants, args.bucket, key, args.cf_domain, region=args.region)
+            with instrument.span('gallery-upsert'):
+                single.append_to_gallery(repo_root, url, name, lat, lng, date_taken, extra, store)
+            single.record_hashes(repo_root, url, hashes)
 
         if args.move:
             dest_dir = os.path.join(args.dir, 'processed')
             os.makedirs(dest_dir, exist_ok=True)
             shutil.move(file_path, os.path.join(dest_dir, os.path.basename(file_path)))
         print(f"[ok] {file_path}")
+        instrument.count('files_ok')
         return True
     except Exception as e:
         print(f"[err] {file_path}: {e}")
+        instrument.count('files_failed')
         return False
 
 
@@ -106,9 +158,16 @@ def main():
     # Behaviors
     parser.add_argument('--name-empty', action='store_true', help='Do not derive a name from filename; leave blank')
     parser.add_argument('--no-move', dest='move', action='store_false', help='Do not move processed files')
+    parser.add_argument('--dedupe', action='store_true', help='Hash files and skip content already uploaded / listed')
+    parser.add_argument('--derivatives', action='store_true', help='Render and upload WebP/AVIF thumbnails, recorded as srcset')
+    parser.add_argument('--workers', type=int, help='Worker processes for derivative rendering (default: CPU count)')
+    parser.add_argument('--allow-near-duplicate', action='store_true',
+                        help='Add files that look like images already in the gallery')
     parser.set_defaults(move=True)
+    instrument.add_arguments(parser)
 
     args = parser.parse_args()
+    instrument.setup(args, 'bulk_add_to_gallery')
 
     if not os.path.isdir(args.dir):
         print(f"Input directory does not exist: {args.dir}", file=sys.stderr)
@@ -120,12 +179,39 @@ def main():
         print('No images found to process.')
         sys.exit(0)
 
+    index = single.load_content_index(repo_root) if args.dedupe else None
+    stats = {'uploaded': 0, 'skipped': 0, 'bytes_uploaded': 0, 'bytes_skipped': 0, 'near_duplicate': 0}
+
+    variants_by_file = {}
+    if args.derivatives:
+        deriv = single.load_sibling('image_derivatives')
+        print(f"Rendering derivatives for {len(files)} file(s)...")
+        with instrument.span('derivatives', files=len(files)):
+            variants_by_file = deriv.build_derivatives(files, single.derivatives_dir(repo_root), workers=args.workers)
+
     ok = 0
-    for f in files:
-        if process_one(f, args, repo_root):
-            ok += 1
+    store = single.open_gallery_store(repo_root)
+    try:
+        for f in files:
+            with instrument.span('file', path=os.path.basename(f)):
+                if process_one(f, args, repo_root, index, stats, variants_by_file.get(f), store):
+                    ok += 1
+    finally:
+        if index is not None:
+            single.save_content_index(repo_root, index)
+        # One export of gallery.json for the whole batch
+        with instrument.span('export'):
+            store.export()
+        store.close()
+        with instrument.span('refresh-album'):
+            single.refresh_album(repo_root)
 
     print(f"\nCompleted. Success: {ok} / {len(files)}")
+    if stats['near_duplicate']:
+        print(f"Skipped {stats['near_duplicate']} near-duplicate(s); pass --allow-near-duplicate to add them")
+    if args.dedupe:
+        print(f"Uploaded {stats['uploaded']} file(s), {stats['bytes_uploaded']} bytes; "
+              f"skipped {stats['skipped']} already present, {stats['bytes_skipped']} bytes not uploaded")
 
 
 if __name__ == '__main__':
@@ -2,14 +2,34 @@
 """
 Convert markdown posts to standalone HTML article pages.
 Reads markdown files from posts/ and generates HTML files in articles/
+
+Also emits posts-index.json: every post listed in posts.json with its metadata,
+reading time and pre-rendered HTML, so the SPA blog list loads in one request,
+and pre-renders the /articles, /album and /road routes (prerender_pages.py).
+
+Generated pages are minified, and the stylesheets are copied to content-hashed
+names under assets/ with every page's references rewritten (assets.py). When
+local Lora/Montserrat sources are available, article and utilities pages use
+subsetted, self-hosted WOFF2 faces instead of Google Fonts (webfonts.py).
+Routes without a hand-made image get a static /road thumbnail
+(route_previews.py). Last, 404.html is refreshed as a copy of index.html, which
+GitHub Pages serves as the SPA fallback for deep links.
 """
 
+import argparse
 import json
+import math
 import re
+import sys
 from html import escape as html_escape
 from pathlib import Path
 from textwrap import dedent
 
+import assets
+import highlight
+import instrument
+import webfonts
+
 def parse_frontmatter(content):
     """Extract frontmatter and content from markdown file."""
     frontmatter_pattern = r'^---\n(.*?)\n---\n(.*)$'
@@ -39,10 +59,16 @@ def markdown_to_html(markdown):
     def escape_html(text):
         return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
     
-    # Handle fenced code blocks
-    html = re.sub(r'```([\w#+-]*)\n(.*?)```', 
-                  lambda m: f'<pre><code class="language-{m.group(1).strip()}">{escape_html(m.group(2))}</code></pre>',
-                  html, flags=re.DOTALL)
+    # Fenced code blocks are highlighted now and set aside behind placeholders,
+    # so the inline rules below (emphasis, lists, paragraphs) can't touch them
+    code_blocks = []
+
+    def stash_code(m):
+        lang = m.group(1).strip()
+        code_blocks.append(f'<pre><code class="language-{lang}">{highlight.highlight_cached(m.group(2), lang)}</code></pre>')
+        return f'<!--code-block-{len(code_blocks) - 1}-->'
+
+    html = re.sub(r'```([\w#+-]*)\n(.*?)```', stash_code, html, flags=re.DOTALL)
     
     # Images (MUST be processed BEFORE links!)
     html = re.sub(r'!\[([^\]]*)\]\(([^)]+)\)', 
@@ -88,6 +114,7 @@ def markdown_to_html(markdown):
             html_paragraphs.append(f'<p>{para}</p>')
     
     html = '\n'.join(html_paragraphs)
+    html = re.sub(r'<!--code-block-(\d+)-->', lambda m: code_blocks[int(m.group(1))], html)
     
     return html
 
@@ -483,36 +510,140 @@ def build_utilities_page(project_root: Path):
     ''')
 
     output_path = utilities_dir / 'index.html'
-    output_path.write_text(template.lstrip(), encoding='utf-8')
+    output_path.write_text(assets.minify_html(template), encoding='utf-8')
     print(f"  ✓ Created utilities/index.html")
 
+LAST_EDITED_KEYS = ('lastEdited', 'lastedited', 'updated', 'last_updated', 'modified', 'last-edited')
+WORDS_PER_MINUTE = 200
+
+
+def reading_minutes(markdown):
+    words = len(re.findall(r"[\w'’-]+", markdown))
+    return max(1, math.ceil(words / WORDS_PER_MINUTE))
+
+
+def validate_posts_config(project_root: Path):
+    """Return the post paths from posts.json, exiting if any is missing or is not one render_posts() renders."""
+    config_path = project_root / 'posts.json'
+    config = json.loads(config_path.read_text(encoding='utf-8'))
+    paths = config.get('posts', [])
+    problems = []
+    for p in paths:
+        path = Path(p)
+        if not (project_root / p).is_file():
+            problems.append(f"posts.json lists {p}, which does not exist")
+        elif path.parent != Path('posts') or path.suffix != '.md' or path.name.startswith('_'):
+            problems.append(f"posts.json lists {p}, but only posts/*.md files not starting with '_' are rendered")
+    if problems:
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        sys.exit(1)
+    return paths
+
+
+def build_posts_index(project_root: Path, post_paths, rendered):
+    """Write posts-index.json for the posts listed in posts.json, newest first."""
+    posts = []
+    for path in post_paths:
+        post_id = Path(path).stem
+        metadata, markdown_content, html_content = rendered[post_id]
+        date = metadata.get('date', '')
+        last_edited = next((metadata[k] for k in LAST_EDITED_KEYS if metadata.get(k)), date)
+        posts.append({
+            'id': post_id,
+            'path': path,
+            'title': metadata.get('title', 'Untitled'),
+            'date': date,
+            'lastEdited': last_edited,
+            'description': metadata.get('description', ''),
+            'readingMinutes': reading_minutes(markdown_content),
+            'metadata': metadata,
+            'html': html_content,
+        })
+    posts.sort(key=lambda p: p['date'], reverse=True)
+
+    output_path = project_root / 'posts-index.json'
+    output_path.write_text(json.dumps({'posts': posts}, ensure_ascii=False, separators=(',', ':')), encoding='utf-8')
+    print(f"  ✓ Created posts-index.json ({len(posts)} posts)")
+
+def render_posts(project_root: Path):
+    """Parse and render every post in posts/; returns {post_id: (metadata, markdown, html)}."""
+    rendered = {}
+    for md_file in sorted((project_root / 'posts').glob('*.md')):
+        # Skip template
+        if md_file.name.startswith('_'):
+            continue
+        with instrument.span('parse', post=md_file.stem):
+            content = md_file.read_text(encoding='utf-8')
+            metadata, markdown_content = parse_frontmatter(content)
+        with instrument.span('render', post=md_file.stem):
+            html_content = markdown_to_html(markdown_content)
+        rendered[md_file.stem] = (metadata, markdown_content, html_content)
+        instrument.count('posts')
+    return rendered
+
+def build_search_index(project_root: Path, post_paths, rendered):
+    """Rebuild search/ over the listed posts and the gallery metadata."""
+    import search_index
+
+    listed = {Path(p).stem for p in post_paths}
+    manifest = search_index.build_index(
+        search_index.site_documents(project_root, {k: v for k, v in rendered.items() if k in listed}),
+        project_root / 'search',
+    )
+    print(f"  ✓ Created search/ index ({manifest['docs']} documents, {len(manifest['shards'])} shards)")
+
+def build_route_previews(project_root: Path):
+    """Draw static /road thumbnails for routes that would otherwise load a live map."""
+    try:
+        import route_previews
+    except ImportError:
+        print("  - Route previews skipped (pip install numpy)")
+        return
+    route_previews.build(project_root)
+
+def build_route_pages(project_root: Path):
+    """Pre-render /articles, /album and /road with their data inlined, after
+    bringing the album's map-clusters.json up to date with gallery.json."""
+    import map_clusters
+    import prerender_pages
+
+    gallery_path = project_root / 'images' / 'gallery.json'
+    if gallery_path.exists():
+        map_clusters.write_clusters(json.loads(gallery_path.read_text(encoding='utf-8')), str(gallery_path))
+    prerender_pages.build_route_pages(project_root)
+
+def build_spa_fallback(project_root: Path):
+    """Copy index.html to 404.html so unknown paths load the same, current SPA."""
+    index = project_root / 'index.html'
+    fallback = project_root / '404.html'
+    data = index.read_bytes()
+    if fallback.exists() and fallback.read_bytes() == data:
+        print("  ✓ 404.html up to date")
+        return
+    fallback.write_bytes(data)
+    print(f"  ✓ Copied index.html to {fallback.name}")
+
 def main():
+    parser = argparse.ArgumentParser(description='Convert markdown posts to HTML and rebuild the generated site files')
+    instrument.add_arguments(parser)
+    instrument.setup(parser.parse_args(), 'convert_markdown_to_html')
+
     # Get project root (two levels up from this script)
     script_dir = Path(__file__).parent
     project_root = script_dir.parent.parent
     
-    posts_dir = project_root / 'posts'
+    post_paths = validate_posts_config(project_root)
+    rendered = render_posts(project_root)
     
-    # Process each markdown file
-    for md_file in posts_dir.glob('*.md'):
-        # Skip template
-        if md_file.name.startswith('_'):
-            continue
-        
-        post_id = md_file.stem
+    # Write each rendered post
+    article_pages = []
+    for post_id, (metadata, markdown_content, html_content) in rendered.items():
         print(f"Processing {post_id}...")
         
-        # Read markdown
-        content = md_file.read_text(encoding='utf-8')
-        
-        # Parse frontmatter
-        metadata, markdown_content = parse_frontmatter(content)
-        
-        # Convert to HTML
-        html_content = markdown_to_html(markdown_content)
-        
         # Create full HTML page
-        full_html = create_article_html(post_id, metadata, html_content)
+        with instrument.span('template', post=post_id):
+            full_html = assets.minify_html(create_article_html(post_id, metadata, html_content))
         
         # Create article directory at root level (e.g., /convergence/)
         article_dir = project_root / post_id
@@ -520,10 +651,31 @@ def main():
         
         # Write to root-level directory as index.html
         output_file = article_dir / 'index.html'
-        output_file.write_text(full_html, encoding='utf-8')
+        with instrument.span('write', post=post_id):
+            output_file.write_text(full_html, encoding='utf-8')
+        instrument.count('bytes_written', len(full_html.encode('utf-8')))
+        article_pages.append(output_file)
         print(f"  ✓ Created {output_file}")
     
-    build_utilities_page(project_root)
+    highlight.save_cache()
+    
+    with instrument.span('posts-index'):
+        build_posts_index(project_root, post_paths, rendered)
+    with instrument.span('search-index'):
+        build_search_index(project_root, post_paths, rendered)
+    with instrument.span('utilities-page'):
+        build_utilities_page(project_root)
+    with instrument.span('webfonts'):
+        utilities_page = project_root / 'utilities' / 'index.html'
+        webfonts.self_host(project_root, article_pages + ([utilities_page] if utilities_page.exists() else []))
+    with instrument.span('route-previews'):
+        build_route_previews(project_root)
+    with instrument.span('route-pages'):
+        build_route_pages(project_root)
+    with instrument.span('assets'):
+        assets.fingerprint(project_root)
+    with instrument.span('spa-fallback'):
+        build_spa_fallback(project_root)
     
     print("\nDone! All markdown files converted to HTML and utilities page generated.")
 
@@ -1,9 +1,32 @@
+"""
+Download images under an S3 prefix into a local directory.
+
+Default mode downloads every key that does not exist locally yet. --sync is an
+rsync-style mode instead:
+
+  * the listing is streamed, and downloads start while later pages are listed
+  * each object's size, ETag and LastModified are compared against a local
+    manifest (<dest>/.s3-manifest.json), so stale or truncated files are refreshed
+  * changed objects download on a thread pool; large objects are fetched as
+    parallel ranged GETs (multipart) by boto3's transfer manager
+  * every file is written to a temp name and atomically renamed into place
+
+Usage:
+  python scripts/python/download_from_s3.py --dest scripts/album_inbox --sync --workers 16
+  python scripts/python/download_from_s3.py --sync --endpoint-url http://127.0.0.1:11700   # stub_s3.py
+"""
+
 import os
 import sys
+import json
 import argparse
-from typing import Iterable, List
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 
 
 DEFAULT_BUCKET = "ethan.dev"
@@ -82,6 +105,130 @@ def download_objects(
     return written
 
 
+MANIFEST_NAME = ".s3-manifest.json"
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+)
+
+
+def make_client(endpoint_url: Optional[str] = None, max_pool: int = 32):
+    config = Config(max_pool_connections=max_pool)
+    if endpoint_url:
+        config = config.merge(Config(s3={"addressing_style": "path"}))
+    return boto3.client("s3", endpoint_url=endpoint_url, config=config)
+
+
+def list_objects(s3, bucket: str, prefix: str) -> Iterator[dict]:
+    """Yield object summaries (Key, Size, ETag, LastModified) page by page as they arrive."""
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for item in page.get("Contents", []):
+            if item.get("Key"):
+                yield item
+
+
+def object_state(item: dict) -> dict:
+    return {
+        "size": int(item["Size"]),
+        "etag": str(item.get("ETag", "")).strip('"'),
+        "last_modified": item["LastModified"].isoformat() if hasattr(item.get("LastModified"), "isoformat")
+        else str(item.get("LastModified", "")),
+    }
+
+
+def load_manifest(destination_dir: str) -> Dict[str, dict]:
+    path = os.path.join(destination_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(destination_dir: str, manifest: Dict[str, dict]) -> None:
+    path = os.path.join(destination_dir, MANIFEST_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def needs_download(state: dict, recorded: Optional[dict], local_path: str) -> bool:
+    """True unless the local file matches both the manifest and the listed object."""
+    if not os.path.exists(local_path) or os.path.getsize(local_path) != state["size"]:
+        return True
+    if recorded is None:
+        return True
+    return recorded.get("etag") != state["etag"] or recorded.get("last_modified") != state["last_modified"]
+
+
+def download_atomic(s3, bucket: str, key: str, local_path: str) -> None:
+    tmp = f"{local_path}.part-{threading.get_ident()}"
+    try:
+        s3.download_file(bucket, key, tmp, Config=TRANSFER_CONFIG)
+        os.replace(tmp, local_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def sync_objects(
+    s3,
+    bucket: str,
+    objects: Iterable[dict],
+    destination_dir: str,
+    workers: int = 8,
+    save_every: int = 50,
+) -> dict:
+    """Download new or changed objects in parallel and keep the manifest current.
+
+    Returns counts: {"downloaded", "unchanged", "failed", "bytes"}.
+    """
+    ensure_directory(destination_dir)
+    manifest = load_manifest(destination_dir)
+    stats = {"downloaded": 0, "unchanged": 0, "failed": 0, "bytes": 0}
+    in_flight = {}
+
+    def reap(done):
+        for fut in done:
+            key, state = in_flight.pop(fut)
+            try:
+                fut.result()
+            except Exception as error:  # noqa: BLE001 - surface any boto issues
+                stats["failed"] += 1
+                print(f"❌ Failed to download s3://{bucket}/{key}: {error}")
+                continue
+            manifest[key] = state
+            stats["downloaded"] += 1
+            stats["bytes"] += state["size"]
+            if stats["downloaded"] % save_every == 0:
+                save_manifest(destination_dir, manifest)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for item in objects:
+            key = item["Key"]
+            filename = os.path.basename(key)
+            if not filename:
+                continue
+            local_path = os.path.join(destination_dir, filename)
+            state = dict(object_state(item), path=filename)
+            if not needs_download(state, manifest.get(key), local_path):
+                stats["unchanged"] += 1
+                continue
+            # Bound the queue so a huge listing doesn't buffer every pending key
+            if len(in_flight) >= workers * 4:
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                reap(done)
+            in_flight[pool.submit(download_atomic, s3, bucket, key, local_path)] = (key, state)
+        while in_flight:
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            reap(done)
+
+    save_manifest(destination_dir, manifest)
+    return stats
+
+
 def parse_args(argv: List[str]) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Download all images from an S3 bucket prefix.",
@@ -111,12 +258,40 @@ def parse_args(argv: List[str]) -> argparse.Namespace:
         action="store_true",
         help="Overwrite files if they already exist locally",
     )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Manifest-diffing parallel sync: refresh new, changed or partial files",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Parallel downloads in --sync mode (default: 8)",
+    )
+    parser.add_argument(
+        "--endpoint-url",
+        default=os.environ.get("S3_ENDPOINT_URL"),
+        help="Alternate S3 endpoint, e.g. a local stand-in",
+    )
     return parser.parse_args(argv)
 
 
 def main(argv: List[str]) -> int:
     args = parse_args(argv)
 
+    if args.sync:
+        s3 = make_client(args.endpoint_url, max_pool=args.workers * TRANSFER_CONFIG.max_request_concurrency)
+        objects = list_objects(s3, args.bucket, args.prefix)
+        if not args.all_keys:
+            objects = (o for o in objects if is_probable_image_key(o["Key"]))
+        stats = sync_objects(s3, args.bucket, objects, args.dest, workers=args.workers)
+        print(
+            f"\nDone. Downloaded {stats['downloaded']} file(s) ({stats['bytes']} bytes), "
+            f"{stats['unchanged']} unchanged, {stats['failed']} failed -> {args.dest}."
+        )
+        return 1 if stats["failed"] else 0
+
     keys = list_object_keys(args.bucket, args.prefix)
     if args.all_keys:
         keys_to_download = list(keys)
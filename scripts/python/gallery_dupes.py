@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Find near-duplicate photos in images/gallery.json by perceptual hash: burst
+frames, or an edited copy and its original uploaded under different names.
+
+Usage (from repo root):
+  python3 scripts/python/gallery_dupes.py                    # hash new images, print duplicate groups
+  python3 scripts/python/gallery_dupes.py --threshold 6 --json gallery-duplicates.json
+  python3 scripts/python/gallery_dupes.py --hash dhash --workers 8
+
+Each image gets a 64-bit pHash (DCT of a 32x32 grayscale copy; survives
+re-encoding, resizing and light edits) and a 64-bit dHash (gradient signs of a
+9x8 copy; stricter, good for bursts). JPEGs are decoded in DCT draft mode at a
+fraction of full size, on a process pool. Hashes are cached per URL in
+.gallery-cache/phash.json, so re-runs only fetch images added since.
+
+Pairs within --threshold bits (Hamming distance) are found with XOR and
+popcount over blocks of the whole hash array in NumPy rather than a Python
+loop per pair, and joined into groups. add_to_gallery.py checks each new file
+against the same cache with near_duplicates() and refuses the upload when it
+matches, unless --allow-near-duplicate is passed.
+
+Requires: pip install numpy Pillow
+"""
+
+import argparse
+import io
+import json
+import os
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image, ImageOps
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+GALLERY_PATH = os.path.join(REPO_ROOT, "images", "gallery.json")
+CACHE_PATH = os.path.join(REPO_ROOT, ".gallery-cache", "phash.json")
+
+HASHES = ("phash", "dhash")
+DEFAULT_THRESHOLD = 8
+# Draft decode target: comfortably above the 32x32 the hashes are computed from
+DRAFT_DIM = 256
+
+_DCT = np.cos(np.pi * (2 * np.arange(32)[None, :] + 1) * np.arange(32)[:, None] / 64)
+
+
+def phash(gray: Image.Image) -> int:
+    pixels = np.asarray(gray.resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:8, :8]
+    return _bits_to_int(low > np.median(low))
+
+
+def dhash(gray: Image.Image) -> int:
+    pixels = np.asarray(gray.resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def hashes_from_image(img: Image.Image) -> Dict[str, str]:
+    """{"phash", "dhash"} as 16-digit hex, computed in display orientation."""
+    img.draft("RGB", (DRAFT_DIM, DRAFT_DIM))
+    gray = ImageOps.exif_transpose(img).convert("L")
+    return {"phash": f"{phash(gray):016x}", "dhash": f"{dhash(gray):016x}"}
+
+
+def hashes_for_file(path: str) -> Dict[str, str]:
+    with Image.open(path) as img:
+        return hashes_from_image(img)
+
+
+def hashes_for_url(url: str) -> Dict[str, str]:
+    req = urllib.request.Request(url, headers={"User-Agent": "gallery-dupes/1.0"})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        data = resp.read()
+    with Image.open(io.BytesIO(data)) as img:
+        return hashes_from_image(img)
+
+
+def load_cache(path: str = CACHE_PATH) -> Dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_cache(cache: Dict[str, dict], path: str = CACHE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def hash_gallery(urls, cache: Dict[str, dict], workers: Optional[int] = None) -> int:
+    """Hash every URL missing from the cache in a process pool; returns how many were fetched."""
+    todo = [u for u in urls if u not in cache]
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(hashes_for_url, u): u for u in todo}
+            for i, fut in enumerate(as_completed(futures), 1):
+                url = futures[fut]
+                try:
+                    cache[url] = fut.result()
+                except Exception as exc:
+                    print(f"[{i}/{len(todo)}] {os.path.basename(url)} ERROR: {exc}")
+                    continue
+                if i % 100 == 0 or i == len(todo):
+                    print(f"[{i}/{len(todo)}] hashed")
+    return len(todo)
+
+
+def _popcount(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return np.unpackbits(x[..., None].view(np.uint8), axis=-1).sum(axis=-1)
+
+
+def close_pairs(values: np.ndarray, threshold: int = DEFAULT_THRESHOLD, block: int = 256):
+    """(i, j) index arrays, i < j, of every pair of uint64 hashes within threshold bits.
+
+    Each block of rows is XORed against itself and all later rows at once, so
+    the n^2/2 comparisons run as NumPy popcounts with memory bounded by block * n.
+    """
+    rows, cols = [], []
+    for start in range(0, len(values), block):
+        dist = _popcount(values[start:start + block, None] ^ values[None, start:])
+        i, j = np.nonzero(dist <= threshold)
+        upper = j > i  # column j is values[start + j], row i is values[start + i]
+        rows.append(i[upper] + start)
+        cols.append(j[upper] + start)
+    if not rows:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+def duplicate_groups(hashes: Dict[str, int], threshold: int = DEFAULT_THRESHOLD) -> List[List[str]]:
+    """Connected groups of keys whose hashes are within threshold bits of another member's."""
+    keys = list(hashes)
+    values = np.array([hashes[k] for k in keys], dtype=np.uint64)
+    parent = list(range(len(keys)))
+
+    def find(k):
+        while parent[k] != k:
+            parent[k] = parent[parent[k]]
+            k = parent[k]
+        return k
+
+    for a, b in zip(*(idx.tolist() for idx in close_pairs(values, threshold))):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    groups = {}
+    for i, key in enumerate(keys):
+        groups.setdefault(find(i), []).append(key)
+    return sorted((sorted(g) for g in groups.values() if len(g) > 1), key=lambda g: (-len(g), g[0]))
+
+
+def near_duplicates(file_hashes: Dict[str, str], cache: Dict[str, dict], hash_name: str = "phash",
+                    threshold: int = DEFAULT_THRESHOLD) -> List[tuple]:
+    """[(distance, url)] of cached images within threshold bits of one new file, closest first.
+
+    One vectorized XOR + popcount over the whole cache.
+    """
+    urls = [u for u, h in cache.items() if hash_name in h]
+    if not urls:
+        return []
+    values = np.array([int(cache[u][hash_name], 16) for u in urls], dtype=np.uint64)
+    dist = _popcount(values ^ np.uint64(int(file_hashes[hash_name], 16)))
+    hits = np.flatnonzero(dist <= threshold)
+    return sorted((int(dist[i]), urls[i]) for i in hits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Group near-duplicate gallery images by perceptual hash")
+    parser.add_argument("--gallery", default=GALLERY_PATH)
+    parser.add_argument("--cache", default=CACHE_PATH)
+    parser.add_argument("--hash", choices=HASHES, default="phash", help="which hash to compare (default: phash)")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help=f"max differing bits out of 64 (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--json", help="also write the groups to this file")
+    args = parser.parse_args()
+
+    with open(args.gallery) as f:
+        gallery = json.load(f)
+    by_url = {e["url"]: e for e in gallery if e.get("url")}
+
+    cache = load_cache(args.cache)
+    try:
+        fetched = hash_gallery(sorted(by_url), cache, workers=args.workers)
+    finally:
+        save_cache(cache, args.cache)
+
+    values = {u: int(cache[u][args.hash], 16) for u in by_url if u in cache}
+    t = time.perf_counter()
+    groups = duplicate_groups(values, args.threshold)
+    elapsed = time.perf_counter() - t
+
+    report = []
+    for group in groups:
+        base = values[group[0]]
+        members = [{"url": u, "name": by_url[u].get("name", ""), "distance": (values[u] ^ base).bit_count()}
+                   for u in group]
+        report.append(members)
+        print(f"\n{len(group)} near-duplicates:")
+        for m in members:
+            print(f"  {m['distance']:2d}  {m['name'] or '-':<30} {m['url']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    print(f"\nDone. Hashed {fetched} new, compared {len(values)} images in {elapsed * 1000:.0f} ms: "
+          f"{len(groups)} groups, {sum(len(g) for g in groups)} images.")
+
+
+if __name__ == "__main__":
+    main()
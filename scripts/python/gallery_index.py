@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Lookup indexes over images/gallery.json, written next to it as
+images/gallery-index.json whenever gallery_store.py exports the gallery.
+
+  {
+    "count": 284,                           # len(gallery.json), so readers can spot a stale index
+    "grid": 0.001,                          # cell size in degrees
+    "byCluster": {"<cluster_id>": [i, ...]},
+    "byStem":    {"img_2296": i},           # lower-cased filename without extension
+    "byCell":    {"48512:-120751": [i, ...]}  # floor(lat / grid):floor(lng / grid)
+  }
+
+Values are positions in the gallery.json array, so joins against cluster
+results, search hits or map bounds are dict lookups instead of full scans.
+The album page fetches this file on its first search and matches results via
+byStem and byCell, reading the cell size from "grid".
+
+Usage (from repo root):
+  python3 scripts/python/gallery_index.py     # rebuild gallery-index.json
+"""
+
+import json
+import math
+import os
+from collections import defaultdict
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+GALLERY_PATH = os.path.join(REPO_ROOT, "images", "gallery.json")
+# The album search matches coordinates within 0.001 deg, so a 3x3 block of cells covers a match
+GRID_DEG = 0.001
+
+
+def index_path_for(gallery_path):
+    return os.path.join(os.path.dirname(gallery_path), "gallery-index.json")
+
+
+def stem_of(url):
+    return os.path.splitext(os.path.basename(url or ""))[0].lower()
+
+
+def cell_of(lat, lng, grid=GRID_DEG):
+    return f"{math.floor(lat / grid)}:{math.floor(lng / grid)}"
+
+
+def build_indexes(gallery, grid=GRID_DEG):
+    by_cluster = defaultdict(list)
+    by_stem = {}
+    by_cell = defaultdict(list)
+    for i, entry in enumerate(gallery):
+        if entry.get("cluster_id") is not None:
+            by_cluster[str(entry["cluster_id"])].append(i)
+        stem = stem_of(entry.get("url"))
+        if stem:
+            by_stem.setdefault(stem, i)
+        lat, lng = entry.get("lat"), entry.get("lng")
+        if isinstance(lat, (int, float)) and isinstance(lng, (int, float)):
+            by_cell[cell_of(lat, lng, grid)].append(i)
+    return {"count": len(gallery), "grid": grid, "byCluster": dict(by_cluster), "byStem": by_stem, "byCell": dict(by_cell)}
+
+
+def cluster_summary(gallery, indexes):
+    """[(cluster_id, label, count)] from the byCluster index, ordered by cluster id."""
+    rows = []
+    for cid, positions in indexes["byCluster"].items():
+        first = gallery[positions[0]]
+        rows.append((first["cluster_id"], first.get("cluster_label", "?"), len(positions)))
+    return sorted(rows, key=lambda r: str(r[0]))
+
+
+def write_indexes(gallery, gallery_path=GALLERY_PATH):
+    indexes = build_indexes(gallery)
+    with open(index_path_for(gallery_path), "w") as f:
+        json.dump(indexes, f, separators=(",", ":"))
+        f.write("\n")
+    return indexes
+
+
+def main():
+    with open(GALLERY_PATH) as f:
+        gallery = json.load(f)
+    indexes = write_indexes(gallery)
+    print(f"Indexed {len(gallery)} photos: {len(indexes['byCluster'])} clusters, "
+          f"{len(indexes['byStem'])} stems, {len(indexes['byCell'])} grid cells")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Compute intrinsic dimensions and a tiny base64 LQIP (low-quality image placeholder)
+for gallery images, so the album can reserve layout space and paint a blurred
+preview before the real image arrives.
+
+Usage (from repo root):
+  python3 scripts/python/gallery_placeholders.py               # backfill images/gallery.json
+  python3 scripts/python/gallery_placeholders.py --workers 8 --force
+
+Each entry gains:
+  "width": 4032, "height": 3024, "lqip": "data:image/webp;base64,..."
+
+Results are cached per URL in .gallery-cache/placeholders.json, so re-runs only
+fetch images that were added since. add_to_gallery.py calls placeholder_for_file()
+to fill the same fields at ingest.
+
+Requires: pip install Pillow
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps
+
+try:
+    from . import gallery_store, prerender_pages
+except ImportError:
+    import gallery_store
+    import prerender_pages
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+GALLERY_PATH = os.path.join(REPO_ROOT, "images", "gallery.json")
+CACHE_PATH = os.path.join(REPO_ROOT, ".gallery-cache", "placeholders.json")
+
+LQIP_MAX_DIM = 16
+LQIP_QUALITY = 40
+
+
+def placeholder_from_image(img: Image.Image) -> dict:
+    """Return {"width", "height", "lqip"} for an opened image (display orientation)."""
+    # Orientation must be resolved before reading the size, or portrait shots
+    # taken on phones report landscape dimensions.
+    orientation = img.getexif().get(0x0112, 1)
+    w, h = img.size
+    if orientation in (5, 6, 7, 8):
+        w, h = h, w
+    # DCT-domain downscale for JPEGs: decodes at 1/8 scale instead of full size
+    img.draft("RGB", (LQIP_MAX_DIM * 8, LQIP_MAX_DIM * 8))
+    small = ImageOps.exif_transpose(img).convert("RGB")
+    small.thumbnail((LQIP_MAX_DIM, LQIP_MAX_DIM))
+    buf = io.BytesIO()
+    small.save(buf, "WEBP", quality=LQIP_QUALITY)
+    return {
+        "width": w,
+        "height": h,
+        "lqip": "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode(),
+    }
+
+
+def placeholder_for_file(path: str) -> dict:
+    with Image.open(path) as img:
+        return placeholder_from_image(img)
+
+
+def placeholder_for_url(url: str) -> dict:
+    req = urllib.request.Request(url, headers={"User-Agent": "gallery-placeholders/1.0"})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        data = resp.read()
+    with Image.open(io.BytesIO(data)) as img:
+        return placeholder_from_image(img)
+
+
+def load_cache(path: str = CACHE_PATH) -> Dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_cache(cache: Dict[str, dict], path: str = CACHE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def backfill(gallery, cache: Dict[str, dict], workers: Optional[int] = None, force: bool = False) -> int:
+    """Fill width/height/lqip on every entry, computing cache misses in a process pool.
+
+    Returns the number of images that had to be fetched.
+    """
+    for entry in gallery:
+        # Entries placeholdered at ingest count as cached
+        if entry.get("url") and "lqip" in entry and entry["url"] not in cache:
+            cache[entry["url"]] = {k: entry[k] for k in ("width", "height", "lqip") if k in entry}
+    urls = sorted({e["url"] for e in gallery if e.get("url")})
+    todo = [u for u in urls if force or u not in cache]
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(placeholder_for_url, u): u for u in todo}
+            for i, fut in enumerate(as_completed(futures), 1):
+                url = futures[fut]
+                try:
+                    cache[url] = fut.result()
+                    print(f"[{i}/{len(todo)}] {os.path.basename(url)} {cache[url]['width']}x{cache[url]['height']}")
+                except Exception as exc:
+                    print(f"[{i}/{len(todo)}] {os.path.basename(url)} ERROR: {exc}")
+    for entry in gallery:
+        entry.update(cache.get(entry.get("url"), {}))
+    return len(todo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill width/height/LQIP placeholders into gallery.json")
+    parser.add_argument("--gallery", default=GALLERY_PATH)
+    parser.add_argument("--cache", default=CACHE_PATH)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Recompute even when cached")
+    args = parser.parse_args()
+
+    store = gallery_store.GalleryStore(gallery_path=args.gallery)
+    gallery = store.all()
+
+    cache = load_cache(args.cache)
+    try:
+        fetched = backfill(gallery, cache, workers=args.workers, force=args.force)
+    finally:
+        save_cache(cache, args.cache)
+
+    store.upsert_many(gallery)
+    store.export()
+    store.close()
+    if os.path.abspath(args.gallery) == GALLERY_PATH:
+        prerender_pages.refresh_album(prerender_pages.REPO_ROOT)
+    filled = sum(1 for e in gallery if "lqip" in e)
+    print(f"\nDone. Fetched {fetched}, {filled}/{len(gallery)} entries have placeholders.")
+
+
+if __name__ == "__main__":
+    main()
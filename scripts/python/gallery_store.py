@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed store for gallery entries, shared by the gallery tools.
+
+images/gallery.json stays the file the site serves; the database
+(.gallery-cache/gallery.db, WAL mode) is the working copy tools read and write
+through. Lookups by url, date_taken, cluster_id or grid cell use indexes instead
+of re-parsing the whole array, and batches of changes commit in one transaction.
+export() writes gallery.json (compact) and gallery-index.json from the database.
+The map's map-clusters.json and the pre-rendered album page are derived from
+them by the tools that change the gallery (prerender_pages.refresh_album()) and
+by the site build.
+
+If gallery.json changes outside the store (hand edits, git pull), the next open
+notices the new mtime/size and re-imports it.
+
+Usage (from repo root):
+  python3 scripts/python/gallery_store.py import     # rebuild the db from gallery.json
+  python3 scripts/python/gallery_store.py export [--pretty]
+  python3 scripts/python/gallery_store.py stats
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from typing import Iterable, Iterator, List, Optional
+
+try:
+    from . import gallery_index
+except ImportError:
+    import gallery_index
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+GALLERY_PATH = os.path.join(REPO_ROOT, "images", "gallery.json")
+DB_PATH = os.path.join(REPO_ROOT, ".gallery-cache", "gallery.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    url        TEXT PRIMARY KEY,
+    seq        INTEGER NOT NULL,
+    name       TEXT,
+    lat        REAL,
+    lng        REAL,
+    cell       TEXT,
+    date_taken TEXT,
+    cluster_id TEXT,
+    data       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS photos_seq ON photos(seq);
+CREATE INDEX IF NOT EXISTS photos_date ON photos(date_taken);
+CREATE INDEX IF NOT EXISTS photos_cluster ON photos(cluster_id);
+CREATE INDEX IF NOT EXISTS photos_cell ON photos(cell);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _row(entry: dict, seq: int):
+    lat, lng = entry.get("lat"), entry.get("lng")
+    has_geo = isinstance(lat, (int, float)) and isinstance(lng, (int, float))
+    cid = entry.get("cluster_id")
+    return (
+        entry["url"], seq, entry.get("name"),
+        lat if has_geo else None, lng if has_geo else None,
+        gallery_index.cell_of(lat, lng) if has_geo else None,
+        entry.get("date_taken"),
+        None if cid is None else str(cid),
+        json.dumps(entry, separators=(",", ":")),
+    )
+
+
+class GalleryStore:
+    def __init__(self, db_path: str = DB_PATH, gallery_path: str = GALLERY_PATH):
+        self.db_path = db_path
+        self.gallery_path = gallery_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        if self._source_changed():
+            self.import_json()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    # -- sync with gallery.json --------------------------------------------
+
+    def _source_stamp(self) -> str:
+        if not os.path.exists(self.gallery_path):
+            return ""
+        st = os.stat(self.gallery_path)
+        # The grid size is part of the stamp so a change to it recomputes the cell column
+        return f"{os.path.abspath(self.gallery_path)}:{st.st_mtime_ns}:{st.st_size}:{gallery_index.GRID_DEG}"
+
+    def _source_changed(self) -> bool:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        return (row[0] if row else None) != self._source_stamp()
+
+    def _mark_source(self):
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (self._source_stamp(),))
+
+    def import_json(self):
+        """Replace the table contents with gallery.json."""
+        entries = []
+        if os.path.exists(self.gallery_path):
+            with open(self.gallery_path, encoding="utf-8") as f:
+                entries = json.load(f)
+            if not isinstance(entries, list):
+                raise SystemExit("images/gallery.json must contain a top-level array")
+        with self.conn:
+            self.conn.execute("DELETE FROM photos")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO photos VALUES (?,?,?,?,?,?,?,?,?)",
+                (_row(e, i) for i, e in enumerate(entries) if e.get("url")),
+            )
+            self._mark_source()
+
+    def export(self, pretty: bool = False) -> dict:
+        """Write gallery.json and its lookup indexes from the database."""
+        entries = self.all()
+        tmp = self.gallery_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            if pretty:
+                json.dump(entries, f, indent=2)
+            else:
+                json.dump(entries, f, separators=(",", ":"), ensure_ascii=False)
+            f.write("\n")
+        os.replace(tmp, self.gallery_path)
+        indexes = gallery_index.write_indexes(entries, self.gallery_path)
+        with self.conn:
+            self._mark_source()
+        return indexes
+
+    # -- reads ---------------------------------------------------------------
+
+    def _entries(self, sql: str, params=()) -> List[dict]:
+        return [json.loads(r[0]) for r in self.conn.execute(sql, params)]
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM photos").fetchone()[0]
+
+    def all(self) -> List[dict]:
+        return self._entries("SELECT data FROM photos ORDER BY seq")
+
+    def get(self, url: str) -> Optional[dict]:
+        rows = self._entries("SELECT data FROM photos WHERE url = ?", (url,))
+        return rows[0] if rows else None
+
+    def has_url(self, url: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM photos WHERE url = ?", (url,)).fetchone() is not None
+
+    def by_cluster(self, cluster_id) -> List[dict]:
+        return self._entries("SELECT data FROM photos WHERE cluster_id = ? ORDER BY seq", (str(cluster_id),))
+
+    def by_date(self, start: str, end: str) -> List[dict]:
+        return self._entries("SELECT data FROM photos WHERE date_taken BETWEEN ? AND ? ORDER BY date_taken",
+                             (start, end))
+
+    def by_cell(self, cell: str) -> List[dict]:
+        return self._entries("SELECT data FROM photos WHERE cell = ? ORDER BY seq", (cell,))
+
+    def cluster_counts(self) -> Iterator[tuple]:
+        """(cluster_id, label, count) per cluster, straight from the cluster index."""
+        sql = ("SELECT cluster_id, json_extract(MIN(data), '$.cluster_label'), COUNT(*) "
+               "FROM photos WHERE cluster_id IS NOT NULL GROUP BY cluster_id ORDER BY cluster_id")
+        return iter(self.conn.execute(sql).fetchall())
+
+    # -- writes --------------------------------------------------------------
+
+    def upsert_many(self, entries: Iterable[dict]):
+        """Insert or update entries by url in one transaction; new urls go to the end."""
+        with self.conn:
+            next_seq = self.conn.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM photos").fetchone()[0]
+            for entry in entries:
+                row = self.conn.execute("SELECT seq FROM photos WHERE url = ?", (entry["url"],)).fetchone()
+                if row:
+                    seq = row[0]
+                else:
+                    seq, next_seq = next_seq, next_seq + 1
+                self.conn.execute("INSERT OR REPLACE INTO photos VALUES (?,?,?,?,?,?,?,?,?)", _row(entry, seq))
+
+    def upsert(self, entry: dict):
+        self.upsert_many([entry])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="SQLite working copy of images/gallery.json")
+    ap.add_argument("cmd", choices=["import", "export", "stats"])
+    ap.add_argument("--pretty", action="store_true", help="indent gallery.json on export")
+    args = ap.parse_args()
+
+    with GalleryStore() as store:
+        if args.cmd == "import":
+            store.import_json()
+            print(f"Imported {store.count()} photos into {store.db_path}")
+        elif args.cmd == "export":
+            store.export(pretty=args.pretty)
+            print(f"Exported {store.count()} photos to {store.gallery_path}")
+        else:
+            print(f"{store.count()} photos")
+            for cid, label, count in store.cluster_counts():
+                print(f"  [{cid}] {label} ({count} photos)")
+
+
+if __name__ == "__main__":
+    main()
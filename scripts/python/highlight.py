@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Build-time syntax highlighting for fenced code blocks.
+
+markdown_to_html() passes each ```lang block through highlight_cached(), which
+returns the escaped code wrapped in <span class="tok-..."> runs, so article
+pages and posts-index.json ship final markup and the browser needs no
+highlighter. Colors live in styles.css (.tok-keyword, .tok-string, ...).
+
+The lexers are small regex tables, one per language family (Python,
+JavaScript/TypeScript, shell, JSON, CSS, HTML/XML, YAML, SQL and the C-like
+languages). Unknown languages are escaped without spans. Results are cached in
+.gallery-cache/highlight-cache.json by (lexer version, language, code hash), so
+unchanged blocks are not re-lexed on the next build.
+
+Usage (from repo root):
+  python3 scripts/python/highlight.py python < snippet.py    # print highlighted HTML
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+CACHE_PATH = os.path.join(REPO_ROOT, ".gallery-cache", "highlight-cache.json")
+
+# Bump when a lexer changes so cached markup is regenerated
+LEXER_VERSION = 1
+
+
+def _words(words):
+    return r"\b(?:" + "|".join(sorted(set(words.split()), key=len, reverse=True)) + r")\b"
+
+
+class Lexer:
+    """Ordered (pattern, token) rules; the first rule to match at a position wins."""
+
+    def __init__(self, rules, flags=0):
+        self.tokens = {}
+        parts = []
+        for i, (pattern, token) in enumerate(rules):
+            self.tokens[f"t{i}"] = token
+            parts.append(f"(?P<t{i}>{pattern})")
+        self.regex = re.compile("|".join(parts), flags | re.MULTILINE)
+
+
+NUMBER = r"\b(?:0[xX][\da-fA-F_]+|0[oObB][0-7_]+|\d[\d_]*(?:\.\d[\d_]*)?(?:[eE][+-]?\d+)?)\b"
+CALL = r"\b[A-Za-z_$][\w$]*(?=\()"
+DQ_STRING = r'"(?:\\.|[^"\\\n])*"'
+SQ_STRING = r"'(?:\\.|[^'\\\n])*'"
+C_COMMENT = r"//[^\n]*|/\*[\s\S]*?\*/"
+
+PYTHON = Lexer([
+    (r"#[^\n]*", "comment"),
+    (r"[rRbBuUfF]{0,2}(?:\"\"\"[\s\S]*?\"\"\"|'''[\s\S]*?''')", "string"),
+    (rf"[rRbBuUfF]{{0,2}}(?:{DQ_STRING}|{SQ_STRING})", "string"),
+    (r"^[ \t]*@[\w.]+", "function"),
+    (r"(?<=\bdef )\w+|(?<=\bclass )\w+", "function"),
+    (_words("False None True and as assert async await break class continue def del elif else except "
+            "finally for from global if import in is lambda nonlocal not or pass raise return try while "
+            "with yield match case"), "keyword"),
+    (_words("print len range str int float bool dict list set tuple open isinstance enumerate zip map "
+            "filter sorted min max sum any all super type object Exception self cls"), "builtin"),
+    (NUMBER, "number"),
+    (CALL, "function"),
+])
+
+JAVASCRIPT = Lexer([
+    (C_COMMENT, "comment"),
+    (rf"{DQ_STRING}|{SQ_STRING}|`(?:\\.|[^`\\])*`", "string"),
+    (_words("async await break case catch class const continue debugger default delete do else export "
+            "extends finally for from function if import in instanceof let new of return static super "
+            "switch this throw try typeof var void while with yield true false null undefined "
+            "interface type enum implements private public protected readonly as"), "keyword"),
+    (_words("console document window Math JSON Promise Array Object String Number Boolean Map Set "
+            "Error fetch require module exports"), "builtin"),
+    (NUMBER, "number"),
+    (CALL, "function"),
+])
+
+SHELL = Lexer([
+    (r"(?<![\w$\\])#[^\n]*", "comment"),
+    (rf"{DQ_STRING}|'[^']*'", "string"),
+    (r"\$(?:\{[^}\n]*\}|\w+|[@#?$!*-])", "variable"),
+    (_words("if then else elif fi for in do done while until case esac function return export local "
+            "source alias unset set"), "keyword"),
+    (r"(?<![\w-])--?[A-Za-z][\w-]*", "attr"),
+    (r"^[ \t]*(?:\$ )?[A-Za-z_][\w.-]*", "function"),
+    (NUMBER, "number"),
+])
+
+JSON = Lexer([
+    (rf"{DQ_STRING}(?=\s*:)", "attr"),
+    (DQ_STRING, "string"),
+    (r"\b(?:true|false|null)\b", "keyword"),
+    (r"-?\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b", "number"),
+])
+
+CSS = Lexer([
+    (r"/\*[\s\S]*?\*/", "comment"),
+    (rf"{DQ_STRING}|{SQ_STRING}", "string"),
+    (r"@[\w-]+", "keyword"),
+    (r"--?[A-Za-z][\w-]*(?=\s*:[^;{}]*[;}])|\b[A-Za-z][\w-]*(?=\s*:[^;{}]*[;}])", "attr"),
+    (r"#[\da-fA-F]{3,8}\b", "number"),
+    (r"(?<![\w-])-?(?:\d*\.)?\d+(?:%|[A-Za-z]+)?", "number"),
+    (r"[.#][A-Za-z_][\w-]*(?=[^{};]*\{)", "tag"),
+    (r"![Ii]mportant", "keyword"),
+])
+
+MARKUP = Lexer([
+    (r"<!--[\s\S]*?-->", "comment"),
+    (r"</?[A-Za-z][\w:.-]*|/?>", "tag"),
+    (r"\b[A-Za-z_:][\w:.-]*(?==)", "attr"),
+    (r"\"[^\"]*\"|'[^']*'", "string"),
+    (r"&#?\w+;", "number"),
+])
+
+YAML = Lexer([
+    (r"(?<!\S)#[^\n]*", "comment"),
+    (r"[\w.-]+(?=:(?:[ \t]|$))", "attr"),
+    (rf"{DQ_STRING}|{SQ_STRING}", "string"),
+    (r"\b(?:true|false|yes|no|null|on|off)\b", "keyword"),
+    (NUMBER, "number"),
+])
+
+SQL = Lexer([
+    (r"--[^\n]*|/\*[\s\S]*?\*/", "comment"),
+    (SQ_STRING, "string"),
+    (_words("select from where and or not insert into values update set delete create table index "
+            "primary key on join left right inner outer group by order having limit offset as is null "
+            "distinct union all exists in between like case when then else end with returning "
+            "integer text real"), "keyword"),
+    (NUMBER, "number"),
+    (CALL, "function"),
+], re.IGNORECASE)
+
+C_LIKE_KEYWORDS = (
+    "auto break case char const continue default do double else enum extern float for goto if int long "
+    "register return short signed sizeof static struct switch typedef union unsigned void volatile while "
+    "class public private protected new this try catch throw final abstract interface extends implements "
+    "package import boolean byte true false null namespace template typename using virtual override "
+    "func go defer chan map range select var type fn let mut impl trait pub use mod match loop as "
+    "struct where async await self Self val fun when object override guard nil"
+)
+
+C_LIKE = Lexer([
+    (C_COMMENT, "comment"),
+    (rf"{DQ_STRING}|'(?:\\.|[^'\\\n])'|`[^`]*`", "string"),
+    (r"^[ \t]*#[ \t]*\w+", "keyword"),
+    (_words(C_LIKE_KEYWORDS), "keyword"),
+    (NUMBER, "number"),
+    (CALL, "function"),
+])
+
+LEXERS = {
+    "python": PYTHON, "py": PYTHON, "python3": PYTHON,
+    "javascript": JAVASCRIPT, "js": JAVASCRIPT, "jsx": JAVASCRIPT, "mjs": JAVASCRIPT,
+    "typescript": JAVASCRIPT, "ts": JAVASCRIPT, "tsx": JAVASCRIPT,
+    "bash": SHELL, "sh": SHELL, "shell": SHELL, "zsh": SHELL, "console": SHELL,
+    "json": JSON, "jsonc": JSON,
+    "css": CSS,
+    "html": MARKUP, "xml": MARKUP, "svg": MARKUP,
+    "yaml": YAML, "yml": YAML,
+    "sql": SQL, "sqlite": SQL,
+    "c": C_LIKE, "cpp": C_LIKE, "c++": C_LIKE, "h": C_LIKE, "java": C_LIKE, "go": C_LIKE,
+    "rust": C_LIKE, "rs": C_LIKE, "swift": C_LIKE, "kotlin": C_LIKE, "csharp": C_LIKE, "cs": C_LIKE,
+    "c#": C_LIKE,
+}
+
+
+def escape_html(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def highlight(code, lang):
+    """Escaped code with <span class="tok-..."> around each recognised token."""
+    lexer = LEXERS.get((lang or "").strip().lower())
+    if lexer is None:
+        return escape_html(code)
+    out = []
+    pos = 0
+    for m in lexer.regex.finditer(code):
+        if not m.group():
+            continue
+        if m.start() > pos:
+            out.append(escape_html(code[pos:m.start()]))
+        out.append(f'<span class="tok-{lexer.tokens[m.lastgroup]}">{escape_html(m.group())}</span>')
+        pos = m.end()
+    out.append(escape_html(code[pos:]))
+    return "".join(out)
+
+
+_cache = None
+_used = set()
+_dirty = False
+
+
+def _cache_key(code, lang):
+    digest = hashlib.sha256(code.encode("utf-8")).hexdigest()[:20]
+    return f"{LEXER_VERSION}:{(lang or '').strip().lower()}:{digest}"
+
+
+def highlight_cached(code, lang):
+    global _cache, _dirty
+    if _cache is None:
+        try:
+            with open(CACHE_PATH, encoding="utf-8") as f:
+                _cache = json.load(f)
+        except (OSError, ValueError):
+            _cache = {}
+    key = _cache_key(code, lang)
+    _used.add(key)
+    html = _cache.get(key)
+    if html is None:
+        html = _cache[key] = highlight(code, lang)
+        _dirty = True
+    return html
+
+
+def save_cache():
+    """Persist the blocks seen in this build; entries no longer used are dropped."""
+    global _dirty
+    if _cache is None or not (_dirty or len(_cache) != len(_used)):
+        return
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    tmp = CACHE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({k: v for k, v in _cache.items() if k in _used}, f, separators=(",", ":"))
+    os.replace(tmp, CACHE_PATH)
+    _dirty = False
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Highlight code from stdin as HTML spans")
+    ap.add_argument("lang", help=f"one of: {', '.join(sorted(LEXERS))}")
+    args = ap.parse_args()
+    print(f'<pre><code class="language-{args.lang}">{highlight(sys.stdin.read(), args.lang)}</code></pre>')
+
+
+if __name__ == "__main__":
+    main()
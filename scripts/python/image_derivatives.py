@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Build width-bounded WebP (and AVIF, when Pillow can encode it) derivatives of
+gallery images so the album grid can use `srcset` instead of full-size JPEGs.
+
+Used by add_to_gallery.py / bulk_add_to_gallery.py with --derivatives, or
+standalone to preview what would be produced:
+
+  python scripts/python/image_derivatives.py /abs/path/IMG_1234.jpg [...] \
+      [--out .gallery-cache/derivatives] [--widths 480,960,1600] [--workers 4]
+
+Derivatives are named <stem>-<width>w.<ext> and uploaded next to the original,
+e.g. album/IMG_1234.JPG -> album/IMG_1234-480w.webp. Locally each source
+renders into its own <out>/<content digest>/ directory, so 100APPLE/IMG_0001.JPG
+and 101APPLE/IMG_0001.JPG never overwrite each other's files. A source that
+cannot be read or decoded (HEIC without a plugin, a truncated file) is reported
+and gets no derivatives; the rest of the batch carries on.
+
+JPEGs are decoded in DCT draft mode at the smallest 1/2, 1/4 or 1/8 scale that
+still covers the target size, so a 24 MP original is never fully decoded for a
+480px or 2048px copy. cached_thumbnail() keeps display-oriented JPEG
+downscales in .gallery-cache/thumbs/, keyed by (source SHA-256, max_dim), for
+any tool that needs a bounded copy of a local image (review_gallery.py's model
+input, for one).
+
+Requires: pip install Pillow  (AVIF: Pillow >= 11.3 or pip install pillow-avif-plugin)
+"""
+
+import argparse
+import hashlib
+import json
+import mimetypes
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageOps, features
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+THUMB_DIR = os.path.join(REPO_ROOT, ".gallery-cache", "thumbs")
+THUMB_QUALITY = 85
+
+DERIVATIVE_WIDTHS = (480, 960, 1600)
+DERIVATIVE_FORMATS = ("avif", "webp")
+QUALITY = {"webp": 80, "avif": 55}
+CONTENT_TYPES = {"webp": "image/webp", "avif": "image/avif"}
+
+
+def avif_supported() -> bool:
+    try:
+        if features.check("avif"):
+            return True
+    except ValueError:
+        pass
+    try:
+        import pillow_avif  # noqa: F401 - registers the AVIF codec with Pillow
+        return True
+    except ImportError:
+        return False
+
+
+def available_formats(formats: Iterable[str] = DERIVATIVE_FORMATS) -> List[str]:
+    return [f for f in formats if f != "avif" or avif_supported()]
+
+
+def derivative_name(source_path: str, width: int, fmt: str) -> str:
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return f"{stem}-{width}w.{fmt}"
+
+
+def reduce_on_decode(img: Image.Image, scale: float) -> Image.Image:
+    """Have the JPEG decoder scale down in the DCT domain, as far as it can while
+    staying at or above `scale` of the stored size. Other formats decode as usual."""
+    if scale < 1.0:
+        img.draft("RGB", (max(1, int(img.width * scale)), max(1, int(img.height * scale))))
+    return img
+
+
+def downscale_image(img: Image.Image, max_dim: int) -> Image.Image:
+    """Display-oriented RGB copy of an opened image with its longest edge at most max_dim."""
+    reduce_on_decode(img, min(1.0, max_dim / max(img.size)))
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if max(img.size) > max_dim:
+        r = max_dim / max(img.size)
+        img = img.resize((max(1, round(img.width * r)), max(1, round(img.height * r))), Image.LANCZOS)
+    return img
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def thumbnail_path(digest: str, max_dim: int, cache_dir: str = THUMB_DIR) -> str:
+    return os.path.join(cache_dir, digest[:2], f"{digest}-{max_dim}.jpg")
+
+
+def cached_thumbnail(src: str, max_dim: int, cache_dir: str = THUMB_DIR, digest: Optional[str] = None) -> str:
+    """Path of a JPEG of src with its longest edge at most max_dim, rendering it on a cache miss.
+
+    Keyed by content, so renamed or re-downloaded copies of one photo share an entry.
+    """
+    dest = thumbnail_path(digest or file_sha256(src), max_dim, cache_dir)
+    if os.path.exists(dest):
+        return dest
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with Image.open(src) as img:
+        small = downscale_image(img, max_dim)
+    # Unique temp name: parallel workers may render the same photo
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    small.save(tmp, "JPEG", quality=THUMB_QUALITY)
+    os.replace(tmp, dest)
+    return dest
+
+
+def _render_one(task: Tuple[str, str, int, str, bool]) -> Optional[dict]:
+    """Encode one (source, width, format) derivative. Runs in a worker process."""
+    src, out_dir, width, fmt, force = task
+    if fmt == "avif":
+        avif_supported()  # make sure the plugin is registered in this worker
+    with Image.open(src) as img:
+        display_width = img.height if img.getexif().get(0x0112, 1) in (5, 6, 7, 8) else img.width
+        if display_width <= width and not force:
+            # Upscaling only wastes bytes; the smallest width is always produced
+            return None
+        reduce_on_decode(img, width / display_width)
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGB")
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+        dest = os.path.join(out_dir, derivative_name(src, width, fmt))
+        img.save(dest, fmt.upper(), quality=QUALITY.get(fmt, 80))
+        return {
+            "file": dest,
+            "width": img.width,
+            "height": img.height,
+            "bytes": os.path.getsize(dest),
+            "type": CONTENT_TYPES.get(fmt) or mimetypes.guess_type(dest)[0],
+        }
+
+
+def source_dir(out_dir: str, src: str) -> str:
+    """Local output directory for one source, keyed by its content."""
+    return os.path.join(out_dir, file_sha256(src)[:16])
+
+
+def build_derivatives(paths: Sequence[str], out_dir: str, widths: Sequence[int] = DERIVATIVE_WIDTHS,
+                      formats: Iterable[str] = DERIVATIVE_FORMATS, workers: Optional[int] = None) -> Dict[str, List[dict]]:
+    """Render every (path, width, format) combination in a process pool.
+
+    Returns {source_path: [variant, ...]} with variants ordered by format then width.
+    A source that fails to render maps to [] so it is simply added without a srcset.
+    """
+    fmts = available_formats(formats)
+    smallest = min(widths)
+    out: Dict[str, List[dict]] = {p: [] for p in paths}
+    failed: Dict[str, str] = {}
+    tasks = []
+    for p in paths:
+        try:
+            dest_dir = source_dir(out_dir, p)
+        except OSError as exc:
+            failed[p] = str(exc)
+            continue
+        os.makedirs(dest_dir, exist_ok=True)
+        tasks += [(p, dest_dir, w, f, w == smallest) for f in fmts for w in sorted(widths)]
+
+    results: Dict[tuple, dict] = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_render_one, task): task for task in tasks}
+        for fut in as_completed(futures):
+            task = futures[fut]
+            try:
+                variant = fut.result()
+            except Exception as exc:
+                failed.setdefault(task[0], f"{type(exc).__name__}: {exc}")
+                continue
+            if variant:
+                results[task] = variant
+
+    for task in tasks:
+        if task in results and task[0] not in failed:
+            out[task[0]].append(results[task])
+    for p, reason in failed.items():
+        print(f"[derivatives] skipped {p}: {reason}")
+    return out
+
+
+def upload_derivatives(variants: List[dict], bucket: str, key_prefix: str, cf_domain: str,
+                       region: Optional[str] = None) -> List[dict]:
+    """Upload rendered variants under key_prefix and return srcset-ready entries."""
+    import boto3
+
+    s3 = boto3.client("s3", region_name=region)
+    entries = []
+    for v in variants:
+        key = key_prefix + os.path.basename(v["file"])
+        s3.upload_file(v["file"], bucket, key, ExtraArgs={"ContentType": v["type"]})
+        entries.append({
+            "url": f"https://{cf_domain}/{key}",
+            "width": v["width"],
+            "height": v["height"],
+            "bytes": v["bytes"],
+            "type": v["type"],
+        })
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render responsive WebP/AVIF derivatives for gallery images")
+    parser.add_argument("paths", nargs="+", help="Image file(s)")
+    parser.add_argument("--out", default=os.path.join(".gallery-cache", "derivatives"), help="Output directory")
+    parser.add_argument("--widths", default=",".join(str(w) for w in DERIVATIVE_WIDTHS), help="Comma-separated widths")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    widths = [int(w) for w in args.widths.split(",") if w.strip()]
+    result = build_derivatives(args.paths, args.out, widths, workers=args.workers)
+    for src, variants in result.items():
+        original = os.path.getsize(src)
+        print(json.dumps({"file": src, "bytes": original, "variants": variants}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Opt-in timing spans, counters and peak-memory capture shared by the scripts.
+
+Enable with --profile (scripts call add_arguments()/setup()) or by setting
+SITE_PROFILE=1 (or SITE_PROFILE=<trace path>). SITE_PROFILE_MEMORY=1 or
+--profile-memory also starts tracemalloc. When enabled, the run writes a
+Chrome-trace JSON file (open in chrome://tracing or ui.perfetto.dev) and
+prints a per-span summary to stderr on exit. When disabled, span() hands back
+a shared no-op context manager and count() returns immediately.
+
+  import instrument
+  instrument.add_arguments(parser)
+  args = parser.parse_args()
+  instrument.setup(args, "bulk_add_to_gallery")
+
+  with instrument.span("upload", key=key):
+      ...
+  instrument.count("bytes_uploaded", size)
+
+  @instrument.traced("exif")
+  def extract_lat_lng(path): ...
+
+Spans are recorded per thread, so thread-pool stages show up as parallel
+tracks. Work done inside process pools is only visible as the parent's wait.
+
+Usage (from repo root):
+  python3 scripts/python/instrument.py summary trace.json   # re-print a saved trace's table
+"""
+
+import argparse
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import nullcontext
+
+ENV_VAR = "SITE_PROFILE"
+ENV_MEMORY = "SITE_PROFILE_MEMORY"
+
+_NOOP = nullcontext()
+_enabled = False
+_memory = False
+_trace_path = None
+_name = "run"
+_events = []
+_counters = defaultdict(float)
+_lock = threading.Lock()
+_local = threading.local()
+_t0 = time.perf_counter()
+
+
+def enabled():
+    return _enabled
+
+
+def add_arguments(parser):
+    parser.add_argument("--profile", nargs="?", const="", metavar="TRACE",
+                        help=f"record timing spans; write a Chrome trace (default <script>-<time>.trace.json). "
+                             f"Also enabled by {ENV_VAR}=1")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help=f"with --profile, also track peak memory via tracemalloc ({ENV_MEMORY}=1)")
+
+
+def setup(args=None, name=None):
+    """Turn recording on if --profile was passed or SITE_PROFILE is set."""
+    flag = getattr(args, "profile", None)
+    env = os.environ.get(ENV_VAR, "")
+    if flag is None and env in ("", "0"):
+        return
+    memory = bool(getattr(args, "profile_memory", False)) or os.environ.get(ENV_MEMORY, "") not in ("", "0")
+    path = flag or (env if env not in ("1", "true") else "")
+    enable(name or os.path.splitext(os.path.basename(sys.argv[0]))[0], path or None, memory)
+
+
+def enable(name="run", trace_path=None, memory=False):
+    global _enabled, _memory, _trace_path, _name, _t0
+    if _enabled:
+        return
+    _name = name
+    _trace_path = trace_path or f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.trace.json"
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _t0 = time.perf_counter()
+    _enabled = True
+    atexit.register(finish)
+
+
+class _Span:
+    __slots__ = ("name", "args", "start", "mem_start", "top")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        depth = getattr(_local, "depth", 0)
+        _local.depth = depth + 1
+        self.top = depth == 0 and threading.current_thread() is threading.main_thread()
+        if _memory:
+            if self.top:
+                tracemalloc.reset_peak()
+            self.mem_start = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        _local.depth -= 1
+        event = {
+            "name": self.name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+            "ts": (self.start - _t0) * 1e6, "dur": (end - self.start) * 1e6,
+        }
+        args = dict(self.args) if self.args else {}
+        if exc_type is not None:
+            args["error"] = exc_type.__name__
+        if _memory:
+            current, peak = tracemalloc.get_traced_memory()
+            args["mem_delta_kb"] = round((current - self.mem_start) / 1024, 1)
+            if self.top:
+                args["mem_peak_kb"] = round(peak / 1024, 1)
+        if args:
+            event["args"] = args
+        with _lock:
+            _events.append(event)
+        return False
+
+
+def span(name, **args):
+    """Context manager timing a stage; a shared no-op when profiling is off."""
+    if not _enabled:
+        return _NOOP
+    return _Span(name, args)
+
+
+def traced(name=None):
+    """Decorator form of span(); the wrapper only checks a flag when profiling is off."""
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*a, **kw):
+            if not _enabled:
+                return fn(*a, **kw)
+            with _Span(label, None):
+                return fn(*a, **kw)
+        return inner
+    return wrap
+
+
+def count(name, value=1):
+    """Add to a named counter (bytes uploaded, cache hits, ...)."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] += value
+        _events.append({"name": name, "ph": "C", "pid": os.getpid(), "tid": 0,
+                        "ts": (time.perf_counter() - _t0) * 1e6, "args": {name: _counters[name]}})
+
+
+def summarize(events):
+    """Rows of (name, calls, total_ms, mean_ms, max_ms, peak_kb) per span name, costliest first."""
+    by_name = defaultdict(lambda: [0, 0.0, 0.0, None])
+    for e in events:
+        if e.get("ph") != "X":
+            continue
+        row = by_name[e["name"]]
+        row[0] += 1
+        row[1] += e["dur"] / 1000
+        row[2] = max(row[2], e["dur"] / 1000)
+        peak = (e.get("args") or {}).get("mem_peak_kb")
+        if peak is not None:
+            row[3] = max(row[3] or 0, peak)
+    rows = [(name, n, total, total / n, mx, peak) for name, (n, total, mx, peak) in by_name.items()]
+    return sorted(rows, key=lambda r: -r[2])
+
+
+def print_summary(events, counters, out=sys.stderr):
+    rows = summarize(events)
+    width = max([len(r[0]) for r in rows] + [4])
+    print(f"\n{'span':<{width}}  {'calls':>7}  {'total ms':>10}  {'mean ms':>9}  {'max ms':>9}  {'peak KiB':>9}", file=out)
+    for name, n, total, mean, mx, peak in rows:
+        peak_s = f"{peak:9.0f}" if peak is not None else f"{'':>9}"
+        print(f"{name:<{width}}  {n:>7}  {total:>10.1f}  {mean:>9.2f}  {mx:>9.2f}  {peak_s}", file=out)
+    for name, value in sorted(counters.items()):
+        print(f"{name}: {value:g}", file=out)
+
+
+def finish():
+    """Write the trace file and print the summary (runs once, at exit)."""
+    global _enabled
+    if not _enabled:
+        return
+    _enabled = False
+    with _lock:
+        events = list(_events)
+        counters = dict(_counters)
+    meta = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": _name}}]
+    with open(_trace_path, "w") as f:
+        json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms",
+                   "otherData": {"counters": counters}}, f)
+    print_summary(events, counters)
+    if _memory:
+        print(f"tracemalloc peak: {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MiB", file=sys.stderr)
+    print(f"Trace written to {_trace_path}", file=sys.stderr)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect a trace written by --profile")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("summary", help="print the per-span table for a saved trace")
+    s.add_argument("trace")
+    args = ap.parse_args()
+
+    with open(args.trace) as f:
+        doc = json.load(f)
+    print_summary(doc.get("traceEvents", []), doc.get("otherData", {}).get("counters", {}), out=sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Time-indexed binary archive of raw location history.
+
+`ingest` parses Google Timeline / Location History Visualizer exports once and
+stores every point as three memory-mapped columns, sorted by time:
+
+  .gallery-cache/locations/ts.<gen>.i64     UTC milliseconds, int64, ascending
+  .gallery-cache/locations/lat.<gen>.f64    float64
+  .gallery-cache/locations/lng.<gen>.f64    float64
+  .gallery-cache/locations/meta.json        {"count", "generation", "sources": [{"name", "sha256", "points", "added"}]}
+
+(Generation 0, an archive that has never been merged, is ts.i64/lat.f64/lng.f64.)
+
+Points already in the archive (same millisecond and coordinates to 1e-7 deg)
+are dropped, so overlapping exports - each Timeline export repeats the whole
+history - only add what is new. New points that all fall after the last stored
+one are appended in place; anything earlier is merged into a new generation of
+column files. An export whose bytes were already ingested is skipped outright.
+
+meta.json is the commit point and is replaced atomically: a run that dies
+mid-append leaves rows past its count, which are ignored and truncated on the
+next ingest, and one that dies mid-merge leaves an unreferenced generation,
+removed on the next save. Either way the three columns stay aligned.
+
+A date range is two binary searches on the timestamp column; nothing is parsed.
+location_to_route.py --archive reads from here instead of a JSON file.
+
+Usage (from repo root):
+  python3 scripts/python/location_archive.py ingest Timeline.json [more.json ...]
+  python3 scripts/python/location_archive.py info
+  python3 scripts/python/location_archive.py query --start 2025-06-01 --end 2025-06-14
+  python3 scripts/python/location_to_route.py --archive --start 2025-06-01 --end 2025-06-14 --route-id trip --update
+
+Requires: pip install numpy
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+import instrument
+import location_to_route
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+ARCHIVE_DIR = os.path.join(REPO_ROOT, ".gallery-cache", "locations")
+
+COLUMNS = (("ts", "ts.i64", np.int64), ("lat", "lat.f64", np.float64), ("lng", "lng.f64", np.float64))
+# Coordinates are compared at this resolution when deduplicating
+COORD_SCALE = 1e7
+COLUMN_FILE = re.compile(r"^(ts|lat|lng)(\.\d+)?\.(i64|f64)$")
+
+
+def _first_occurrences(ts, lat, lng):
+    """Mask of rows whose (ts, lat, lng) has not appeared in an earlier row."""
+    lat_i = np.round(lat * COORD_SCALE).astype(np.int64)
+    lng_i = np.round(lng * COORD_SCALE).astype(np.int64)
+    order = np.lexsort((lng_i, lat_i, ts))  # stable, so the earliest copy sorts first
+    same = ((ts[order][1:] == ts[order][:-1]) & (lat_i[order][1:] == lat_i[order][:-1])
+            & (lng_i[order][1:] == lng_i[order][:-1]))
+    keep = np.ones(len(ts), dtype=bool)
+    keep[order[1:][same]] = False
+    return keep
+
+
+class LocationArchive:
+    """Sorted, memory-mapped timestamp/lat/lng columns plus meta.json."""
+
+    def __init__(self, archive_dir: str = ARCHIVE_DIR):
+        self.dir = archive_dir
+        self.meta_path = os.path.join(archive_dir, "meta.json")
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"count": 0, "sources": []}
+        self._columns = None
+
+    def __len__(self):
+        return self.meta["count"]
+
+    def _path(self, filename, generation=None):
+        """Path of a column file in the given generation (default: the committed one)."""
+        gen = self.meta.get("generation", 0) if generation is None else generation
+        if gen:
+            stem, ext = filename.split(".")
+            filename = f"{stem}.{gen}.{ext}"
+        return os.path.join(self.dir, filename)
+
+    @property
+    def columns(self):
+        """{"ts", "lat", "lng"} read-only memmaps of the committed rows."""
+        if self._columns is None:
+            n = len(self)
+            self._columns = {
+                name: np.memmap(self._path(filename), dtype=dtype, mode="r", shape=(n,)) if n
+                else np.zeros(0, dtype=dtype)
+                for name, filename, dtype in COLUMNS
+            }
+        return self._columns
+
+    def _save_meta(self):
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp, self.meta_path)
+        # Column files of other generations are superseded or were never committed
+        current = {os.path.basename(self._path(filename)) for _, filename, _ in COLUMNS}
+        for name in os.listdir(self.dir):
+            if COLUMN_FILE.match(name) and name not in current:
+                os.remove(os.path.join(self.dir, name))
+
+    def slice(self, lo_ms=None, hi_ms=None):
+        """Rows with lo_ms <= ts < hi_ms as (ts, lat, lng) memmap views."""
+        ts = self.columns["ts"]
+        i = int(np.searchsorted(ts, lo_ms, side="left")) if lo_ms is not None else 0
+        j = int(np.searchsorted(ts, hi_ms, side="left")) if hi_ms is not None else len(ts)
+        return ts[i:j], self.columns["lat"][i:j], self.columns["lng"][i:j]
+
+    def route_points(self, start_date=None, end_date=None, tz_offset=-7):
+        """The same [lat, lng, timestamp] triples load_location_history() returns."""
+        lo, hi = location_to_route.date_window(start_date, end_date, tz_offset)
+        with instrument.span("archive-slice"):
+            ts, lat, lng = self.slice(int(lo.timestamp() * 1000) if lo else None,
+                                      int(hi.timestamp() * 1000) if hi else None)
+        stamps = np.datetime_as_string((ts // 1000).astype("datetime64[s]"), unit="s")
+        return [[round(a, 6), round(b, 6), f"{s}.000Z"]
+                for a, b, s in zip(lat.tolist(), lng.tolist(), stamps.tolist())]
+
+    def add(self, ts, lat, lng):
+        """Merge points in; returns how many were new."""
+        order = np.argsort(ts, kind="stable")
+        ts, lat, lng = ts[order], lat[order], lng[order]
+
+        if not len(ts):
+            return 0
+
+        # Drop duplicates within the batch and of stored rows in its time span;
+        # stored rows go first so they are the copy that is kept
+        old_ts, old_lat, old_lng = self.slice(int(ts[0]), int(ts[-1]) + 1)
+        keep = _first_occurrences(np.concatenate([old_ts, ts]), np.concatenate([old_lat, lat]),
+                                  np.concatenate([old_lng, lng]))[len(old_ts):]
+        ts, lat, lng = ts[keep], lat[keep], lng[keep]
+        if not len(ts):
+            return 0
+
+        os.makedirs(self.dir, exist_ok=True)
+        n = len(self)
+        new = {"ts": ts, "lat": lat, "lng": lng}
+        if n == 0 or ts[0] >= self.columns["ts"][-1]:
+            with instrument.span("archive-append", rows=len(ts)):
+                for name, filename, dtype in COLUMNS:
+                    with open(self._path(filename), "ab") as f:
+                        f.truncate(n * np.dtype(dtype).itemsize)
+                        f.write(new[name].astype(dtype).tobytes())
+        else:
+            # Written as the next generation; the old columns stay committed until meta.json switches over
+            gen = self.meta.get("generation", 0) + 1
+            with instrument.span("archive-merge", rows=n + len(ts)):
+                merged_ts = np.concatenate([self.columns["ts"], ts])
+                order = np.argsort(merged_ts, kind="stable")
+                for name, filename, dtype in COLUMNS:
+                    column = np.concatenate([self.columns[name], new[name]])[order].astype(dtype)
+                    column.tofile(self._path(filename, gen))
+            self.meta["generation"] = gen
+        self._columns = None
+        self.meta["count"] = n + len(ts)
+        return len(ts)
+
+    def ingest(self, path):
+        """Add one export file; returns the number of new points, or None if it was already ingested."""
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        if any(s["sha256"] == digest for s in self.meta["sources"]):
+            return None
+        points = location_to_route.read_export(path)
+        ts = np.fromiter((round(p[0].timestamp() * 1000) for p in points), dtype=np.int64, count=len(points))
+        lat = np.fromiter((p[1] for p in points), dtype=np.float64, count=len(points))
+        lng = np.fromiter((p[2] for p in points), dtype=np.float64, count=len(points))
+        added = self.add(ts, lat, lng)
+        self.meta["sources"].append({"name": os.path.basename(path), "sha256": digest,
+                                     "points": len(points), "added": added})
+        self._save_meta()
+        return added
+
+
+def _utc(ms):
+    return np.datetime_as_string(np.datetime64(int(ms), "ms"), unit="s") + "Z"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Binary, time-indexed archive of location history exports")
+    ap.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    i = sub.add_parser("ingest", help="add Timeline / visualizer exports to the archive")
+    i.add_argument("files", nargs="+")
+    sub.add_parser("info", help="show what the archive holds")
+    q = sub.add_parser("query", help="print [lat, lng, timestamp] points for a date range")
+    q.add_argument("--start", help="local date (YYYY-MM-DD), inclusive")
+    q.add_argument("--end", help="local date (YYYY-MM-DD), inclusive")
+    q.add_argument("--tz-offset", type=int, default=-7, help="hours from UTC (default: -7)")
+    instrument.add_arguments(ap)
+    args = ap.parse_args()
+    instrument.setup(args, "location_archive")
+
+    archive = LocationArchive(args.archive_dir)
+    if args.cmd == "ingest":
+        for path in args.files:
+            t = time.perf_counter()
+            with instrument.span("ingest", file=os.path.basename(path)):
+                added = archive.ingest(path)
+            if added is None:
+                print(f"  - {path}: already ingested")
+            else:
+                print(f"  ✓ {path}: {added} new points ({time.perf_counter() - t:.1f}s)")
+        print(f"Archive holds {len(archive)} points")
+    elif args.cmd == "info":
+        if not len(archive):
+            print("Archive is empty; run ingest first.")
+            return
+        ts = archive.columns["ts"]
+        print(f"{len(archive)} points, {_utc(ts[0])} -> {_utc(ts[-1])}")
+        for s in archive.meta["sources"]:
+            print(f"  {s['name']}: {s['points']} points, {s['added']} new")
+    else:
+        t = time.perf_counter()
+        points = archive.route_points(args.start, args.end, args.tz_offset)
+        print(json.dumps(points))
+        print(f"{len(points)} points in {(time.perf_counter() - t) * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ Convert a location history JSON file into a route for routes.json.
 
 Usage:
   python location_to_route.py <location_history.json> [--route-id ID] [--update]
+  python location_to_route.py --archive --start DATE --end DATE [--route-id ID] [--update]
 
 Two input formats are supported and detected automatically:
 
@@ -16,11 +17,17 @@ Two input formats are supported and detected automatically:
    are "geo:lat,lng" strings.
 
 Options:
+  --archive [DIR] Slice the date range out of the archive location_archive.py
+                  ingest builds, instead of parsing a JSON export
   --route-id ID   The route ID in routes.json to update or create
   --update        Write the route into routes.json (creates it if missing)
   --start DATE    Keep points on or after this local date (YYYY-MM-DD)
   --end DATE      Keep points on or before this local date (YYYY-MM-DD)
   --tz-offset H   Hours from UTC used to derive local dates (default: -7)
+  --max-speed KMH Drop GPS spikes faster than this (default: 250, 0 disables)
+  --stay-radius M / --stay-minutes MIN
+                  Collapse dwells within M meters lasting MIN minutes into one
+                  point before simplifying (default: 200 m, 20 min, 0 disables)
   --name/--description/--color/--tags/--date  Metadata for a newly created route
 
 Without --update, prints the coordinates array to stdout.
@@ -32,6 +39,8 @@ import argparse
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+import instrument
+
 REPO_ROOT = Path(__file__).resolve().parent.parent.parent
 ROUTES_JSON = REPO_ROOT / "routes.json"
 
@@ -92,6 +101,94 @@ def rdp(points, epsilon_m, lat_scale):
     return [p for p, k in zip(points, keep) if k]
 
 
+def _epoch(ts):
+    return parse_time(ts).timestamp()
+
+
+def reject_outliers(points, max_speed_kmh=250):
+    """
+    Drop GPS spikes from a stream of (lat, lng, timestamp, epoch) tuples.
+
+    A point is rejected when reaching it from the last kept point needs more
+    than max_speed_kmh but the point after it is plausible from that same
+    kept point (out and straight back). When the next point is just as far
+    away, the jump was real (a flight, a ferry, a gap in the recording) and
+    the point is kept. Streams with one point of lookahead.
+    """
+    max_mps = max_speed_kmh / 3.6
+
+    def speed(a, b):
+        dt = b[3] - a[3]
+        dist = haversine_m(a[0], a[1], b[0], b[1])
+        if dt <= 0:
+            return 0.0 if dist < 1 else math.inf
+        return dist / dt
+
+    kept = None
+    pending = None
+    for pt in points:
+        if kept is None:
+            kept = pt
+            yield pt
+            continue
+        if pending is not None:
+            if speed(kept, pt) <= max_mps:
+                instrument.count("outliers")
+            else:
+                kept = pending
+                yield pending
+            pending = None
+        if speed(kept, pt) > max_mps:
+            pending = pt
+        else:
+            kept = pt
+            yield pt
+    if pending is not None:
+        yield pending
+
+
+def collapse_stays(points, radius_m=200, min_minutes=20):
+    """
+    Replace each stay - consecutive points within radius_m of the first one,
+    spanning at least min_minutes - with a single point at their centroid,
+    stamped with the arrival time. Shorter clusters pass through unchanged.
+    Only the current cluster is buffered.
+    """
+    min_s = min_minutes * 60
+
+    def flush(cluster):
+        if len(cluster) > 1 and cluster[-1][3] - cluster[0][3] >= min_s:
+            instrument.count("stay_points")
+            n = len(cluster)
+            yield (sum(p[0] for p in cluster) / n, sum(p[1] for p in cluster) / n,
+                   cluster[0][2], cluster[0][3])
+        else:
+            yield from cluster
+
+    cluster = []
+    for pt in points:
+        if cluster and haversine_m(cluster[0][0], cluster[0][1], pt[0], pt[1]) > radius_m:
+            yield from flush(cluster)
+            cluster = []
+        cluster.append(pt)
+    yield from flush(cluster)
+
+
+def filter_track(points, max_speed_kmh=250, stay_radius_m=200, stay_minutes=20):
+    """
+    Single streaming pass over time-sorted [lat, lng, timestamp] points that
+    rejects speed-implausible spikes and collapses stay-points, so simplify_route()
+    starts from a track without dwell clutter or spurious long segments.
+    A max_speed_kmh or stay_minutes of 0 turns that step off.
+    """
+    stream = ((p[0], p[1], p[2], _epoch(p[2])) for p in points)
+    if max_speed_kmh > 0:
+        stream = reject_outliers(stream, max_speed_kmh)
+    if stay_minutes > 0:
+        stream = collapse_stays(stream, stay_radius_m, stay_minutes)
+    return [[round(p[0], 6), round(p[1], 6), p[2]] for p in stream]
+
+
 def simplify_route(points, min_distance_m=500, max_points=200, epsilon_m=0):
     """
     Simplify a route: drop points closer together than min_distance_m (which
@@ -103,17 +200,19 @@ def simplify_route(points, min_distance_m=500, max_points=200, epsilon_m=0):
     if len(points) <= 2:
         return points
 
-    simplified = [points[0]]
-    for pt in points[1:-1]:
-        last = simplified[-1]
-        dist = haversine_m(last[0], last[1], pt[0], pt[1])
-        if dist >= min_distance_m:
-            simplified.append(pt)
-    simplified.append(points[-1])
+    with instrument.span("thin", points=len(points)):
+        simplified = [points[0]]
+        for pt in points[1:-1]:
+            last = simplified[-1]
+            dist = haversine_m(last[0], last[1], pt[0], pt[1])
+            if dist >= min_distance_m:
+                simplified.append(pt)
+        simplified.append(points[-1])
 
     if epsilon_m > 0:
         mean_lat = sum(p[0] for p in simplified) / len(simplified)
-        simplified = rdp(simplified, epsilon_m, math.cos(math.radians(mean_lat)))
+        with instrument.span("rdp", points=len(simplified)):
+            simplified = rdp(simplified, epsilon_m, math.cos(math.radians(mean_lat)))
 
     # If still too many points, subsample evenly
     if len(simplified) > max_points:
@@ -187,28 +286,42 @@ def extract_visualizer(data):
     return points
 
 
-def load_location_history(path, start_date=None, end_date=None, tz_offset=-7):
-    """Load a location history file and return [lat, lng, timestamp] triples."""
-    with open(path) as f:
+def read_export(path):
+    """Parse either export format into unsorted (datetime, lat, lng) points."""
+    with instrument.span("parse-json"), open(path) as f:
         data = json.load(f)
 
     if not isinstance(data, list):
         print("Error: expected a JSON array", file=sys.stderr)
         sys.exit(1)
 
-    if data and "startTime" in data[0]:
-        points = extract_timeline(data)
-    else:
-        points = extract_visualizer(data)
+    with instrument.span("extract", records=len(data)):
+        if data and "startTime" in data[0]:
+            return extract_timeline(data)
+        return extract_visualizer(data)
+
 
-    # Dates are interpreted in a fixed local zone so a trip's days line up with
-    # the calendar the traveller experienced, not UTC.
+def date_window(start_date=None, end_date=None, tz_offset=-7):
+    """
+    (lo, hi) aware datetimes for --start/--end, hi exclusive; None where unset.
+
+    Dates are interpreted in a fixed local zone so a trip's days line up with
+    the calendar the traveller experienced, not UTC.
+    """
     local = timezone(timedelta(hours=tz_offset))
-    if start_date:
-        lo = datetime.fromisoformat(start_date).replace(tzinfo=local)
+    lo = datetime.fromisoformat(start_date).replace(tzinfo=local) if start_date else None
+    hi = datetime.fromisoformat(end_date).replace(tzinfo=local) + timedelta(days=1) if end_date else None
+    return lo, hi
+
+
+def load_location_history(path, start_date=None, end_date=None, tz_offset=-7):
+    """Load a location history file and return [lat, lng, timestamp] triples."""
+    points = read_export(path)
+
+    lo, hi = date_window(start_date, end_date, tz_offset)
+    if lo:
         points = [p for p in points if p[0] >= lo]
-    if end_date:
-        hi = datetime.fromisoformat(end_date).replace(tzinfo=local) + timedelta(days=1)
+    if hi:
         points = [p for p in points if p[0] < hi]
 
     points.sort(key=lambda p: p[0])
@@ -220,7 +333,10 @@ def load_location_history(path, start_date=None, end_date=None, tz_offset=-7):
 
 def main():
     parser = argparse.ArgumentParser(description="Convert location history to route coordinates")
-    parser.add_argument("input", help="Path to location history JSON file")
+    parser.add_argument("input", nargs="?", help="Path to location history JSON file")
+    parser.add_argument("--archive", nargs="?", const=True, metavar="DIR",
+                        help="Read from the binary archive built by location_archive.py ingest "
+                             "instead of a JSON file (default dir: .gallery-cache/locations)")
     parser.add_argument("--route-id", help="Route ID to update in routes.json")
     parser.add_argument("--update", action="store_true", help="Update routes.json in place")
     parser.add_argument("--min-distance", type=int, default=500,
@@ -229,6 +345,12 @@ def main():
                         help="Maximum number of points to keep (default: 200)")
     parser.add_argument("--epsilon", type=int, default=0,
                         help="Douglas-Peucker tolerance in meters; 0 disables it (default: 0)")
+    parser.add_argument("--max-speed", type=int, default=250,
+                        help="Drop GPS spikes that imply more than this speed in km/h; 0 disables it (default: 250)")
+    parser.add_argument("--stay-radius", type=int, default=200,
+                        help="Radius in meters of a stay-point (default: 200)")
+    parser.add_argument("--stay-minutes", type=int, default=20,
+                        help="Collapse stays of at least this many minutes to one point; 0 disables it (default: 20)")
     parser.add_argument("--start", help="Keep points on or after this local date (YYYY-MM-DD)")
     parser.add_argument("--end", help="Keep points on or before this local date (YYYY-MM-DD)")
     parser.add_argument("--tz-offset", type=int, default=-7,
@@ -238,20 +360,41 @@ def main():
     parser.add_argument("--color", help="Line color for a newly created route")
     parser.add_argument("--tags", help="Comma-separated tags for a newly created route")
     parser.add_argument("--date", help="Sort date (YYYY-MM-DD) for a newly created route")
+    instrument.add_arguments(parser)
     args = parser.parse_args()
+    instrument.setup(args, "location_to_route")
+    if not args.input and not args.archive:
+        parser.error("give a location history JSON file or --archive")
 
     # Load and simplify
-    raw_points = load_location_history(args.input, args.start, args.end, args.tz_offset)
+    with instrument.span("load"):
+        if args.archive:
+            import location_archive
+            archive_dir = args.archive if isinstance(args.archive, str) else location_archive.ARCHIVE_DIR
+            raw_points = location_archive.LocationArchive(archive_dir).route_points(
+                args.start, args.end, args.tz_offset)
+        else:
+            raw_points = load_location_history(args.input, args.start, args.end, args.tz_offset)
+    instrument.count("raw_points", len(raw_points))
     print(f"Loaded {len(raw_points)} raw points", file=sys.stderr)
     if not raw_points:
         print("Error: no points in range", file=sys.stderr)
         sys.exit(1)
     print(f"Range: {raw_points[0][2]} -> {raw_points[-1][2]}", file=sys.stderr)
 
-    simplified = simplify_route(raw_points,
-                                min_distance_m=args.min_distance,
-                                max_points=args.max_points,
-                                epsilon_m=args.epsilon)
+    with instrument.span("filter", points=len(raw_points)):
+        filtered = filter_track(raw_points,
+                                max_speed_kmh=args.max_speed,
+                                stay_radius_m=args.stay_radius,
+                                stay_minutes=args.stay_minutes)
+    instrument.count("filtered_points", len(filtered))
+    print(f"Filtered to {len(filtered)} points", file=sys.stderr)
+
+    with instrument.span("simplify"):
+        simplified = simplify_route(filtered,
+                                    min_distance_m=args.min_distance,
+                                    max_points=args.max_points,
+                                    epsilon_m=args.epsilon)
     print(f"Simplified to {len(simplified)} points", file=sys.stderr)
 
     if args.update and args.route_id:
@@ -287,11 +430,25 @@ def main():
                 "coordinates": simplified,
             })
 
-        with open(ROUTES_JSON, "w") as f:
+        # Static thumbnail for the road list, redrawn only if the coordinates changed
+        try:
+            import route_previews
+        except ImportError:
+            print("Route preview skipped (pip install numpy)", file=sys.stderr)
+        else:
+            with instrument.span("preview"):
+                route_previews.update_previews(REPO_ROOT, routes)
+
+        with instrument.span("write"), open(ROUTES_JSON, "w") as f:
             json.dump(routes, f, indent=2)
             f.write("\n")
 
         print(f"{action} route '{args.route_id}' in {ROUTES_JSON}", file=sys.stderr)
+
+        # road/index.html inlines routes.json
+        import prerender_pages
+        with instrument.span("route-page"):
+            prerender_pages.build_route_pages(REPO_ROOT, ["road"])
     else:
         # Print coordinates to stdout
         print(json.dumps(simplified, indent=2))
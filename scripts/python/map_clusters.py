@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Precompute the album map's marker clusters (supercluster-style zoom pyramid)
+from images/gallery.json into images/map-clusters.json.
+
+  {
+    "version": 1, "radius": 60, "extent": 512, "minZoom": 0, "maxZoom": 13,
+    "bounds": [minLat, minLng, maxLat, maxLng],
+    "points": [[lat, lng, url], ...],     # every geotagged photo, in tree order
+    "zooms": [                            # one list per zoom, minZoom..maxZoom
+      [[lat, lng, start, count, minLat, minLng, maxLat, maxLng], [start], ...]
+    ]
+  }
+
+Points are ordered by a depth-first walk of the cluster tree, so every cluster
+at every zoom covers the contiguous slice points[start:start + count]. A
+single-photo cluster is stored as just [start]. Above maxZoom no two photos
+are within the cluster radius, so the map draws individual points there.
+
+The page draws the clusters for the current zoom and filters the grid by the
+visible clusters' slices instead of testing every photo against the bounds.
+
+Usage (from repo root):
+  python3 scripts/python/map_clusters.py                    # rebuild map-clusters.json
+  python3 scripts/python/map_clusters.py bench --points 100000
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+GALLERY_PATH = os.path.join(REPO_ROOT, "images", "gallery.json")
+
+RADIUS_PX = 60
+EXTENT_PX = 512
+MIN_ZOOM = 0
+MAX_ZOOM = 16
+
+
+def clusters_path_for(gallery_path):
+    return os.path.join(os.path.dirname(gallery_path), "map-clusters.json")
+
+
+def date_ms(value):
+    """Same date handling as the page: ISO first, then EXIF 'YYYY:MM:DD'."""
+    if not value:
+        return None
+    text = str(value)
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        pass
+    m = re.match(r"^(\d{4}):(\d{2}):(\d{2})", text)
+    if m:
+        try:
+            return datetime(int(m[1]), int(m[2]), int(m[3])).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
+def _has_geo(entry):
+    return isinstance(entry.get("lat"), (int, float)) and isinstance(entry.get("lng"), (int, float))
+
+
+def dedupe_like_page(gallery):
+    """Collapse entries by filename stem exactly as loadGalleryImages() does, so counts match."""
+    by_key = {}
+    for entry in gallery:
+        key = os.path.splitext(os.path.basename(entry.get("url") or ""))[0].lower()
+        existing = by_key.get(key)
+        if existing is None:
+            by_key[key] = entry
+            continue
+        ta, tb = date_ms(existing.get("date_taken")), date_ms(entry.get("date_taken"))
+        prefer_new = (
+            (tb is not None and ta is None)
+            or (tb is not None and ta is not None and tb > ta)
+            or (tb is None and ta is None and _has_geo(entry) and not _has_geo(existing))
+        )
+        if prefer_new:
+            by_key[key] = entry
+    return list(by_key.values())
+
+
+def project(lat, lng):
+    """Web Mercator to [0, 1] x [0, 1]."""
+    s = min(max(math.sin(math.radians(lat)), -0.9999), 0.9999)
+    return lng / 360 + 0.5, 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+
+
+def unproject_lat(y):
+    return math.degrees(2 * math.atan(math.exp((1 - 2 * y) * math.pi)) - math.pi / 2)
+
+
+class _Node:
+    __slots__ = ("x", "y", "count", "children", "leaf", "start", "bbox")
+
+    def __init__(self, x, y, count, children=None, leaf=None):
+        self.x, self.y, self.count = x, y, count
+        self.children = children
+        self.leaf = leaf
+        self.start = self.bbox = None
+
+
+def _cluster_level(nodes, r):
+    """Greedily merge nodes within r (projected units) into weighted-centroid clusters."""
+    grid = defaultdict(list)
+    for i, n in enumerate(nodes):
+        grid[(int(n.x / r), int(n.y / r))].append(i)
+    taken = [False] * len(nodes)
+    r2 = r * r
+    out = []
+    for i, n in enumerate(nodes):
+        if taken[i]:
+            continue
+        taken[i] = True
+        members = [n]
+        cx, cy = int(n.x / r), int(n.y / r)
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for j in grid.get((gx, gy), ()):
+                    if taken[j]:
+                        continue
+                    m = nodes[j]
+                    if (m.x - n.x) ** 2 + (m.y - n.y) ** 2 <= r2:
+                        taken[j] = True
+                        members.append(m)
+        if len(members) == 1:
+            out.append(n)
+            continue
+        total = sum(m.count for m in members)
+        out.append(_Node(sum(m.x * m.count for m in members) / total,
+                         sum(m.y * m.count for m in members) / total,
+                         total, children=members))
+    return out
+
+
+def _assign_ranges(node, order, points):
+    """Depth-first: give each node its [start, start + count) slice and lat/lng bbox."""
+    node.start = len(order)
+    if node.children is None:
+        order.append(node.leaf)
+        lat, lng = points[node.leaf][0], points[node.leaf][1]
+        node.bbox = (lat, lng, lat, lng)
+        return
+    boxes = []
+    for child in node.children:
+        _assign_ranges(child, order, points)
+        boxes.append(child.bbox)
+    node.bbox = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                 max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+def build_pyramid(points, radius=RADIUS_PX, extent=EXTENT_PX, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    """points: [(lat, lng, url)]. Returns the map-clusters.json document."""
+    nodes = [_Node(*project(lat, lng), 1, leaf=i) for i, (lat, lng, _url) in enumerate(points)]
+    levels = {}
+    for z in range(max_zoom, min_zoom - 1, -1):
+        nodes = _cluster_level(nodes, radius / (extent * 2 ** z))
+        levels[z] = nodes
+
+    # Every node at every zoom descends from one of the minZoom roots
+    order = []
+    for root in levels[min_zoom]:
+        _assign_ranges(root, order, points)
+
+    # Zooms above the last one with a real cluster are all single points; drop them
+    top = min_zoom
+    for z in range(min_zoom, max_zoom + 1):
+        if any(n.count > 1 for n in levels[z]):
+            top = z
+
+    r5 = lambda v: round(v, 5)
+    zooms = []
+    for z in range(min_zoom, top + 1):
+        rows = []
+        for n in levels[z]:
+            if n.count == 1:
+                rows.append([n.start])
+            else:
+                rows.append([r5(unproject_lat(n.y)), r5((n.x - 0.5) * 360), n.start, n.count,
+                             *(r5(v) for v in n.bbox)])
+        zooms.append(rows)
+
+    ordered = [[r5(points[i][0]), r5(points[i][1]), points[i][2]] for i in order]
+    bounds = None
+    if ordered:
+        bounds = [min(p[0] for p in ordered), min(p[1] for p in ordered),
+                  max(p[0] for p in ordered), max(p[1] for p in ordered)]
+    return {
+        "version": 1, "radius": radius, "extent": extent,
+        "minZoom": min_zoom, "maxZoom": top,
+        "bounds": bounds, "points": ordered, "zooms": zooms,
+    }
+
+
+def gallery_points(gallery):
+    return [(e["lat"], e["lng"], e["url"]) for e in dedupe_like_page(gallery) if e.get("url") and _has_geo(e)]
+
+
+def write_clusters(gallery, gallery_path=GALLERY_PATH):
+    pyramid = build_pyramid(gallery_points(gallery))
+    with open(clusters_path_for(gallery_path), "w") as f:
+        json.dump(pyramid, f, separators=(",", ":"), ensure_ascii=False)
+        f.write("\n")
+    return pyramid
+
+
+def bench(n_points, seed=1):
+    rng = random.Random(seed)
+    # Photos come in trips: dense clumps around a few hundred centres
+    centres = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(max(1, n_points // 500))]
+    points = []
+    for i in range(n_points):
+        lat, lng = rng.choice(centres)
+        points.append((lat + rng.gauss(0, 0.3), lng + rng.gauss(0, 0.3), f"p{i}"))
+    t = time.perf_counter()
+    pyramid = build_pyramid(points)
+    elapsed = time.perf_counter() - t
+    size = len(json.dumps(pyramid, separators=(",", ":")))
+    print(f"points={n_points} build={elapsed:.2f}s size={size / 1024:.0f} KiB maxZoom={pyramid['maxZoom']}")
+    for z, rows in enumerate(pyramid["zooms"], start=pyramid["minZoom"]):
+        print(f"  z{z:<2} {len(rows):7d} markers")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Zoom-level marker clusters for the album map")
+    sub = ap.add_subparsers(dest="cmd")
+    b = sub.add_parser("bench", help="time the build on synthetic points")
+    b.add_argument("--points", type=int, default=100000)
+    args = ap.parse_args()
+
+    if args.cmd == "bench":
+        bench(args.points)
+        return
+    with open(GALLERY_PATH) as f:
+        gallery = json.load(f)
+    pyramid = write_clusters(gallery)
+    print(f"Clustered {len(pyramid['points'])} geotagged photos over zooms "
+          f"{pyramid['minZoom']}-{pyramid['maxZoom']}: "
+          + ", ".join(str(len(rows)) for rows in pyramid["zooms"]) + " markers")
+
+
+if __name__ == "__main__":
+    main()
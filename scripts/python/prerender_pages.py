@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Pre-render the SPA's /album, /road and /articles routes into static pages.
+
+Each page is index.html with that route already active: its list markup is
+rendered at build time, the JSON it would fetch is inlined as
+<script type="application/json" id="inline-..."> blocks (read by inlineData()
+in index.html), and the styles.css rules the first paint needs are inlined in
+a <style> block while the full stylesheet loads without blocking render.
+
+Output goes to album/index.html, road/index.html and articles/index.html,
+which server.py and static hosts serve for those paths before falling back
+to index.html. Pages are minified, and keep whatever (hashed) stylesheet URL
+index.html links, so assets.py's fingerprinting carries over.
+
+Usage (from repo root):
+  python3 scripts/python/prerender_pages.py            # write the pages
+  python3 scripts/python/prerender_pages.py --report   # bytes/requests before vs after
+"""
+
+import argparse
+import gzip
+import json
+import re
+from datetime import datetime
+from html import escape
+from pathlib import Path
+
+try:
+    from . import assets, map_clusters
+except ImportError:
+    import assets
+    import map_clusters
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# Mirrors metaForPageId() in index.html
+PAGE_META = {
+    'articles': {
+        'title': 'ethan - articles',
+        'description': 'Long-form essays and analysis on software engineering, geopolitics, AI, and technology by Ethan Steininger.',
+    },
+    'album': {
+        'title': 'ethan - album',
+        'description': 'Photo journal from van life adventures, alpine lakes, and outdoor explorations. View location-tagged photos on an interactive map.',
+    },
+    'road': {
+        'title': 'ethan - road trips',
+        'description': 'Road trip routes from van life adventures across the US and Canada. GPS-tracked routes through national parks, mountain passes, and coastal highways.',
+    },
+}
+
+# JSON each route needs for its first render, keyed by the inlineData() name
+PAGE_DATA = {
+    'articles': {'posts-index': 'posts-index.json'},
+    'album': {'gallery': 'images/gallery.json', 'map-clusters': 'images/map-clusters.json'},
+    'road': {'routes': 'routes.json'},
+}
+
+PLACEHOLDERS = {
+    'articles': '<!-- Blog list will be rendered here -->',
+    'album': '<!-- Gallery items will be rendered here -->',
+    'road': '<!-- Filled by loadRoutes() -->',
+}
+
+# index.html's blocking stylesheet: styles.css, or its hashed copy after assets.py
+STYLESHEET_LINK = re.compile(r'<link rel="stylesheet" href="((?:/assets/)?styles(?:\.[0-9a-f]+)?\.css)">')
+
+GALLERY_PRERENDER = 24
+TAG_COLORS = ['#3b82f6', '#ef4444', '#22c55e', '#f59e0b', '#8b5cf6',
+              '#ec4899', '#06b6d4', '#f97316', '#14b8a6', '#6366f1']
+SEARCH_SVG = ('<svg width="14" height="14" viewBox="0 0 512 512" fill="currentColor"><path d="M416 208c0 45.9-14.9 88.3-40 '
+              '122.7L502.6 457.4c12.5 12.5 12.5 32.8 0 45.3s-32.8 12.5-45.3 0L330.7 376c-34.4 25.2-76.8 40-122.7 40C93.1 416 0 '
+              '322.9 0 208S93.1 0 208 0s208 93.1 208 208zM208 352a144 144 0 100-288 144 144 0 000 288z"/></svg>')
+
+
+def long_date(value):
+    """'June 26, 2026' for ISO dates, '' when the value does not parse (as the page's Date.parse)."""
+    try:
+        d = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return ''
+    return f"{d.strftime('%B')} {d.day}, {d.year}"
+
+
+# -- list markup (mirrors renderBlogList / renderRoadList / renderGallery) ----
+
+def render_blog_list(posts):
+    items = []
+    for post in posts:
+        items.append(
+            f'<div class="blog-list-item" onclick="window.location.href=\'/{escape(post["id"])}\'">'
+            f'<h2>{escape(post.get("title", ""))}</h2>'
+            f'<div class="date">{long_date(post.get("date", ""))}</div>'
+            f'<div class="description">{escape(post.get("description", ""))}</div></div>'
+        )
+    return ''.join(items)
+
+
+def render_road_list(routes):
+    if not routes:
+        return '<p class="road-empty">No routes yet.</p>'
+    tag_colors = {}
+    for route in routes:
+        for tag in route.get('tags') or []:
+            tag_colors.setdefault(tag, TAG_COLORS[len(tag_colors) % len(TAG_COLORS)])
+
+    dated = sorted((r for r in routes if long_date(r.get('date', ''))), key=lambda r: r['date'], reverse=True)
+    ordered = dated + [r for r in routes if not long_date(r.get('date', ''))]
+    cards = []
+    for idx, route in enumerate(ordered):
+        rid = escape(str(route.get('id') or route.get('name') or idx))
+        name = escape(route.get('name') or 'Untitled Route')
+        desc = escape(route.get('description') or '')
+        tags = ''.join(
+            f'<span class="road-tag" style="border-color:{tag_colors[t]}; color:{tag_colors[t]}">{escape(t)}</span>'
+            for t in route.get('tags') or []
+        )
+        src = route.get('image') or route.get('preview')
+        if src:
+            preview = (f'<img class="road-image-preview" src="{escape(src)}" alt="{name}" '
+                       f'loading="lazy" decoding="async">')
+        else:
+            preview = f'<div class="road-map-preview" id="road-preview-{rid}"></div>'
+        cards.append(
+            f'<div class="road-card" data-route-id="{rid}" onclick="openRoadModal({idx})">{preview}'
+            f'<div class="road-card-info"><div class="road-card-title-row">'
+            f'<span class="road-color-dot" style="background:{escape(route.get("color") or "#3388ff")}"></span>'
+            f'<h2>{name}</h2></div>'
+            + (f'<div class="road-card-desc">{desc}</div>' if desc else '')
+            + (f'<div class="road-tags">{tags}</div>' if tags else '')
+            + '</div></div>'
+        )
+    return ''.join(cards)
+
+
+def gallery_picture_html(image):
+    url = escape(image['url'])
+    name = escape(image.get('name') or '')
+    dims = f' width="{image["width"]}" height="{image["height"]}"' if image.get('width') and image.get('height') else ''
+    lqip = f' style="background: url(\'{image["lqip"]}\') center / cover no-repeat"' if image.get('lqip') else ''
+    img = (f'<img src="{url}" alt="{name}"{dims}{lqip} loading="lazy" decoding="async" '
+           f'onclick="openLightbox(\'{url}\')">')
+    by_type = {}
+    for v in image.get('srcset') or []:
+        if v.get('url') and v.get('width'):
+            by_type.setdefault(v.get('type'), []).append(f'{v["url"]} {v["width"]}w')
+    if not by_type:
+        return img
+    sizes = '(max-width: 600px) 100vw, (max-width: 1000px) 50vw, 33vw'
+    sources = ''.join(f'<source type="{t}" srcset="{", ".join(by_type[t])}" sizes="{sizes}">'
+                      for t in ('image/avif', 'image/webp') if t in by_type)
+    return f'<picture>{sources}{img}</picture>'
+
+
+def render_gallery(gallery, limit=GALLERY_PRERENDER):
+    """First screenful of the default view: featured first, then newest date_taken."""
+    images = map_clusters.dedupe_like_page(gallery)
+
+    def key(img):
+        ts = map_clusters.date_ms(img.get('date_taken'))
+        return (not img.get('featured'), ts is None, -(ts or 0))
+    items = []
+    for image in sorted(images, key=key)[:limit]:
+        name = str(image.get('name') or '').strip()
+        if re.fullmatch(r'img[\s_-]*\d+', name, re.I):
+            name = ''
+        url = escape(image['url'])
+        info = f'<div class="location-name">{escape(name)}</div>' if name else ''
+        date = long_date(image.get('date_taken', '')) if image.get('date_taken') else ''
+        if date:
+            info += f'<div class="location-date">{date}</div>'
+        if isinstance(image.get('lat'), (int, float)) and isinstance(image.get('lng'), (int, float)):
+            info += (f'<a href="/album" class="location-coords" onclick="navigateAndFocus(\'{url}\'); '
+                     f'event.preventDefault(); event.stopPropagation();">{image["lat"]:.4f}°, {image["lng"]:.4f}°</a>')
+        items.append(
+            f'<div class="gallery-item" data-index="{len(items)}">{gallery_picture_html({**image, "name": name})}'
+            f'<button class="similar-btn" onclick="runReverseSearch(\'{url}\'); event.stopPropagation();" '
+            f'title="Find similar" aria-label="Find similar photos">{SEARCH_SVG}</button>'
+            f'<div class="location-info">{info}</div></div>'
+        )
+    return ''.join(items)
+
+
+# -- critical CSS -------------------------------------------------------------
+
+def split_rules(css):
+    """Top-level (prelude, body) pairs; @media bodies are returned unparsed."""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    rules, depth, start, prelude = [], 0, 0, None
+    for i, ch in enumerate(css):
+        if ch == '{':
+            if depth == 0:
+                prelude, start = css[start:i].strip(), i + 1
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append((prelude, css[start:i].strip()))
+                start = i + 1
+    return rules
+
+
+def used_tokens(html):
+    """Tag names, .classes and #ids present in a chunk of markup."""
+    used = {'html', 'body', '.theme-light', '.theme-dark'}
+    used.update(t.lower() for t in re.findall(r'<([a-zA-Z][\w-]*)', html))
+    for classes in re.findall(r'\bclass="([^"]*)"', html):
+        used.update('.' + c for c in classes.split())
+    used.update('#' + i for i in re.findall(r'\bid="([^"]*)"', html))
+    return used
+
+
+def selector_used(selector, used):
+    selector = re.sub(r'::?[\w-]+(\([^)]*\))?', '', selector)
+    selector = re.sub(r'\[[^\]]*\]', '', selector)
+    for compound in re.split(r'[\s>+~]+', selector.strip()):
+        for prefix, name in re.findall(r'([.#]?)(-?[_a-zA-Z][\w-]*)', compound):
+            if (prefix + name if prefix else name.lower()) not in used:
+                return False
+    return True
+
+
+def critical_css(css, used):
+    out = []
+    for prelude, body in split_rules(css):
+        if prelude.startswith('@media'):
+            inner = critical_css(body, used)
+            if inner:
+                out.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            continue  # keyframes/font-face are not needed for the first paint
+        elif any(selector_used(s, used) for s in prelude.split(',')):
+            body = re.sub(r'\s*([:;{}])\s*', r'\1', re.sub(r'\s+', ' ', body))
+            prelude = re.sub(r'\s+', ' ', prelude)
+            out.append(f'{prelude}{{{body}}}')
+    return ''.join(out)
+
+
+def div_end(html, start):
+    """Index just past the </div> closing the <div> that starts at `start`."""
+    depth = 0
+    for m in re.compile(r'<div\b|</div>').finditer(html, start):
+        depth += 1 if m.group() != '</div>' else -1
+        if depth == 0:
+            return m.end()
+    return len(html)
+
+
+def without_inactive_pages(body, page_id):
+    for m in reversed(list(re.finditer(r'<div id="(\w+)" class="page[^"]*">', body))):
+        if m.group(1) != page_id:
+            body = body[:m.start()] + body[div_end(body, m.start()):]
+    return body
+
+
+# -- page assembly --------------------------------------------------------------
+
+def inline_json(name, data):
+    text = json.dumps(data, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+    return f'<script type="application/json" id="inline-{name}">{text}</script>'
+
+
+def set_meta(html, page_id):
+    meta = PAGE_META[page_id]
+    title, desc = escape(meta['title']), escape(meta['description'])
+    url = f'https://ethan.dev/{page_id}'
+    subs = [
+        (r'<title>[^<]*</title>', f'<title>{title}</title>'),
+        (r'(<meta name="description" content=")[^"]*', rf'\g<1>{desc}'),
+        (r'(<meta property="og:title" content=")[^"]*', rf'\g<1>{title}'),
+        (r'(<meta property="og:description" content=")[^"]*', rf'\g<1>{desc}'),
+        (r'(<meta property="og:url" content=")[^"]*', rf'\g<1>{url}'),
+        (r'(<meta name="twitter:title" content=")[^"]*', rf'\g<1>{title}'),
+        (r'(<meta name="twitter:description" content=")[^"]*', rf'\g<1>{desc}'),
+        (r'(<link rel="canonical" href=")[^"]*', rf'\g<1>{url}'),
+    ]
+    for pattern, repl in subs:
+        html = re.sub(pattern, lambda _m, r=repl: _m.expand(r), html, count=1)
+    return html
+
+
+def render_page(project_root, page_id, template, css):
+    data = {name: json.loads((project_root / path).read_text(encoding='utf-8'))
+            for name, path in PAGE_DATA[page_id].items() if (project_root / path).exists()}
+    if page_id == 'articles':
+        markup = render_blog_list(data.get('posts-index', {}).get('posts', []))
+    elif page_id == 'album':
+        markup = render_gallery(data.get('gallery', []))
+    else:
+        markup = render_road_list(data.get('routes', []))
+
+    html = set_meta(template, page_id)
+    # Pages live one directory down; keep relative asset and fetch URLs rooted at /
+    html = html.replace('<meta charset="UTF-8">', '<meta charset="UTF-8">\n    <base href="/">', 1)
+    html = html.replace('<div id="about" class="page active">', '<div id="about" class="page">', 1)
+    html = html.replace(f'<div id="{page_id}" class="page">', f'<div id="{page_id}" class="page active">', 1)
+    html = html.replace('<a href="/about" class="nav-link active">', '<a href="/about" class="nav-link">', 1)
+    html = html.replace(f'<a href="/{page_id}" class="nav-link">', f'<a href="/{page_id}" class="nav-link active">', 1)
+    html = html.replace(PLACEHOLDERS[page_id], markup, 1)
+
+    body = html[html.index('<body'):]
+    style = critical_css(css, used_tokens(without_inactive_pages(body, page_id)))
+    link = STYLESHEET_LINK.search(html)
+    href = link.group(1)
+    html = (
+        html[:link.start()]
+        + f'<style id="critical-css">{style}</style>\n'
+        f'    <link rel="stylesheet" href="{href}" media="print" onload="this.media=\'all\'">\n'
+        f'    <noscript><link rel="stylesheet" href="{href}"></noscript>'
+        + html[link.end():]
+    )
+    blocks = '\n    '.join(inline_json(name, value) for name, value in data.items())
+    return html.replace('</body>', f'    {blocks}\n</body>', 1)
+
+
+def build_route_pages(project_root: Path, pages=None):
+    """Write <page>/index.html for each pre-rendered route (all of them by default)."""
+    template = (project_root / 'index.html').read_text(encoding='utf-8')
+    css = (project_root / 'styles.css').read_text(encoding='utf-8')
+    for page_id in pages or PAGE_META:
+        out_dir = project_root / page_id
+        out_dir.mkdir(exist_ok=True)
+        html = assets.minify_html(render_page(project_root, page_id, template, css))
+        (out_dir / 'index.html').write_text(html, encoding='utf-8')
+        print(f"  ✓ Created {page_id}/index.html")
+
+
+def refresh_album(project_root: Path, gallery=None):
+    """Rebuild images/map-clusters.json and album/index.html after gallery.json changes.
+
+    Called by the tools that write the gallery, once per run. Without an
+    index.html to render from (a scripts-only checkout) only the clusters are written.
+    """
+    gallery_path = project_root / 'images' / 'gallery.json'
+    if gallery is None:
+        gallery = json.loads(gallery_path.read_text(encoding='utf-8'))
+    map_clusters.write_clusters(gallery, str(gallery_path))
+    if not (project_root / 'index.html').exists():
+        print("  - album/index.html not rebuilt (no index.html)")
+        return
+    build_route_pages(project_root, ['album'])
+
+
+# -- before/after report ----------------------------------------------------------
+
+def _sizes(data):
+    return len(data), len(gzip.compress(data, 9))
+
+
+def report(project_root: Path):
+    """Bytes and requests needed before each route shows its content, SPA shell vs pre-rendered page."""
+    shell = (project_root / 'index.html').read_bytes()
+    css = (project_root / 'styles.css').read_bytes()
+    print(f"{'route':<10}{'':<13}{'requests':>9}{'bytes':>10}{'gzip':>9}")
+    for page_id, files in PAGE_DATA.items():
+        # Before: HTML, then blocking styles.css + fonts CSS, then the JSON fetched after window load
+        before = [shell, css] + [(project_root / p).read_bytes() for p in files.values()]
+        before_req = len(before) + 1
+        page = (project_root / page_id / 'index.html').read_bytes()
+        # After: one HTML response (data inlined, critical CSS inline) + the fonts CSS
+        after = [page]
+        after_req = 2
+        for label, parts, req in (('before', before, before_req), ('after', after, after_req)):
+            raw = sum(_sizes(p)[0] for p in parts)
+            gz = sum(_sizes(p)[1] for p in parts)
+            print(f"{'/' + page_id if label == 'before' else '':<10}{label:<13}{req:>9}{raw / 1024:>9.0f}K{gz / 1024:>8.0f}K")
+    print("Requests are those on the path to first content, counting the Google Fonts stylesheet in both.")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pre-render /album, /road and /articles")
+    ap.add_argument('--report', action='store_true', help='compare bytes/requests against the SPA shell')
+    args = ap.parse_args()
+    if args.report:
+        report(REPO_ROOT)
+    else:
+        build_route_pages(REPO_ROOT)
+
+
+if __name__ == '__main__':
+    main()
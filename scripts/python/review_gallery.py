@@ -8,12 +8,26 @@ Usage (from repo root, outside the agent sandbox):
   python3 scripts/python/review_gallery.py --limit 10          # smoke test on first 10
   python3 scripts/python/review_gallery.py --model gemma3      # alternate vision model
   python3 scripts/python/review_gallery.py --start 100 --limit 50
+  python3 scripts/python/review_gallery.py --concurrency 2 --download-workers 8
+
+Images flow through a pipeline: downloads run on a thread pool, downscaling on a
+process pool, and up to --concurrency model requests are in flight at once, so
+the model never waits on the network or on a resize. Downscaled copies decode
+JPEGs in draft mode and are cached in .gallery-cache/thumbs/ by (content hash,
+--max-dim), shared with image_derivatives.py. Results are checkpointed from the
+main thread only, as each review completes.
+
+To measure throughput without a GPU, point --base-url/--gallery at the stub
+server in stub_ollama.py.
 
 Output (repo root):
+  gallery-review.jsonl   # append-only checkpoint, one fsynced record per reviewed image
   gallery-review.json    # per-image: name, url, description, strengths, weaknesses, score, raw
   gallery-review.md      # full ranking table, best first
 
-The script resumes: images already scored in the output file are skipped.
+The script resumes: images already scored in the checkpoint log (or in an older
+gallery-review.json) are skipped. The .json and .md are written once at the end of
+a run; `--report-only` rebuilds them from the log without reviewing anything.
 """
 
 import argparse
@@ -25,6 +39,20 @@ import re
 import sys
 import time
 import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+try:
+    from . import instrument
+except ImportError:
+    import instrument
+
+try:
+    from . import image_derivatives
+except ImportError:
+    try:
+        import image_derivatives
+    except ImportError:  # no Pillow; downscale() falls back to sips
+        image_derivatives = None
 
 PROMPT = (
     "You are a strict but fair landscape photography critic. Look at the attached "
@@ -47,37 +75,39 @@ def load_gallery(path):
         return json.load(f)
 
 
+@instrument.traced("download")
 def download(url, dest):
     if os.path.exists(dest) and os.path.getsize(dest) > 0:
+        instrument.count("download_cache_hits")
         return dest
     req = urllib.request.Request(url, headers={"User-Agent": "gallery-review/1.0"})
     with urllib.request.urlopen(req, timeout=60) as resp, open(dest, "wb") as f:
-        f.write(resp.read())
+        body = resp.read()
+        f.write(body)
+    instrument.count("bytes_downloaded", len(body))
     return dest
 
 
-def downscale(src_path, dest_path, max_dim):
-    try:
-        from PIL import Image
-
-        with Image.open(src_path) as img:
-            img = img.convert("RGB")
-            w, h = img.size
-            scale = min(1.0, max_dim / max(w, h))
-            if scale < 1.0:
-                img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
-            img.save(dest_path, "JPEG", quality=85)
-            return dest_path
-    except ImportError:
-        pass
+def downscale(src_path, max_dim, thumb_dir=None):
+    """Path of a JPEG copy of src_path no larger than max_dim on its longest edge.
+
+    With Pillow this is image_derivatives.cached_thumbnail(): JPEGs decode in draft
+    mode near the target size, and the result is cached by (content hash, max_dim)
+    in the thumbnail cache other tools share, so re-runs and re-downloads skip it.
+    """
+    if image_derivatives is not None:
+        return image_derivatives.cached_thumbnail(src_path, max_dim, thumb_dir or image_derivatives.THUMB_DIR)
     # macOS fallback
     import subprocess
 
-    subprocess.run(["sips", "-Z", str(max_dim), "-s", "format", "jpeg", "-s", "formatOptions", "85",
-                    src_path, "--out", dest_path], check=True, capture_output=True)
+    dest_path = f"{src_path}.{max_dim}.jpg"
+    if not os.path.exists(dest_path):
+        subprocess.run(["sips", "-Z", str(max_dim), "-s", "format", "jpeg", "-s", "formatOptions", "85",
+                        src_path, "--out", dest_path], check=True, capture_output=True)
     return dest_path
 
 
+@instrument.traced("inference")
 def ask_model(base_url, model, image_b64, timeout=600):
     payload = {
         "model": model,
@@ -97,6 +127,127 @@ def ask_model(base_url, model, image_b64, timeout=600):
     return data["message"]["content"]
 
 
+def prepare_image(url, cache_dir, max_dim, resize_pool):
+    """Download url and downscale it on resize_pool; returns the base64 JPEG."""
+    raw_path = os.path.join(cache_dir, os.path.basename(url))
+    download(url, raw_path)
+    with instrument.span("resize"):
+        small_path = resize_pool.submit(downscale, raw_path, max_dim).result()
+    with instrument.span("encode"), open(small_path, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+
+def error_result(exc):
+    return {"description": "", "strengths": "", "weaknesses": "", "score": None, "raw": f"ERROR: {exc}"}
+
+
+def run_pipeline(todo, args, cache_dir, on_result):
+    """Review todo entries concurrently, calling on_result(entry, res, seconds) in the caller's thread.
+
+    At most download_workers + 2 * concurrency images are held in memory at once.
+    """
+    window = args.download_workers + 2 * args.concurrency
+    entries = iter(todo)
+    started = {}
+    stage = {}
+
+    with ThreadPoolExecutor(args.download_workers) as dl_pool, \
+            ProcessPoolExecutor(args.resize_workers or None) as resize_pool, \
+            ThreadPoolExecutor(args.concurrency) as model_pool:
+
+        def feed():
+            while len(stage) < window:
+                entry = next(entries, None)
+                if entry is None:
+                    return
+                started[id(entry)] = time.time()
+                fut = dl_pool.submit(prepare_image, entry["url"], cache_dir, args.max_dim, resize_pool)
+                stage[fut] = ("prepare", entry)
+
+        feed()
+        while stage:
+            done, _ = wait(list(stage), return_when=FIRST_COMPLETED)
+            for fut in done:
+                kind, entry = stage.pop(fut)
+                try:
+                    value = fut.result()
+                except Exception as exc:
+                    on_result(entry, error_result(exc), time.time() - started.pop(id(entry)))
+                    continue
+                if kind == "prepare":
+                    mf = model_pool.submit(ask_model, args.base_url, args.model, value)
+                    stage[mf] = ("model", entry)
+                else:
+                    on_result(entry, extract_result(value), time.time() - started.pop(id(entry)))
+            feed()
+
+
+def checkpoint_path(out_path):
+    return os.path.splitext(out_path)[0] + ".jsonl"
+
+
+def load_checkpoint(out_path):
+    """Rebuild url -> record from the consolidated JSON (if any) replayed with the log.
+
+    Later log records win. A torn final line from a crash mid-write is ignored.
+    """
+    results = {}
+    if os.path.exists(out_path):
+        with open(out_path) as f:
+            for r in json.load(f):
+                results[r["url"]] = r
+    log_path = checkpoint_path(out_path)
+    if os.path.exists(log_path):
+        with open(log_path) as f:
+            for line in f:
+                try:
+                    r = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                results[r["url"]] = r
+    return results
+
+
+def open_checkpoint(out_path):
+    log_path = checkpoint_path(out_path)
+    f = open(log_path, "a+")
+    # Terminate a torn last record so the next append starts on its own line
+    if f.tell() > 0:
+        f.seek(f.tell() - 1)
+        if f.read(1) != "\n":
+            f.write("\n")
+    return f
+
+
+def append_checkpoint(f, record):
+    f.write(json.dumps(record) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def write_report(results, out_path, model):
+    """Write the consolidated JSON and the markdown ranking; returns the scored records, best first."""
+    tmp = out_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(list(results.values()), f, indent=2)
+    os.replace(tmp, out_path)
+
+    scored = [r for r in results.values() if r.get("score") is not None]
+    scored.sort(key=lambda r: (-r["score"], r["name"]))
+
+    md = ["# Gallery review (aesthetic ranking)", "",
+          f"Model: {model}  -  {len(scored)} images scored  -  {time.strftime('%Y-%m-%d')}", "",
+          "| # | Name | Score | Description | Strengths | Weaknesses |",
+          "|---|------|-------|-------------|-----------|------------|"]
+    for rank, r in enumerate(scored, 1):
+        md.append(f"| {rank} | {r['name']} | {r['score']} | {r['description']} | {r['strengths']} | {r['weaknesses']} |")
+    md_path = os.path.splitext(out_path)[0] + ".md"
+    with open(md_path, "w") as f:
+        f.write("\n".join(md) + "\n")
+    log(f"Report written to {md_path}")
+    return scored
+
+
 def extract_result(raw):
     out = {"description": "", "strengths": "", "weaknesses": "", "score": None}
     m = re.search(r"\{.*\}", raw, re.DOTALL)
@@ -125,6 +276,13 @@ def extract_result(raw):
     return out
 
 
+def positive_int(value):
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return n
+
+
 def main():
     ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     ap.add_argument("--gallery", default="images/gallery.json")
@@ -134,62 +292,70 @@ def main():
     ap.add_argument("--start", type=int, default=0, help="skip the first N images")
     ap.add_argument("--max-dim", type=int, default=2048, help="longest edge in pixels when downsizing")
     ap.add_argument("--out", default="gallery-review.json")
+    ap.add_argument("--concurrency", type=positive_int, default=1, help="model requests in flight at once")
+    ap.add_argument("--download-workers", type=positive_int, default=4, help="parallel image downloads")
+    ap.add_argument("--resize-workers", type=int, default=0, help="downscale processes (0 = CPU count)")
+    ap.add_argument("--report-only", action="store_true", help="rebuild the .json/.md from the checkpoint log and exit")
+    instrument.add_arguments(ap)
     args = ap.parse_args()
+    instrument.setup(args, "review_gallery")
+
+    results = load_checkpoint(args.out)
+    if args.report_only:
+        scored = write_report(results, args.out, args.model)
+        log(f"{len(scored)} scored, {len(results) - len(scored)} unscored.")
+        return
 
     gallery = load_gallery(args.gallery)
-    results = {}
-    if os.path.exists(args.out):
-        with open(args.out) as f:
-            for r in json.load(f):
-                results[r["url"]] = r
 
     cache_dir = os.path.join(os.path.dirname(os.path.abspath(args.out)), ".gallery-review-cache")
     os.makedirs(cache_dir, exist_ok=True)
 
     todo = [e for e in gallery[args.start:] if e["url"] not in results or results[e["url"]].get("score") is None]
+    # Duplicate URLs would race on the same cache file
+    seen = set()
+    todo = [e for e in todo if not (e["url"] in seen or seen.add(e["url"]))]
     if args.limit:
         todo = todo[: args.limit]
 
     log(f"Reviewing {len(todo)} images with '{args.model}' (already scored: {len(results)})")
-    for i, entry in enumerate(todo, 1):
-        name, url = entry["name"], entry["url"]
-        t0 = time.time()
-        try:
-            raw_path = os.path.join(cache_dir, os.path.basename(url))
-            download(url, raw_path)
-            small_path = raw_path + ".small.jpg"
-            downscale(raw_path, small_path, args.max_dim)
-            with open(small_path, "rb") as f:
-                b64 = base64.b64encode(f.read()).decode()
-            raw = ask_model(args.base_url, args.model, b64)
-            res = extract_result(raw)
-        except Exception as exc:
-            log(f"[{i}/{len(todo)}] {name}  ERROR: {exc}")
-            res = {"description": "", "strengths": "", "weaknesses": "", "score": None, "raw": f"ERROR: {exc}"}
+    done_count = 0
+    reviewed = 0
+    t_start = time.time()
 
+    def on_result(entry, res, elapsed):
+        nonlocal done_count, reviewed
+        done_count += 1
+        name, url = entry["name"], entry["url"]
         record = {"name": name, "url": url, **res}
         results[url] = record
-        with open(args.out, "w") as f:
-            json.dump(list(results.values()), f, indent=2)
-
-        score = "n/a" if res["score"] is None else res["score"]
-        log(f"[{i}/{len(todo)}] {name}  score={score}  ({time.time() - t0:.1f}s)")
-
-    scored = [r for r in results.values() if r.get("score") is not None]
-    scored.sort(key=lambda r: (-r["score"], r["name"]))
+        with instrument.span("checkpoint"):
+            append_checkpoint(ckpt, record)
+
+        if res["raw"].startswith("ERROR: "):
+            instrument.count("review_errors")
+            log(f"[{done_count}/{len(todo)}] {name}  {res['raw']}")
+        else:
+            reviewed += 1
+            score = "n/a" if res["score"] is None else res["score"]
+            log(f"[{done_count}/{len(todo)}] {name}  score={score}  ({elapsed:.1f}s)")
+
+    with open_checkpoint(args.out) as ckpt:
+        try:
+            with instrument.span("pipeline", images=len(todo)):
+                run_pipeline(todo, args, cache_dir, on_result)
+        except KeyboardInterrupt:
+            log("\nInterrupted; writing report for what was reviewed so far.")
+    if done_count:
+        # Only images that came back from the model; failures and the unreached rest of an interrupted run don't count
+        wall = time.time() - t_start
+        log(f"Throughput: {reviewed / wall:.2f} images/s over {wall:.1f}s "
+            f"({reviewed} reviewed, {done_count - reviewed} failed)")
+
+    with instrument.span("report"):
+        scored = write_report(results, args.out, args.model)
     log(f"\nDone. {len(scored)} scored, {len(results) - len(scored)} unscored.")
 
-    md = ["# Gallery review (aesthetic ranking)", "",
-          f"Model: {args.model}  -  {len(scored)} images scored  -  {time.strftime('%Y-%m-%d')}", "",
-          "| # | Name | Score | Description | Strengths | Weaknesses |",
-          "|---|------|-------|-------------|-----------|------------|"]
-    for rank, r in enumerate(scored, 1):
-        md.append(f"| {rank} | {r['name']} | {r['score']} | {r['description']} | {r['strengths']} | {r['weaknesses']} |")
-    md_path = os.path.splitext(args.out)[0] + ".md"
-    with open(md_path, "w") as f:
-        f.write("\n".join(md) + "\n")
-    log(f"Report written to {md_path}")
-
     top = scored[:10]
     log("\nTop 10 so far:")
     for rank, r in enumerate(top, 1):
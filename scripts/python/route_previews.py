@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Static preview images for the /road list, drawn offline from routes.json.
+
+Without one, each road card starts Leaflet and pulls map tiles just to show a
+thumbnail. For every route that has coordinates but no hand-made `image`, this
+projects the track to Web Mercator (one NumPy pass over the whole array), fits
+it into a 600x400 frame with the same 15% padding as the live preview, and
+draws the line in the route's color with green/red start and end dots.
+
+Output is images/road/previews/<id>.<hash>.svg (or .png with --format png;
+later runs keep each route's format until another --format is given), where
+the hash covers the coordinates, color, size and renderer version, so an
+unchanged route is never redrawn and an edited one gets a new URL. The URL is
+stored in the route's `preview` field. `image` is left alone: when it is set the
+road modal shows it instead of the interactive map, and location_to_route.py
+clears it on update for exactly that reason.
+
+Runs as part of convert_markdown_to_html.py and location_to_route.py --update.
+
+Usage (from repo root):
+  python3 scripts/python/route_previews.py                 # SVG previews, rebuild road/index.html
+  python3 scripts/python/route_previews.py --format png    # PNG instead (needs Pillow)
+
+Requires: pip install numpy
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import re
+from html import escape
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+PREVIEW_DIR = 'images/road/previews'
+WIDTH, HEIGHT = 600, 400
+PAD = 0.15
+LINE_WIDTH = 3
+START_COLOR, END_COLOR = '#22c55e', '#ef4444'
+HASH_LEN = 10
+# Bump when the drawing changes so existing previews are redrawn
+RENDER_VERSION = 1
+# Mercator blows up at the poles; Leaflet clamps to the same latitude
+MAX_LAT = 85.0511287798
+
+
+def project(coords, width=WIDTH, height=HEIGHT, pad=PAD):
+    """[lat, lng, ...] rows -> (n, 2) pixel positions, Web Mercator fitted and centered in the frame."""
+    latlng = np.asarray([c[:2] for c in coords], dtype=np.float64)
+    lat = np.radians(np.clip(latlng[:, 0], -MAX_LAT, MAX_LAT))
+    x = np.radians(latlng[:, 1])
+    y = -np.log(np.tan(np.pi / 4 + lat / 2))
+    xy = np.column_stack([x, y])
+
+    lo, hi = xy.min(axis=0), xy.max(axis=0)
+    span = np.maximum(hi - lo, 1e-9)
+    lo, span = lo - span * pad, span * (1 + 2 * pad)
+    scale = min(width / span[0], height / span[1])
+    offset = (np.array([width, height]) - span * scale) / 2
+    return (xy - lo) * scale + offset
+
+
+def _drop_repeats(px, step=0.5):
+    """Points that land on the previous one at `step`-pixel resolution add nothing to the drawing."""
+    snapped = np.round(px / step) * step
+    keep = np.ones(len(px), dtype=bool)
+    keep[1:] = np.any(snapped[1:] != snapped[:-1], axis=1)
+    keep[-1] = True
+    return snapped[keep]
+
+
+def render_svg(coords, color, width=WIDTH, height=HEIGHT):
+    px = _drop_repeats(project(coords, width, height))
+    path = ' '.join(f'{x:g},{y:g}' for x, y in px.tolist())
+    (sx, sy), (ex, ey) = px[0].tolist(), px[-1].tolist()
+    dot = 'r="5" fill="#fff" stroke-width="2"'
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="{width}" height="{height}">'
+        f'<polyline points="{path}" fill="none" stroke="#fff" stroke-opacity=".6" stroke-width="{LINE_WIDTH + 3}" '
+        f'stroke-linejoin="round" stroke-linecap="round"/>'
+        f'<polyline points="{path}" fill="none" stroke="{escape(color)}" stroke-opacity=".85" '
+        f'stroke-width="{LINE_WIDTH}" stroke-linejoin="round" stroke-linecap="round"/>'
+        f'<circle cx="{sx:g}" cy="{sy:g}" {dot} stroke="{START_COLOR}"/>'
+        f'<circle cx="{ex:g}" cy="{ey:g}" {dot} stroke="{END_COLOR}"/>'
+        '</svg>\n'
+    ).encode('utf-8')
+
+
+def render_png(coords, color, width=WIDTH, height=HEIGHT, supersample=3):
+    """Drawn at `supersample`x and scaled down, which anti-aliases the line."""
+    from PIL import Image, ImageDraw
+
+    s = supersample
+    px = _drop_repeats(project(coords, width * s, height * s), step=s / 2)
+    img = Image.new('RGBA', (width * s, height * s), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    points = [tuple(p) for p in px.tolist()]
+    if len(points) > 1:
+        draw.line(points, fill=(255, 255, 255, 150), width=(LINE_WIDTH + 3) * s, joint='curve')
+        draw.line(points, fill=color, width=LINE_WIDTH * s, joint='curve')
+    for (x, y), ring in ((points[0], START_COLOR), (points[-1], END_COLOR)):
+        r = 5 * s
+        draw.ellipse((x - r, y - r, x + r, y + r), fill='#fff', outline=ring, width=2 * s)
+    buf = io.BytesIO()
+    img.resize((width, height), Image.LANCZOS).save(buf, 'PNG', optimize=True)
+    return buf.getvalue()
+
+
+RENDERERS = {'svg': render_svg, 'png': render_png}
+DEFAULT_FORMAT = 'svg'
+
+
+def preview_key(route, fmt):
+    coords = [[round(c[0], 6), round(c[1], 6)] for c in route['coordinates']]
+    payload = json.dumps([RENDER_VERSION, fmt, WIDTH, HEIGHT, route.get('color') or '#3388ff', coords])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:HASH_LEN]
+
+
+def _slug(route_id):
+    return re.sub(r'[^\w-]+', '-', str(route_id)).strip('-') or 'route'
+
+
+def _current_format(route):
+    """Format of the route's existing preview, so a build keeps PNGs someone asked for."""
+    ext = (route.get('preview') or '').rsplit('.', 1)[-1]
+    return ext if ext in RENDERERS else DEFAULT_FORMAT
+
+
+def update_previews(project_root: Path, routes, fmt=None):
+    """Set `preview` on each route that needs one, drawing only what changed; returns True if routes changed.
+
+    fmt forces a format for every route; by default each keeps the one its preview already has.
+    """
+    out_dir = project_root / PREVIEW_DIR
+    changed = False
+    wanted = set()
+    for route in routes:
+        coords = route.get('coordinates') or []
+        if route.get('image') or not coords:
+            if 'preview' in route:
+                del route['preview']
+                changed = True
+            continue
+        route_fmt = fmt or _current_format(route)
+        name = f"{_slug(route.get('id') or route.get('name'))}.{preview_key(route, route_fmt)}.{route_fmt}"
+        wanted.add(name)
+        target = out_dir / name
+        if not target.exists():
+            out_dir.mkdir(parents=True, exist_ok=True)
+            data = RENDERERS[route_fmt](coords, route.get('color') or '#3388ff')
+            target.write_bytes(data)
+            print(f"  ✓ Drew {PREVIEW_DIR}/{name} ({len(coords)} points, {len(data) / 1024:.1f} KiB)")
+        url = f'/{PREVIEW_DIR}/{name}'
+        if route.get('preview') != url:
+            route['preview'] = url
+            changed = True
+    if out_dir.exists():
+        stale = re.compile(rf'^.+\.[0-9a-f]{{{HASH_LEN}}}\.(svg|png)$')
+        for old in out_dir.iterdir():
+            if old.name not in wanted and stale.match(old.name):
+                old.unlink()
+    return changed
+
+
+def build(project_root: Path, fmt=None):
+    """Refresh previews for routes.json in place; returns True if routes.json was rewritten."""
+    routes_path = project_root / 'routes.json'
+    if not routes_path.exists():
+        return False
+    routes = json.loads(routes_path.read_text(encoding='utf-8'))
+    if not update_previews(project_root, routes, fmt):
+        print("  ✓ Route previews up to date")
+        return False
+    with open(routes_path, 'w') as f:
+        json.dump(routes, f, indent=2)
+        f.write('\n')
+    print(f"  ✓ Updated previews in {routes_path.name}")
+    return True
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Draw static /road previews from routes.json")
+    ap.add_argument('--format', choices=sorted(RENDERERS),
+                    help='redraw every preview in this format (default: keep each route\'s, SVG for new ones)')
+    args = ap.parse_args()
+    if build(REPO_ROOT, args.format):
+        import prerender_pages
+        prerender_pages.build_route_pages(REPO_ROOT, ['road'])
+
+
+if __name__ == '__main__':
+    main()
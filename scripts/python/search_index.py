@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Build and query a static full-text index over posts and gallery metadata.
+
+The index lives in search/ at the repo root and is regenerated by
+convert_markdown_to_html.py:
+
+  search/manifest.json   shard list, document count, average document length
+  search/docs.json       [[type, id, title, url, length], ...] in doc-number order
+  search/<shard>.json    {term: [doc_delta, tf, doc_delta, tf, ...]} for every
+                         term starting with <shard> (first character of the term)
+
+Postings are sorted by doc number and delta-encoded, so shards stay small and a
+client only downloads the shards for the terms in its query. Ranking is BM25.
+The site does exactly that (searchSiteIndex() in index.html, same tokenizer and
+scoring as SearchIndex below): the articles search box ranks post documents,
+and the album's text search adds image documents that match by name, cluster
+label or review text to Mixpeek's semantic results.
+
+Usage (from repo root):
+  python3 scripts/python/search_index.py build
+  python3 scripts/python/search_index.py query "north cascades larch"
+  python3 scripts/python/search_index.py bench --docs 5000 --queries 500
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from html import unescape
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+INDEX_DIR = REPO_ROOT / "search"
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this to was were will with".split()
+)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOP_WORDS]
+
+
+def strip_tags(html):
+    return unescape(re.sub(r"<[^>]+>", " ", html))
+
+
+def shard_of(term):
+    c = term[0]
+    return c if c.isalnum() else "_"
+
+
+def post_documents(rendered):
+    """rendered: {post_id: (metadata, markdown, html)} as collected by the build."""
+    for post_id, (metadata, _markdown, html) in sorted(rendered.items()):
+        title = metadata.get("title", post_id)
+        text = " ".join([title, title, metadata.get("description", ""), strip_tags(html)])
+        yield "post", post_id, title, f"/{post_id}", text
+
+
+def gallery_documents(gallery, reviews=None):
+    """Gallery entries: name, cluster label, description and the review text when available."""
+    reviews = reviews or {}
+    for entry in gallery:
+        url = entry.get("url")
+        if not url:
+            continue
+        review = reviews.get(url) or {}
+        name = entry.get("name", "")
+        parts = [name, name, entry.get("cluster_label") or "", entry.get("description", ""),
+                 review.get("description", ""), review.get("strengths", "")]
+        yield "image", url, name, url, " ".join(parts)
+
+
+def previous_index_files(out_dir):
+    """Files the last build_index() wrote into out_dir, per its manifest.
+
+    Refuses a non-empty directory without a manifest, so a mistyped --out can
+    never clear files this module did not write.
+    """
+    manifest_path = out_dir / "manifest.json"
+    if not manifest_path.exists():
+        if any(out_dir.iterdir()):
+            raise SystemExit(f"{out_dir} is not empty and holds no search index; refusing to write there")
+        return []
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    names = [f"{shard}.json" for shard in manifest.get("shards", [])] + ["docs.json", "manifest.json"]
+    return [out_dir / name for name in names if (out_dir / name).exists()]
+
+
+def build_index(documents, out_dir=INDEX_DIR):
+    """Write manifest/docs/shard files for an iterable of (type, id, title, url, text)."""
+    docs = []
+    postings = defaultdict(list)
+    total_len = 0
+    for doc_no, (kind, doc_id, title, url, text) in enumerate(documents):
+        tokens = tokenize(text)
+        total_len += len(tokens)
+        docs.append([kind, doc_id, title, url, len(tokens)])
+        for term, tf in Counter(tokens).items():
+            postings[term].append((doc_no, tf))
+
+    shards = defaultdict(dict)
+    for term in sorted(postings):
+        flat, prev = [], 0
+        for doc_no, tf in postings[term]:
+            flat += [doc_no - prev, tf]
+            prev = doc_no
+        shards[shard_of(term)][term] = flat
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for stale in previous_index_files(out_dir):
+        stale.unlink()
+    compact = {"separators": (",", ":"), "ensure_ascii": False}
+    for name, terms in shards.items():
+        (out_dir / f"{name}.json").write_text(json.dumps(terms, **compact), encoding="utf-8")
+    (out_dir / "docs.json").write_text(json.dumps(docs, **compact), encoding="utf-8")
+    manifest = {
+        "version": 1,
+        "docs": len(docs),
+        "avgLength": (total_len / len(docs)) if docs else 0,
+        "shards": sorted(shards),
+    }
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, **compact), encoding="utf-8")
+    return manifest
+
+
+class SearchIndex:
+    """Query side of the index; shards are read lazily and kept in memory."""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.dir = Path(index_dir)
+        self.manifest = json.loads((self.dir / "manifest.json").read_text(encoding="utf-8"))
+        self.docs = json.loads((self.dir / "docs.json").read_text(encoding="utf-8"))
+        self._shards = {}
+
+    def _shard(self, name):
+        if name not in self._shards:
+            path = self.dir / f"{name}.json"
+            self._shards[name] = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        return self._shards[name]
+
+    def postings(self, term):
+        flat = self._shard(shard_of(term)).get(term)
+        if not flat:
+            return []
+        out, doc_no = [], 0
+        for i in range(0, len(flat), 2):
+            doc_no += flat[i]
+            out.append((doc_no, flat[i + 1]))
+        return out
+
+    def expand(self, prefix):
+        """Terms in the index starting with prefix (used for the last, partially typed word)."""
+        return [t for t in self._shard(shard_of(prefix)) if t.startswith(prefix)]
+
+    def search(self, query, k=10, kind=None, prefix_last=True):
+        """Return up to k hits as dicts {type, id, title, url, score}, best first."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        groups = [[t] for t in terms]
+        if prefix_last:
+            groups[-1] = self.expand(terms[-1]) or [terms[-1]]
+
+        n = self.manifest["docs"] or 1
+        avg = self.manifest["avgLength"] or 1
+        scores = defaultdict(float)
+        for group in groups:
+            for term in group:
+                plist = self.postings(term)
+                if not plist:
+                    continue
+                idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+                for doc_no, tf in plist:
+                    dl = self.docs[doc_no][4]
+                    scores[doc_no] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avg))
+
+        ranked = sorted(scores.items(), key=lambda kv: -kv[1])
+        hits = []
+        for doc_no, score in ranked:
+            d_kind, doc_id, title, url, _ = self.docs[doc_no]
+            if kind and d_kind != kind:
+                continue
+            hits.append({"type": d_kind, "id": doc_id, "title": title, "url": url, "score": round(score, 4)})
+            if len(hits) >= k:
+                break
+        return hits
+
+
+def load_reviews(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {r["url"]: r for r in json.load(f)}
+
+
+def site_documents(project_root, rendered):
+    """Everything the site indexes: rendered posts plus gallery.json (with reviews if present)."""
+    gallery_path = project_root / "images" / "gallery.json"
+    gallery = json.loads(gallery_path.read_text(encoding="utf-8")) if gallery_path.exists() else []
+    reviews = load_reviews(project_root / "gallery-review.json")
+    yield from post_documents(rendered)
+    yield from gallery_documents(gallery, reviews)
+
+
+def synthetic_documents(n, vocab_size=20000, words=300, seed=1):
+    rng = random.Random(seed)
+    vocab = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+             for _ in range(vocab_size)]
+    # Zipf-ish word frequencies, like real text
+    weights = [1.0 / (i + 1) for i in range(vocab_size)]
+    for i in range(n):
+        text = " ".join(rng.choices(vocab, weights, k=words))
+        yield "post", f"doc{i}", f"Doc {i}", f"/doc{i}", text
+
+
+def bench(n_docs, n_queries, out_dir):
+    t0 = time.perf_counter()
+    manifest = build_index(synthetic_documents(n_docs), out_dir)
+    build_s = time.perf_counter() - t0
+    size = sum(p.stat().st_size for p in Path(out_dir).glob("*.json"))
+
+    index = SearchIndex(out_dir)
+    rng = random.Random(2)
+    vocab = sorted({t for s in manifest["shards"] for t in index._shard(s)})
+    latencies = []
+    for _ in range(n_queries):
+        q = " ".join(rng.choice(vocab) for _ in range(rng.randint(1, 3)))
+        t = time.perf_counter()
+        index.search(q)
+        latencies.append(time.perf_counter() - t)
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"docs={n_docs} terms={len(vocab)} shards={len(manifest['shards'])} size={size / 1024:.0f} KiB")
+    print(f"build: {build_s:.2f}s")
+    print(f"query: p50={p(0.5):.2f}ms p95={p(0.95):.2f}ms p99={p(0.99):.2f}ms (warm shards)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Static full-text index over posts and gallery metadata")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("build", help="rebuild search/ from posts and gallery.json")
+    q = sub.add_parser("query", help="run a query against search/")
+    q.add_argument("text")
+    q.add_argument("-k", type=int, default=10)
+    q.add_argument("--type", choices=["post", "image"])
+    b = sub.add_parser("bench", help="time build and query on synthetic documents")
+    b.add_argument("--docs", type=int, default=5000)
+    b.add_argument("--queries", type=int, default=500)
+    b.add_argument("--out", default=os.path.join("/tmp", "search-index-bench"))
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        sys.path.insert(0, str(Path(__file__).resolve().parent))
+        import convert_markdown_to_html as build
+
+        build.build_search_index(REPO_ROOT, build.validate_posts_config(REPO_ROOT), build.render_posts(REPO_ROOT))
+    elif args.cmd == "query":
+        for hit in SearchIndex().search(args.text, k=args.k, kind=args.type):
+            print(f"{hit['score']:8.3f}  [{hit['type']}] {hit['title']}  {hit['url']}")
+    else:
+        bench(args.docs, args.queries, args.out)
+
+
+if __name__ == "__main__":
+    main()
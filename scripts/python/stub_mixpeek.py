@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Fake Mixpeek API serving paginated collection documents, for exercising
+sync_mixpeek_clusters.py offline (keep-alive, prefetch, retry, page cache).
+
+Usage (from repo root):
+  python3 scripts/python/stub_mixpeek.py --latency 0.2 --fail-rate 0.2
+  python3 scripts/python/sync_mixpeek_clusters.py --base-url http://127.0.0.1:11600/v1
+
+GET /v1/collections/<id>/documents?page_size=N&cursor=C returns one document per
+gallery.json entry (filename, cluster_id, cluster_label), N at a time, with an
+opaque next_cursor. --fail-rate makes that share of requests answer 429 or 503.
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GALLERY_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "images", "gallery.json")
+
+
+def make_documents(gallery_path, clusters):
+    with open(gallery_path) as f:
+        gallery = json.load(f)
+    docs = []
+    for i, entry in enumerate(gallery):
+        cid = i % clusters
+        docs.append({
+            "document_id": f"doc_{i}",
+            "metadata": {"filename": os.path.basename(entry["url"]), "name": entry.get("name", "")},
+            "cluster_id": cid,
+            "cluster_label": f"Stub cluster {cid}",
+        })
+    return docs
+
+
+def make_handler(docs, latency, fail_rate, stats):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status, payload, extra=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (extra or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            if not (url.path.startswith("/v1/collections/") and url.path.endswith("/documents")):
+                self._send(404, {"success": False})
+                return
+            stats["requests"] += 1
+            if random.random() < fail_rate:
+                stats["failures"] += 1
+                status = random.choice([429, 503])
+                self._send(status, {"success": False}, {"Retry-After": "0"} if status == 429 else None)
+                return
+            time.sleep(latency)
+            qs = urllib.parse.parse_qs(url.query)
+            size = int(qs.get("page_size", ["100"])[0])
+            cursor = qs.get("cursor", [None])[0]
+            start = int(base64.urlsafe_b64decode(cursor).decode()) if cursor else 0
+            page = docs[start:start + size]
+            nxt = start + size
+            next_cursor = base64.urlsafe_b64encode(str(nxt).encode()).decode() if nxt < len(docs) else None
+            self._send(200, {"results": page, "pagination": {"next_cursor": next_cursor}})
+
+    return StubHandler
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake paginated Mixpeek documents API")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11600)
+    ap.add_argument("--gallery", default=GALLERY_PATH)
+    ap.add_argument("--clusters", type=int, default=6)
+    ap.add_argument("--latency", type=float, default=0.1, help="seconds per successful page")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 429/503")
+    args = ap.parse_args()
+
+    docs = make_documents(args.gallery, args.clusters)
+    stats = {"requests": 0, "failures": 0}
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(docs, args.latency, args.fail_rate, stats))
+    print(f"Fake Mixpeek at http://{args.host}:{args.port}/v1 ({len(docs)} documents)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{stats['requests']} requests, {stats['failures']} injected failures")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the ollama /api/chat endpoint (plus a synthetic image host), for
+measuring review_gallery.py throughput without a GPU or network.
+
+Usage (from repo root):
+  python3 scripts/python/stub_ollama.py --latency 0.5 --write-gallery /tmp/stub-gallery.json --count 40
+  python3 scripts/python/review_gallery.py --base-url http://127.0.0.1:11500 \
+      --gallery /tmp/stub-gallery.json --out /tmp/stub-review.json --concurrency 4
+
+Endpoints:
+  POST /api/chat        sleeps --latency seconds, then answers with a canned review
+  GET  /images/<name>   a synthetic JPEG (--size px on the long edge), generated once
+
+Requires: pip install Pillow  (only for /images/)
+"""
+
+import argparse
+import io
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_jpeg_lock = threading.Lock()
+_jpeg_cache = {}
+
+
+def synthetic_jpeg(size):
+    with _jpeg_lock:
+        if size not in _jpeg_cache:
+            from PIL import Image
+
+            img = Image.effect_noise((size, size * 3 // 4), 64).convert("RGB")
+            buf = io.BytesIO()
+            img.save(buf, "JPEG", quality=90)
+            _jpeg_cache[size] = buf.getvalue()
+        return _jpeg_cache[size]
+
+
+def make_handler(latency, image_size):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith("/images/"):
+                self._send(200, synthetic_jpeg(image_size), "image/jpeg")
+            else:
+                self._send(404, b"not found", "text/plain")
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path != "/api/chat":
+                self._send(404, b"not found", "text/plain")
+                return
+            time.sleep(latency)
+            review = {
+                "description": "Synthetic review from the stub server.",
+                "strengths": "fast",
+                "weaknesses": "none",
+                "score": random.randint(0, 10),
+            }
+            body = json.dumps({
+                "model": payload.get("model", "stub"),
+                "message": {"role": "assistant", "content": json.dumps(review)},
+                "done": True,
+            }).encode()
+            self._send(200, body, "application/json")
+
+    return StubHandler
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stub ollama /api/chat server for review_gallery.py")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11500)
+    ap.add_argument("--latency", type=float, default=0.5, help="seconds per /api/chat request")
+    ap.add_argument("--size", type=int, default=4000, help="long edge of served images, in pixels")
+    ap.add_argument("--write-gallery", help="write a gallery.json pointing at this server's images")
+    ap.add_argument("--count", type=int, default=20, help="entries in --write-gallery")
+    args = ap.parse_args()
+
+    if args.write_gallery:
+        base = f"http://{args.host}:{args.port}/images"
+        gallery = [{"name": f"Stub {i}", "url": f"{base}/stub-{i}.jpg"} for i in range(args.count)]
+        with open(args.write_gallery, "w") as f:
+            json.dump(gallery, f, indent=2)
+        print(f"Wrote {args.count} entries to {args.write_gallery}")
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.latency, args.size))
+    print(f"Stub ollama at http://{args.host}:{args.port}/ (latency {args.latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Minimal local S3 stand-in (path-style ListObjectsV2, HEAD and ranged GET) for
+exercising download_from_s3.py --sync without AWS.
+
+Usage (from repo root):
+  python3 scripts/python/stub_s3.py --objects 200 --size 2000000 --latency 0.02
+  AWS_ACCESS_KEY_ID=x AWS_SECRET_ACCESS_KEY=x AWS_DEFAULT_REGION=us-east-1 \
+    python3 scripts/python/download_from_s3.py --sync --endpoint-url http://127.0.0.1:11700 \
+      --bucket ethan.dev --prefix album/ --dest /tmp/album
+
+  python3 scripts/python/stub_s3.py --bench       # serial vs parallel sync throughput
+
+Objects are synthetic: album/IMG_<n>.JPG, each --size bytes. --latency is added
+to every request to stand in for network round trips.
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+LAST_MODIFIED = 1_700_000_000
+
+
+class Store:
+    def __init__(self, bucket, prefix, count, size):
+        self.bucket = bucket
+        self.payload = os.urandom(size)
+        self.etag = hashlib.md5(self.payload).hexdigest()
+        self.keys = [f"{prefix}IMG_{i:05d}.JPG" for i in range(count)]
+        self.key_set = set(self.keys)
+
+
+def make_handler(store, latency, page_size):
+    class S3Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _head(self, status, length, extra=None, content_type="application/octet-stream"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(length))
+            for k, v in (extra or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+
+        def _split(self):
+            url = urllib.parse.urlparse(self.path)
+            parts = url.path.lstrip("/").split("/", 1)
+            key = urllib.parse.unquote(parts[1]) if len(parts) > 1 else ""
+            return parts[0], key, urllib.parse.parse_qs(url.query)
+
+        def _object_headers(self):
+            return {"ETag": f'"{store.etag}"', "Last-Modified": formatdate(LAST_MODIFIED, usegmt=True),
+                    "Accept-Ranges": "bytes"}
+
+        def do_HEAD(self):
+            time.sleep(latency)
+            bucket, key, _ = self._split()
+            if bucket != store.bucket or key not in store.key_set:
+                self._head(404, 0)
+                return
+            self._head(200, len(store.payload), self._object_headers())
+
+        def do_GET(self):
+            time.sleep(latency)
+            bucket, key, qs = self._split()
+            if bucket != store.bucket:
+                self._head(404, 0)
+                return
+            if not key:
+                self._list(qs)
+                return
+            if key not in store.key_set:
+                self._head(404, 0)
+                return
+            body, status, extra = store.payload, 200, self._object_headers()
+            rng = self.headers.get("Range")
+            if rng and rng.startswith("bytes="):
+                start_s, end_s = rng[6:].split("-")
+                start = int(start_s)
+                end = min(int(end_s) if end_s else len(body) - 1, len(body) - 1)
+                extra["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+                body, status = body[start:end + 1], 206
+            self._head(status, len(body), extra)
+            self.wfile.write(body)
+
+        def _list(self, qs):
+            prefix = qs.get("prefix", [""])[0]
+            token = qs.get("continuation-token", [None])[0]
+            limit = min(int(qs.get("max-keys", [page_size])[0]), page_size)
+            keys = [k for k in store.keys if k.startswith(prefix)]
+            start = int(token) if token else 0
+            page = keys[start:start + limit]
+            truncated = start + limit < len(keys)
+            stamp = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(LAST_MODIFIED))
+            contents = "".join(
+                f"<Contents><Key>{escape(k)}</Key><LastModified>{stamp}</LastModified>"
+                f"<ETag>&quot;{store.etag}&quot;</ETag><Size>{len(store.payload)}</Size>"
+                f"<StorageClass>STANDARD</StorageClass></Contents>"
+                for k in page
+            )
+            nxt = f"<NextContinuationToken>{start + limit}</NextContinuationToken>" if truncated else ""
+            xml = (
+                '<?xml version="1.0" encoding="UTF-8"?>'
+                '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                f"<Name>{store.bucket}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(page)}</KeyCount>"
+                f"<MaxKeys>{limit}</MaxKeys><IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+                f"{nxt}{contents}</ListBucketResult>"
+            ).encode()
+            self._head(200, len(xml), content_type="application/xml")
+            self.wfile.write(xml)
+
+    return S3Handler
+
+
+def start_server(host, port, store, latency, page_size):
+    server = ThreadingHTTPServer((host, port), make_handler(store, latency, page_size))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench(args):
+    for var, val in (("AWS_ACCESS_KEY_ID", "stub"), ("AWS_SECRET_ACCESS_KEY", "stub"), ("AWS_DEFAULT_REGION", "us-east-1")):
+        os.environ.setdefault(var, val)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import download_from_s3 as dl
+
+    store = Store(args.bucket, args.prefix, args.objects, args.size)
+    server = start_server(args.host, 0, store, args.latency, args.page_size)
+    endpoint = f"http://{args.host}:{server.server_address[1]}"
+    total_mb = args.objects * args.size / 1e6
+    print(f"{args.objects} objects x {args.size} bytes ({total_mb:.0f} MB), {args.latency * 1000:.0f} ms latency")
+    try:
+        for workers in (1, args.workers):
+            dest = tempfile.mkdtemp(prefix="s3-sync-bench-")
+            s3 = dl.make_client(endpoint, max_pool=workers * 4)
+            t = time.perf_counter()
+            stats = dl.sync_objects(s3, args.bucket, dl.list_objects(s3, args.bucket, args.prefix), dest, workers=workers)
+            elapsed = time.perf_counter() - t
+            print(f"  workers={workers:<3} {elapsed:6.2f}s  {total_mb / elapsed:7.1f} MB/s  ({stats['downloaded']} downloaded)")
+            if workers == args.workers:
+                t = time.perf_counter()
+                stats = dl.sync_objects(s3, args.bucket, dl.list_objects(s3, args.bucket, args.prefix), dest, workers=workers)
+                print(f"  re-sync      {time.perf_counter() - t:6.2f}s  ({stats['unchanged']} unchanged, "
+                      f"{stats['downloaded']} downloaded)")
+            shutil.rmtree(dest)
+    finally:
+        server.shutdown()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local S3 stand-in for download_from_s3.py")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11700)
+    ap.add_argument("--bucket", default="ethan.dev")
+    ap.add_argument("--prefix", default="album/")
+    ap.add_argument("--objects", type=int, default=200)
+    ap.add_argument("--size", type=int, default=2_000_000, help="bytes per object")
+    ap.add_argument("--latency", type=float, default=0.02, help="seconds added to every request")
+    ap.add_argument("--page-size", type=int, default=100, help="keys per ListObjectsV2 page")
+    ap.add_argument("--bench", action="store_true", help="time serial vs parallel --sync against this server")
+    ap.add_argument("--workers", type=int, default=16, help="parallel workers for --bench")
+    args = ap.parse_args()
+
+    if args.bench:
+        bench(args)
+        return
+
+    store = Store(args.bucket, args.prefix, args.objects, args.size)
+    server = start_server(args.host, args.port, store, args.latency, args.page_size)
+    print(f"Stub S3 at http://{args.host}:{args.port} (bucket {args.bucket}, {args.objects} objects)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
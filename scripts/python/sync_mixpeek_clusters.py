@@ -4,16 +4,47 @@ Fetch cluster data from Mixpeek and enrich gallery.json with cluster labels/colo
 
 Usage:
     python scripts/python/sync_mixpeek_clusters.py
+    python scripts/python/sync_mixpeek_clusters.py --local [--k 12] [--recluster]
 
 Reads images/gallery.json, queries Mixpeek for cluster assignments
 (written onto source docs by enrich_source_collection), and writes back
 enriched gallery.json with cluster_id, cluster_label, and cluster_color.
+
+--local skips Mixpeek and clusters the cached embedding matrix from
+vector_index.py with mini-batch k-means instead. Centroids are kept in
+.gallery-cache/embeddings/clusters.npz, so later runs only assign photos that
+have no cluster yet; --recluster retrains from scratch.
+
+Documents are paged through one pooled keep-alive session. The next page is
+requested as soon as its cursor is known, while the current page is processed.
+429/5xx responses are retried with jittered exponential backoff.
+--page-cache DIR stores each page on disk keyed by cursor and by a digest of
+the first page, which is always fetched live: when the collection changes the
+digest changes and the cached pages are ignored. --refresh refetches every page. --base-url (or MIXPEEK_BASE_URL) points at another server,
+e.g. the fake API in stub_mixpeek.py.
 """
 
+import argparse
+import hashlib
 import json
 import os
+import random
+import re
 import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from . import gallery_index, gallery_store, instrument, prerender_pages
+except ImportError:
+    import gallery_index
+    import gallery_store
+    import instrument
+    import prerender_pages
 
 API_KEY = os.environ.get(
     "MIXPEEK_API_KEY",
@@ -22,7 +53,10 @@ API_KEY = os.environ.get(
 NAMESPACE = "ns_ff4ce153f3"
 COLLECTION_ID = "col_961b58b0a5"
 CLUSTER_ID = "clust_332e992d28"
-BASE_URL = "https://api.mixpeek.com/v1"
+BASE_URL = os.environ.get("MIXPEEK_BASE_URL", "https://api.mixpeek.com/v1")
+PAGE_SIZE = 100
+MAX_RETRIES = 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
 GALLERY_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "images", "gallery.json")
 
@@ -39,28 +73,99 @@ headers = {
 }
 
 
-def fetch_all_documents():
+def make_session():
+    session = requests.Session()
+    session.headers.update(headers)
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_with_retry(session, url, params, retries=MAX_RETRIES, base_delay=0.5):
+    """GET with full-jitter exponential backoff on 429/5xx and connection errors.
+
+    A Retry-After header, when present, is used as the minimum wait.
+    """
+    for attempt in range(retries + 1):
+        try:
+            resp = session.get(url, params=params, timeout=30)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+            resp = None
+        if resp is not None and resp.status_code not in RETRY_STATUSES:
+            resp.raise_for_status()
+            return resp.json()
+        if resp is not None and attempt == retries:
+            resp.raise_for_status()
+        delay = random.uniform(0, base_delay * (2 ** attempt))
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        time.sleep(delay)
+
+
+@instrument.traced("fetch-page")
+def fetch_page(session, base_url, cursor, cache_dir=None, version=None, refresh=False):
+    """One page of collection documents, served from cache_dir when present.
+
+    Only pages after the first are cached: they are keyed on the cursor and on
+    version, a digest of the live first page, so a changed collection misses.
+    """
+    cache_path = None
+    if cache_dir and cursor and version:
+        key = hashlib.sha1(f"{base_url}|{COLLECTION_ID}|{version}|{cursor}".encode()).hexdigest()
+        cache_path = os.path.join(cache_dir, f"{key}.json")
+        if not refresh and os.path.exists(cache_path):
+            instrument.count("page_cache_hits")
+            with open(cache_path) as f:
+                return json.load(f)
+    params = {"page_size": PAGE_SIZE}
+    if cursor:
+        params["cursor"] = cursor
+    data = get_with_retry(session, f"{base_url}/collections/{COLLECTION_ID}/documents", params)
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = cache_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, cache_path)
+    return data
+
+
+def page_version(data):
+    """Digest of the first page, used to key the cached pages that follow it."""
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def iter_document_pages(base_url=BASE_URL, cache_dir=None, session=None, refresh=False):
+    """Yield each page's results; the following page is already in flight while the caller works."""
+    session = session or make_session()
+    version = None
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        pending = prefetch.submit(fetch_page, session, base_url, None)
+        while pending is not None:
+            with instrument.span("page-wait"):
+                data = pending.result()
+            instrument.count("pages")
+            if version is None:
+                version = page_version(data)
+            results = data.get("results", [])
+            if not results:
+                break
+            cursor = (data.get("pagination") or {}).get("next_cursor")
+            pending = (
+                prefetch.submit(fetch_page, session, base_url, cursor, cache_dir, version, refresh)
+                if cursor else None
+            )
+            yield results
+
+
+def fetch_all_documents(base_url=BASE_URL, cache_dir=None, refresh=False):
     docs = []
-    cursor = None
-    while True:
-        params = {"page_size": 100}
-        if cursor:
-            params["cursor"] = cursor
-        resp = requests.get(
-            f"{BASE_URL}/collections/{COLLECTION_ID}/documents",
-            headers=headers,
-            params=params,
-            timeout=30,
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        results = data.get("results", [])
-        if not results:
-            break
+    for results in iter_document_pages(base_url, cache_dir, refresh=refresh):
         docs.extend(results)
-        cursor = data.get("pagination", {}).get("next_cursor")
-        if not cursor:
-            break
     return docs
 
 
@@ -111,36 +216,117 @@ def enrich_gallery(gallery, url_to_cluster):
     return gallery
 
 
+def label_for_names(names):
+    """Most common photo name in a cluster, ignoring numbering like "Big Sur 3" / "(2)"."""
+    stems = [re.sub(r"\s*(\(\d+\)|\d+)$", "", n).strip() for n in names if n]
+    stems = [s for s in stems if s and not re.match(r"^img[\s_-]*$", s, re.I)]
+    return Counter(stems).most_common(1)[0][0] if stems else ""
+
+
+def build_local_cluster_map(gallery, k, recluster=False):
+    """Cluster cached embeddings locally; returns url -> {cluster_id, cluster_label}.
+
+    Existing centroids are reused unless recluster is set, and only URLs without a
+    stored assignment are assigned, so adding photos does not reshuffle clusters.
+    """
+    import numpy as np
+
+    try:
+        from . import vector_index
+    except ImportError:
+        import vector_index
+
+    index = vector_index.VectorIndex()
+    if not index.urls:
+        print("No cached embeddings — run vector_index.py embed first.")
+        sys.exit(1)
+    state_path = os.path.join(index.dir, "clusters.npz")
+    assign_path = os.path.join(index.dir, "clusters.json")
+
+    assignments = {}
+    if os.path.exists(state_path) and os.path.exists(assign_path) and not recluster:
+        state = np.load(state_path)
+        centroids = state["centroids"]
+        with open(assign_path) as f:
+            assignments = json.load(f)
+        new_rows = [i for i, u in enumerate(index.urls) if u not in assignments]
+        print(f"  Assigning {len(new_rows)} new photos to {len(centroids)} existing clusters")
+        if new_rows:
+            ids = vector_index.assign_clusters(index.matrix[new_rows], centroids)
+            for row, cid in zip(new_rows, ids):
+                assignments[index.urls[row]] = int(cid)
+    else:
+        k = min(k, len(index.urls))
+        print(f"  Training mini-batch k-means (k={k}) on {len(index.urls)} embeddings")
+        centroids, counts = vector_index.minibatch_kmeans(index.matrix, k)
+        ids = vector_index.assign_clusters(index.matrix, centroids)
+        assignments = {u: int(c) for u, c in zip(index.urls, ids)}
+        np.savez(state_path, centroids=centroids, counts=counts)
+    with open(assign_path, "w") as f:
+        json.dump(assignments, f)
+
+    names_by_cluster = {}
+    for entry in gallery:
+        cid = assignments.get(entry.get("url"))
+        if cid is not None:
+            names_by_cluster.setdefault(cid, []).append(entry.get("name", ""))
+    labels = {cid: label_for_names(names) or f"Cluster {cid}" for cid, names in names_by_cluster.items()}
+    return {url: {"cluster_id": cid, "cluster_label": labels.get(cid, f"Cluster {cid}")}
+            for url, cid in assignments.items()}
+
+
 def main():
+    ap = argparse.ArgumentParser(description="Enrich gallery.json with cluster labels/colors")
+    ap.add_argument("--local", action="store_true", help="cluster cached embeddings locally instead of reading Mixpeek")
+    ap.add_argument("--k", type=int, default=12, help="number of clusters for --local")
+    ap.add_argument("--recluster", action="store_true", help="retrain local centroids from scratch")
+    ap.add_argument("--base-url", default=BASE_URL, help="Mixpeek API base URL")
+    ap.add_argument("--page-cache", help="directory to cache document pages in, keyed by cursor")
+    ap.add_argument("--refresh", action="store_true", help="refetch every page and overwrite --page-cache")
+    instrument.add_arguments(ap)
+    args = ap.parse_args()
+    instrument.setup(args, "sync_mixpeek_clusters")
+
     gallery_path = os.path.abspath(GALLERY_PATH)
-    with open(gallery_path) as f:
-        gallery = json.load(f)
+    with instrument.span("load-gallery"):
+        store = gallery_store.GalleryStore(gallery_path=gallery_path)
+        gallery = store.all()
     print(f"Loaded {len(gallery)} photos from gallery.json")
 
-    print("Fetching documents from Mixpeek...")
-    documents = fetch_all_documents()
-    print(f"  Got {len(documents)} documents")
+    if args.local:
+        with instrument.span("local-cluster", k=args.k):
+            url_to_cluster = build_local_cluster_map(gallery, args.k, args.recluster)
+    else:
+        print("Fetching documents from Mixpeek...")
+        t0 = time.time()
+        with instrument.span("fetch-documents"):
+            documents = fetch_all_documents(args.base_url, args.page_cache, args.refresh)
+        instrument.count("documents", len(documents))
+        print(f"  Got {len(documents)} documents in {time.time() - t0:.1f}s")
 
-    if not documents:
-        print("No documents found — check collection or batch processing status.")
-        sys.exit(1)
+        if not documents:
+            print("No documents found — check collection or batch processing status.")
+            sys.exit(1)
 
-    url_to_cluster = build_cluster_map(documents)
+        url_to_cluster = build_cluster_map(documents)
     matched = sum(1 for p in gallery if p.get("url") in url_to_cluster)
     print(f"  Matched {matched}/{len(gallery)} photos to Mixpeek documents")
 
-    gallery = enrich_gallery(gallery, url_to_cluster)
+    with instrument.span("enrich"):
+        gallery = enrich_gallery(gallery, url_to_cluster)
 
-    with open(gallery_path, "w") as f:
-        json.dump(gallery, f, indent=2)
-        f.write("\n")
+    with instrument.span("upsert"):
+        store.upsert_many(gallery)
+    with instrument.span("export"):
+        indexes = store.export()
+    store.close()
+    with instrument.span("refresh-album"):
+        prerender_pages.refresh_album(prerender_pages.REPO_ROOT)
     print(f"Wrote enriched gallery.json ({len(gallery)} entries)")
 
-    clusters_used = set(e.get("cluster_id") for e in gallery if e.get("cluster_id") is not None)
-    print(f"\nClusters found: {len(clusters_used)}")
-    for cid in sorted(clusters_used):
-        label = next((e["cluster_label"] for e in gallery if e.get("cluster_id") == cid), "?")
-        count = sum(1 for e in gallery if e.get("cluster_id") == cid)
+    summary = gallery_index.cluster_summary(gallery, indexes)
+    print(f"\nClusters found: {len(summary)}")
+    for cid, label, count in summary:
         print(f"  [{cid}] {label} ({count} photos)")
 
 
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Local, offline stand-in for Mixpeek feature search over the gallery.
+
+Image embeddings live in a memory-mapped float32 matrix (one L2-normalised row per
+gallery URL), so a top-k cosine query is a single NumPy matmul over the whole
+collection. An optional IVF index (k-means coarse centroids) narrows the scan for
+large collections.
+
+  .gallery-cache/embeddings/matrix.f32   rows x dim float32, row-major
+  .gallery-cache/embeddings/meta.json    {"model", "dim", "urls": [...], "ivf": {...}?}
+
+meta.json is written after the matrix, so rows a crashed append left behind
+are not listed there and are trimmed off by the next append.
+
+Usage (from repo root):
+  python3 scripts/python/vector_index.py embed                 # embed new gallery images
+  python3 scripts/python/vector_index.py search --text "snowy ridge at sunset"
+  python3 scripts/python/vector_index.py search --url https://.../IMG_2296.JPG -k 20
+  python3 scripts/python/vector_index.py build-ivf --nlist 64
+  python3 scripts/python/vector_index.py export-similar -k 20  # images/gallery-similar.json for the SPA
+  python3 scripts/python/vector_index.py bench --sizes 10000,100000
+
+Search results use the same shape as the SPA's mixpeekSearch():
+  [{"document_id", "score", "thumbnail_url", "metadata": {"name", "lat", "lng", "filename"}}]
+
+export-similar precomputes every indexed image's nearest neighbours into
+images/gallery-similar.json, which the album's "find similar" reads before
+falling back to Mixpeek:
+  {"model", "k", "urls": [...], "neighbours": [[row, ...], ...], "scores": [[...], ...]}
+Row numbers point into that file's own urls list. Text search still goes to
+Mixpeek, since embedding a query needs the model.
+
+Requires: pip install numpy
+Embedding (embed, --text, --url of an unindexed image) additionally needs
+  pip install torch transformers Pillow
+and uses SigLIP, the model behind Mixpeek's google_siglip_base_v1 feature.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import urllib.request
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+GALLERY_PATH = os.path.join(REPO_ROOT, "images", "gallery.json")
+SIMILAR_PATH = os.path.join(REPO_ROOT, "images", "gallery-similar.json")
+INDEX_DIR = os.path.join(REPO_ROOT, ".gallery-cache", "embeddings")
+MODEL_NAME = "google/siglip-base-patch16-224"
+
+
+def normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def top_k(scores: np.ndarray, k: int):
+    """Row-wise top-k of a (q, n) score matrix without a full sort. Returns (idx, vals), best first."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    vals = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-vals, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(vals, order, axis=1)
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 20, seed: int = 0, sample: int = 50000) -> np.ndarray:
+    """Spherical k-means (cosine) on a sample of rows; returns normalised (k, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    rows = x if len(x) <= sample else x[np.sort(rng.choice(len(x), sample, replace=False))]
+    rows = np.asarray(rows, dtype=np.float32)
+    k = min(k, len(rows))  # a small gallery cannot seed more centroids than it has rows
+    centroids = rows[rng.choice(len(rows), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(rows @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, rows)
+        empty = np.bincount(assign, minlength=k) == 0
+        sums[empty] = rows[rng.choice(len(rows), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+def minibatch_kmeans(x: np.ndarray, k: int, batch_size: int = 2048, steps: int = 100, seed: int = 0,
+                     centroids: Optional[np.ndarray] = None, counts: Optional[np.ndarray] = None):
+    """Spherical mini-batch k-means (Sculley 2010), fully vectorised per batch.
+
+    Pass centroids/counts from a previous run to continue training instead of
+    starting over. Returns (centroids, counts).
+    """
+    rng = np.random.default_rng(seed)
+    n = len(x)
+    if centroids is None:
+        centroids = np.asarray(x[np.sort(rng.choice(n, k, replace=False))], dtype=np.float32).copy()
+        counts = np.zeros(k, dtype=np.float64)
+    centroids = centroids.copy()
+    counts = counts.copy()
+    for _ in range(steps):
+        batch = np.asarray(x[np.sort(rng.choice(n, min(batch_size, n), replace=False))], dtype=np.float32)
+        assign = np.argmax(batch @ centroids.T, axis=1)
+        n_b = np.bincount(assign, minlength=k).astype(np.float64)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, batch)
+        counts += n_b
+        hit = n_b > 0
+        # Per-centroid learning rate 1/count, applied to the batch mean in one step
+        lr = (n_b[hit] / counts[hit])[:, None].astype(np.float32)
+        centroids[hit] += lr * (sums[hit] / n_b[hit][:, None] - centroids[hit])
+        centroids = normalize(centroids)
+    return centroids, counts
+
+
+def assign_clusters(x: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    """Nearest-centroid id for every row, computed in chunks to bound memory."""
+    out = np.empty(len(x), dtype=np.int64)
+    for s in range(0, len(x), chunk):
+        out[s:s + chunk] = np.argmax(np.asarray(x[s:s + chunk]) @ centroids.T, axis=1)
+    return out
+
+
+class VectorIndex:
+    """Memory-mapped embedding matrix plus gallery metadata for result shaping."""
+
+    def __init__(self, index_dir: str = INDEX_DIR, gallery_path: str = GALLERY_PATH):
+        self.dir = index_dir
+        self.meta_path = os.path.join(index_dir, "meta.json")
+        self.matrix_path = os.path.join(index_dir, "matrix.f32")
+        self.gallery_path = gallery_path
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"model": MODEL_NAME, "dim": 0, "urls": []}
+        self._matrix = None
+        self._gallery = None
+
+    @property
+    def urls(self) -> List[str]:
+        return self.meta["urls"]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            n, dim = len(self.urls), self.meta["dim"]
+            if n == 0:
+                self._matrix = np.zeros((0, dim), dtype=np.float32)
+            else:
+                self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(n, dim))
+        return self._matrix
+
+    @property
+    def gallery_by_url(self) -> dict:
+        if self._gallery is None:
+            self._gallery = {}
+            if os.path.exists(self.gallery_path):
+                with open(self.gallery_path) as f:
+                    self._gallery = {e["url"]: e for e in json.load(f) if e.get("url")}
+        return self._gallery
+
+    def append(self, urls: Sequence[str], vectors: np.ndarray):
+        """Append normalised rows for new URLs after the rows meta.json lists."""
+        vectors = normalize(vectors)
+        if not self.meta["dim"]:
+            self.meta["dim"] = int(vectors.shape[1])
+        os.makedirs(self.dir, exist_ok=True)
+        with open(self.matrix_path, "ab") as f:
+            # Drop rows a crashed append wrote without recording their URLs in meta
+            f.truncate(len(self.urls) * self.meta["dim"] * np.dtype(np.float32).itemsize)
+            f.write(vectors.astype(np.float32).tobytes())
+        self.meta["urls"].extend(urls)
+        self.meta.pop("ivf", None)  # stale once rows are added
+        self._save_meta()
+        self._matrix = None
+
+    def _save_meta(self):
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.meta_path)
+
+    def build_ivf(self, nlist: int, iters: int = 20):
+        """Cluster rows into nlist inverted lists, stored as row indices sorted by list."""
+        centroids = kmeans(self.matrix, nlist, iters=iters)
+        nlist = len(centroids)
+        assign = np.argmax(self.matrix @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+        np.save(os.path.join(self.dir, "ivf_centroids.npy"), centroids)
+        np.save(os.path.join(self.dir, "ivf_rows.npy"), order.astype(np.int64))
+        self.meta["ivf"] = {"nlist": nlist, "offsets": offsets.tolist()}
+        self._save_meta()
+
+    def search_vectors(self, queries: np.ndarray, k: int = 20, nprobe: Optional[int] = None):
+        """Top-k cosine search for a batch of query vectors. Returns (idx, scores) arrays.
+
+        With an IVF index and nprobe set, only the nprobe closest lists are scanned.
+        """
+        q = normalize(np.atleast_2d(queries))
+        ivf = self.meta.get("ivf")
+        if not nprobe or not ivf:
+            return top_k(q @ self.matrix.T, k)
+
+        centroids = np.load(os.path.join(self.dir, "ivf_centroids.npy"))
+        rows = np.load(os.path.join(self.dir, "ivf_rows.npy"), mmap_mode="r")
+        offsets = ivf["offsets"]
+        probe_idx, _ = top_k(q @ centroids.T, nprobe)
+        out_idx = np.full((len(q), k), -1, dtype=np.int64)
+        out_val = np.full((len(q), k), -np.inf, dtype=np.float32)
+        for i, lists in enumerate(probe_idx):
+            # Sorted so the memmap is read front to back
+            cand = np.sort(np.concatenate([rows[offsets[c]:offsets[c + 1]] for c in lists]))
+            if not len(cand):
+                continue
+            scores = self.matrix[cand] @ q[i]
+            idx, vals = top_k(scores[None, :], k)
+            n = idx.shape[1]
+            out_idx[i, :n] = cand[idx[0]]
+            out_val[i, :n] = vals[0]
+        return out_idx, out_val
+
+    def results(self, idx_row, score_row) -> List[dict]:
+        """Shape one query's hits like Mixpeek feature-search documents."""
+        out = []
+        for i, score in zip(idx_row, score_row):
+            if i < 0:
+                continue
+            url = self.urls[int(i)]
+            entry = self.gallery_by_url.get(url, {})
+            out.append({
+                "document_id": url,
+                "score": float(score),
+                "thumbnail_url": url,
+                "metadata": {
+                    "name": entry.get("name", ""),
+                    "lat": entry.get("lat"),
+                    "lng": entry.get("lng"),
+                    "filename": os.path.basename(url),
+                },
+            })
+        return out
+
+    def search(self, vector: np.ndarray, k: int = 20, nprobe: Optional[int] = None) -> List[dict]:
+        idx, vals = self.search_vectors(vector, k, nprobe)
+        return self.results(idx[0], vals[0])
+
+    def search_url(self, url: str, k: int = 20, nprobe: Optional[int] = None) -> List[dict]:
+        """Reverse-image search; indexed images reuse their stored row instead of re-embedding."""
+        try:
+            vector = np.asarray(self.matrix[self.urls.index(url)])
+        except ValueError:
+            vector = Embedder().images([fetch_image(url)])
+        return self.search(vector, k, nprobe)
+
+    def search_text(self, text: str, k: int = 20, nprobe: Optional[int] = None) -> List[dict]:
+        return self.search(Embedder().texts([text]), k, nprobe)
+
+
+class Embedder:
+    """SigLIP image/text encoder (optional dependency, loaded on first use)."""
+
+    _cache = {}
+
+    def __init__(self, model_name: str = MODEL_NAME):
+        if model_name not in self._cache:
+            try:
+                import torch
+                from transformers import AutoModel, AutoProcessor
+            except ImportError:
+                raise SystemExit("Embedding needs: pip install torch transformers Pillow")
+            model = AutoModel.from_pretrained(model_name).eval()
+            self._cache[model_name] = (torch, model, AutoProcessor.from_pretrained(model_name))
+        self.torch, self.model, self.processor = self._cache[model_name]
+
+    def images(self, images) -> np.ndarray:
+        with self.torch.no_grad():
+            inputs = self.processor(images=images, return_tensors="pt")
+            return normalize(self.model.get_image_features(**inputs).numpy())
+
+    def texts(self, texts) -> np.ndarray:
+        with self.torch.no_grad():
+            inputs = self.processor(text=texts, padding="max_length", return_tensors="pt")
+            return normalize(self.model.get_text_features(**inputs).numpy())
+
+
+def fetch_image(url: str):
+    from PIL import Image
+
+    req = urllib.request.Request(url, headers={"User-Agent": "vector-index/1.0"})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        img = Image.open(io.BytesIO(resp.read()))
+    img.draft("RGB", (448, 448))
+    return img.convert("RGB")
+
+
+def embed_gallery(index: VectorIndex, batch_size: int = 16):
+    """Embed gallery URLs that are not in the index yet, in batches."""
+    known = set(index.urls)
+    todo = [u for u in index.gallery_by_url if u not in known]
+    print(f"{len(known)} indexed, {len(todo)} to embed")
+    if not todo:
+        return
+    embedder = Embedder(index.meta.get("model", MODEL_NAME))
+    for start in range(0, len(todo), batch_size):
+        batch_urls, batch_imgs = [], []
+        for url in todo[start:start + batch_size]:
+            try:
+                batch_imgs.append(fetch_image(url))
+                batch_urls.append(url)
+            except Exception as exc:
+                print(f"  skip {url}: {exc}")
+        if batch_imgs:
+            index.append(batch_urls, embedder.images(batch_imgs))
+        print(f"  [{min(start + batch_size, len(todo))}/{len(todo)}]")
+
+
+def export_similar(index: VectorIndex, out_path: str = SIMILAR_PATH, k: int = 20, chunk: int = 1024) -> int:
+    """Write each listed image's k nearest neighbours (itself excluded) for the SPA. Returns rows written."""
+    # Only images still in gallery.json; the matrix keeps rows for removed ones
+    rows = [i for i, url in enumerate(index.urls) if url in index.gallery_by_url]
+    pos = {r: n for n, r in enumerate(rows)}
+    neighbours, scores = [], []
+    for start in range(0, len(rows), chunk):
+        batch = rows[start:start + chunk]
+        # Room for the query row itself and any unlisted rows, which are dropped below
+        want = min(k + 1 + len(index.urls) - len(rows), len(index.urls))
+        idx, vals = index.search_vectors(index.matrix[batch], want)
+        for row, idx_row, val_row in zip(batch, idx, vals):
+            hits = [(pos[int(i)], float(v)) for i, v in zip(idx_row, val_row) if int(i) in pos and int(i) != row]
+            neighbours.append([p for p, _ in hits[:k]])
+            scores.append([round(v, 4) for _, v in hits[:k]])
+    out = {
+        "model": index.meta["model"],
+        "k": k,
+        "urls": [index.urls[r] for r in rows],
+        "neighbours": neighbours,
+        "scores": scores,
+    }
+    tmp = out_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(out, f, separators=(",", ":"))
+    os.replace(tmp, out_path)
+    return len(rows)
+
+
+def bench(sizes: Sequence[int], dim: int, queries: int, k: int, nlist: int, nprobe: int, workdir: str):
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        d = os.path.join(workdir, f"n{n}")
+        os.makedirs(d, exist_ok=True)
+        for name in ("matrix.f32", "meta.json"):
+            if os.path.exists(os.path.join(d, name)):
+                os.remove(os.path.join(d, name))
+        index = VectorIndex(d, gallery_path=os.devnull)
+        # Clustered synthetic data so IVF has structure to exploit, like real photo embeddings
+        centers = normalize(rng.standard_normal((256, dim)))
+        chunk = 20000
+        for s in range(0, n, chunk):
+            m = min(chunk, n - s)
+            rows = centers[rng.integers(0, 256, m)] + 0.3 * rng.standard_normal((m, dim)) / np.sqrt(dim)
+            index.append([f"u{i}" for i in range(s, s + m)], rows)
+        q = normalize(np.asarray(index.matrix[rng.integers(0, n, queries)]) + 0.05 * rng.standard_normal((queries, dim)) / np.sqrt(dim))
+
+        index.search_vectors(q[:1], k)  # page the matrix in
+        t = time.perf_counter()
+        exact, _ = index.search_vectors(q, k)
+        batched = (time.perf_counter() - t) / queries * 1000
+        t = time.perf_counter()
+        for row in q:
+            index.search_vectors(row, k)
+        single = (time.perf_counter() - t) / queries * 1000
+        print(f"n={n} dim={dim}: brute force {single:.2f} ms/query single, {batched:.3f} ms/query batched")
+
+        t = time.perf_counter()
+        index.build_ivf(min(nlist, n // 10 or 1))
+        build = time.perf_counter() - t
+        t = time.perf_counter()
+        approx, _ = index.search_vectors(q, k, nprobe=nprobe)
+        ivf_ms = (time.perf_counter() - t) / queries * 1000
+        recall = np.mean([len(set(a) & set(e)) / k for a, e in zip(approx, exact)])
+        print(f"  ivf nlist={index.meta['ivf']['nlist']} nprobe={nprobe}: {ivf_ms:.2f} ms/query, "
+              f"recall@{k}={recall:.3f}, build {build:.1f}s")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline vector search over gallery embeddings")
+    ap.add_argument("--index-dir", default=INDEX_DIR)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    e = sub.add_parser("embed", help="embed gallery images not yet in the index")
+    e.add_argument("--batch-size", type=int, default=16)
+    s = sub.add_parser("search", help="text or reverse-image search; prints Mixpeek-shaped JSON")
+    g = s.add_mutually_exclusive_group(required=True)
+    g.add_argument("--text")
+    g.add_argument("--url")
+    s.add_argument("-k", type=int, default=20)
+    s.add_argument("--nprobe", type=int, help="scan only this many IVF lists (needs build-ivf)")
+    b = sub.add_parser("build-ivf", help="build the IVF coarse index")
+    b.add_argument("--nlist", type=int, default=64)
+    x = sub.add_parser("export-similar", help="precompute neighbours for the SPA's similar-photo search")
+    x.add_argument("-k", type=int, default=20)
+    x.add_argument("--out", default=SIMILAR_PATH)
+    bn = sub.add_parser("bench", help="time brute-force and IVF search on synthetic embeddings")
+    bn.add_argument("--sizes", default="10000,100000")
+    bn.add_argument("--dim", type=int, default=768)
+    bn.add_argument("--queries", type=int, default=200)
+    bn.add_argument("-k", type=int, default=20)
+    bn.add_argument("--nlist", type=int, default=256)
+    bn.add_argument("--nprobe", type=int, default=8)
+    bn.add_argument("--workdir", default=os.path.join("/tmp", "vector-index-bench"))
+    args = ap.parse_args()
+
+    if args.cmd == "bench":
+        bench([int(n) for n in args.sizes.split(",")], args.dim, args.queries, args.k,
+              args.nlist, args.nprobe, args.workdir)
+        return
+
+    index = VectorIndex(args.index_dir)
+    if args.cmd == "embed":
+        embed_gallery(index, args.batch_size)
+    elif args.cmd == "build-ivf":
+        if not index.urls:
+            print("Index is empty; run embed first.", file=sys.stderr)
+            sys.exit(1)
+        index.build_ivf(args.nlist)
+        print(f"Built IVF with {index.meta['ivf']['nlist']} lists over {len(index.urls)} rows")
+    elif args.cmd == "export-similar":
+        if not index.urls:
+            print("Index is empty; run embed first.", file=sys.stderr)
+            sys.exit(1)
+        n = export_similar(index, args.out, args.k)
+        print(f"Wrote {args.k} neighbours for {n} images to {args.out}")
+    else:
+        t = time.perf_counter()
+        if args.text:
+            hits = index.search_text(args.text, args.k, args.nprobe)
+        else:
+            hits = index.search_url(args.url, args.k, args.nprobe)
+        print(json.dumps(hits, indent=2))
+        print(f"{len(hits)} results in {(time.perf_counter() - t) * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
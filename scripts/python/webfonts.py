@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Self-hosted, subsetted Lora and Montserrat for the generated pages.
+
+Reads the font files from a local directory (fonts/ by default, or
+SITE_FONTS_DIR / --fonts-dir), either static files (Lora-Regular.ttf,
+Lora-Bold.ttf, Lora-Italic.ttf, Montserrat-Regular.ttf, Montserrat-SemiBold.ttf,
+Montserrat-Bold.ttf) or Google's variable fonts (Lora[wght].ttf,
+Lora-Italic[wght].ttf, Montserrat[wght].ttf), and cuts each face down to the
+characters the generated pages actually contain, plus printable ASCII so small
+edits don't fall back to a system font. Each face is written as
+assets/<family>-<weight>[-italic].<hash>.woff2, which server.py serves as immutable.
+
+font_head() returns the markup that replaces the Google Fonts <link>s: an
+inline @font-face block with font-display: swap, and preloads for the body and
+heading faces. Subsets are reused while the sources and the character set are
+unchanged (assets/fonts.json).
+
+If fontTools is missing or any face has no source file, the build keeps the
+Google Fonts links and says why.
+
+Usage (from repo root):
+  python3 scripts/python/webfonts.py [--fonts-dir DIR]   # subset against the current pages
+
+Requires: pip install fonttools brotli
+"""
+
+import argparse
+import hashlib
+import html
+import io
+import json
+import os
+import re
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+FONTS_DIR = Path(os.environ.get('SITE_FONTS_DIR', REPO_ROOT / 'fonts'))
+ASSETS_DIR = 'assets'
+HASH_LEN = 10
+
+# (family, weight, style, static file stem, variable file stem) - the faces the pages ask Google for
+FACES = [
+    ('Lora', 400, 'normal', 'Lora-Regular', 'Lora[wght]'),
+    ('Lora', 700, 'normal', 'Lora-Bold', 'Lora[wght]'),
+    ('Lora', 400, 'italic', 'Lora-Italic', 'Lora-Italic[wght]'),
+    ('Montserrat', 400, 'normal', 'Montserrat-Regular', 'Montserrat[wght]'),
+    ('Montserrat', 600, 'normal', 'Montserrat-SemiBold', 'Montserrat[wght]'),
+    ('Montserrat', 700, 'normal', 'Montserrat-Bold', 'Montserrat[wght]'),
+]
+# Body text and headings; everything else loads when first used
+PRELOAD = {('Lora', 400, 'normal'), ('Montserrat', 600, 'normal')}
+
+# The Google Fonts block create_article_html() and build_utilities_page() emit,
+# or a self-hosted block from an earlier run
+FONT_HEAD = re.compile(
+    r'<link rel="preconnect" href="https://fonts\.googleapis\.com">\s*'
+    r'<link rel="preconnect" href="https://fonts\.gstatic\.com" crossorigin>\s*'
+    r'<link href="https://fonts\.googleapis\.com/css2\?[^"]*" rel="stylesheet">'
+    r'|(?:<link rel="preload" href="[^"]+\.woff2" as="font" type="font/woff2" crossorigin>\s*)*'
+    r'<style id="webfonts">[^<]*</style>'
+)
+
+_NON_TEXT = re.compile(r'<(script|style)\b[^>]*>.*?</\1\s*>|<!--.*?-->', re.S | re.I)
+_TAG = re.compile(r'<[^>]+>')
+
+
+def face_slug(family, weight, style):
+    return f"{family.lower()}-{weight}{'-italic' if style == 'italic' else ''}"
+
+
+def page_text(markup):
+    """Visible text of a page: no tags, scripts or styles, entities decoded."""
+    return html.unescape(_TAG.sub(' ', _NON_TEXT.sub(' ', markup)))
+
+
+def used_codepoints(pages):
+    chars = set(chr(c) for c in range(0x20, 0x7F))
+    for path in pages:
+        chars.update(page_text(Path(path).read_text(encoding='utf-8')))
+    return sorted(ord(c) for c in chars if c.isprintable() or c == ' ')
+
+
+def find_source(fonts_dir, static_stem, variable_stem):
+    for stem, variable in ((static_stem, False), (variable_stem, True)):
+        for ext in ('.ttf', '.otf'):
+            path = fonts_dir / f'{stem}{ext}'
+            if path.exists():
+                return path, variable
+    return None, False
+
+
+def subset_face(source, variable, weight, codepoints):
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    font = TTFont(source)
+    if variable:
+        from fontTools.varLib import instancer
+        font = instancer.instantiateVariableFont(font, {'wght': weight})
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.desubroutinize = True
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    buf = io.BytesIO()
+    font.flavor = 'woff2'
+    font.save(buf)
+    return buf.getvalue()
+
+
+def build_fonts(project_root: Path, pages, fonts_dir: Path = FONTS_DIR):
+    """Write subsetted WOFF2 faces; returns [(family, weight, style, url)] or None when skipped."""
+    try:
+        import fontTools  # noqa: F401
+        import brotli  # noqa: F401 - fontTools needs it to write WOFF2
+    except ImportError:
+        print("  - Web fonts skipped (pip install fonttools brotli); keeping Google Fonts")
+        return None
+
+    sources = {}
+    missing = []
+    for family, weight, style, static_stem, variable_stem in FACES:
+        path, variable = find_source(fonts_dir, static_stem, variable_stem)
+        if path is None:
+            missing.append(static_stem)
+        sources[(family, weight, style)] = (path, variable)
+    if missing:
+        print(f"  - Web fonts skipped (no {', '.join(missing)} in {fonts_dir}); keeping Google Fonts")
+        return None
+
+    codepoints = used_codepoints(pages)
+    chars_key = hashlib.sha256(','.join(map(str, codepoints)).encode()).hexdigest()
+    out_dir = project_root / ASSETS_DIR
+    out_dir.mkdir(exist_ok=True)
+    state_path = out_dir / 'fonts.json'
+    state = json.loads(state_path.read_text(encoding='utf-8')) if state_path.exists() else {}
+
+    faces = []
+    new_state = {}
+    for family, weight, style, _, _ in FACES:
+        slug = face_slug(family, weight, style)
+        path, variable = sources[(family, weight, style)]
+        source_bytes = path.read_bytes()
+        key = hashlib.sha256(source_bytes + f'|{weight}|{chars_key}'.encode()).hexdigest()
+        previous = state.get(slug, {})
+        name = previous.get('file')
+        if previous.get('key') != key or not name or not (out_dir / name).exists():
+            data = subset_face(path, variable, weight, codepoints)
+            name = f'{slug}.{hashlib.sha256(data).hexdigest()[:HASH_LEN]}.woff2'
+            (out_dir / name).write_bytes(data)
+            print(f"  ✓ {name}: {len(source_bytes) / 1024:.0f} KiB -> {len(data) / 1024:.1f} KiB "
+                  f"({len(codepoints)} characters)")
+        stale = re.compile(rf'^{re.escape(slug)}\.[0-9a-f]{{{HASH_LEN}}}\.woff2$')
+        for old in out_dir.iterdir():
+            if old.name != name and stale.match(old.name):
+                old.unlink()
+        new_state[slug] = {'key': key, 'file': name, 'source': path.name}
+        faces.append((family, weight, style, f'/{ASSETS_DIR}/{name}'))
+    state_path.write_text(json.dumps(new_state, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+    return faces
+
+
+def font_head(faces):
+    """Preload links plus an inline @font-face block, replacing the Google Fonts <link>s."""
+    preloads = [
+        f'<link rel="preload" href="{url}" as="font" type="font/woff2" crossorigin>'
+        for family, weight, style, url in faces if (family, weight, style) in PRELOAD
+    ]
+    rules = ''.join(
+        f"@font-face{{font-family:'{family}';font-style:{style};font-weight:{weight};font-display:swap;"
+        f"src:url({url}) format('woff2')}}"
+        for family, weight, style, url in faces
+    )
+    return '\n'.join(preloads + [f'<style id="webfonts">{rules}</style>'])
+
+
+def self_host(project_root: Path, pages, fonts_dir: Path = FONTS_DIR):
+    """Subset the fonts for `pages` and swap their Google Fonts links for the local faces."""
+    faces = build_fonts(project_root, pages, fonts_dir)
+    if not faces:
+        return False
+    head = font_head(faces)
+    for path in pages:
+        path = Path(path)
+        markup = path.read_text(encoding='utf-8')
+        updated = FONT_HEAD.sub(lambda _: head, markup, count=1)
+        if updated != markup:
+            path.write_text(updated, encoding='utf-8')
+    print(f"  ✓ Self-hosted fonts in {len(pages)} pages")
+    return True
+
+
+def generated_pages(project_root: Path):
+    """The article page for each post in posts/ plus the utilities index."""
+    pages = []
+    for md_file in sorted((project_root / 'posts').glob('*.md')):
+        page = project_root / md_file.stem / 'index.html'
+        if not md_file.name.startswith('_') and page.exists():
+            pages.append(page)
+    utilities = project_root / 'utilities' / 'index.html'
+    if utilities.exists():
+        pages.append(utilities)
+    return pages
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Subset Lora/Montserrat to WOFF2 for the generated pages")
+    ap.add_argument('--fonts-dir', type=Path, default=FONTS_DIR, help='directory holding the .ttf/.otf sources')
+    args = ap.parse_args()
+    self_host(REPO_ROOT, generated_pages(REPO_ROOT), args.fonts_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,19 +2,27 @@
 """
 Simple HTTP server for SPA development.
 Serves index.html for routes that don't match actual files.
+Fingerprinted files under /assets/ are sent with a year-long immutable lifetime.
 """
 import http.server
 import socketserver
 import os
+import re
 import urllib.parse
 import subprocess
 from pathlib import Path
 
+# Content-hashed copies written by scripts/python/assets.py never change
+HASHED_ASSET = re.compile(r'^/assets/[\w-]+\.[0-9a-f]{10}\.(css|js|woff2)$')
+
 class SPAHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     def end_headers(self):
-        self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
-        self.send_header('Pragma', 'no-cache')
-        self.send_header('Expires', '0')
+        if HASHED_ASSET.match(urllib.parse.urlparse(self.path).path):
+            self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        else:
+            self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
+            self.send_header('Pragma', 'no-cache')
+            self.send_header('Expires', '0')
         super().end_headers()
 
     def do_GET(self):